@@ -0,0 +1,86 @@
+"""Mide la busqueda por nombre y codigo (/json/<area>/buscar) sobre un catalogo grande.
+
+Uso:
+    python benchmarks/bench_busqueda.py [items]
+
+Siembra `items` reactivos y materias (por defecto 100000) con nombres generados,
+mide la construccion del indice y la latencia p50/p95 de consultas cortas
+(prefijos), substrings y codigos. Usa DATABASE_URL si esta definida, si no una
+base SQLite temporal.
+"""
+import base64
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+from flasksystem import create_app, db, bcrypt
+from flasksystem.models import User, Reactivo, Materia, Area
+
+SILABAS = ['ac', 'et', 'ol', 'me', 'tan', 'sul', 'fu', 'ri', 'co', 'clo', 'ru', 'ro', 'so', 'dio', 'ni', 'tra',
+           'to', 'hi', 'dro', 'xi', 'do', 'car', 'bo', 'na', 'fos', 'fa', 'pro', 'pa', 'glu', 'ci']
+
+
+def nombre(aleatorio):
+    return ' '.join(''.join(aleatorio.choice(SILABAS) for _ in range(aleatorio.randint(2, 4))).capitalize()
+                    for _ in range(aleatorio.randint(1, 3)))
+
+
+def sembrar(items):
+    db.drop_all()
+    db.create_all()
+    db.session.add(User(username='bench', email='bench@bench.cl', area=Area.Lab.value,
+                        password=bcrypt.generate_password_hash('bench').decode('utf-8')))
+    aleatorio = random.Random(0)
+    for modelo, prefijo in ((Reactivo, 'R'), (Materia, 'M')):
+        db.session.bulk_insert_mappings(modelo, [
+            dict(nombre=nombre(aleatorio), codigo=f'{prefijo}-{i:06}', medida='Gramos', area=Area.Lab.value)
+            for i in range(items // 2)])
+    db.session.commit()
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def main(items=100000):
+    app = create_app()
+    with app.app_context():
+        sembrar(items)
+    cliente = app.test_client()
+    credenciales = base64.b64encode(b'bench@bench.cl:bench').decode()
+    token = cliente.post('/json/login', headers={'Authorization': 'Basic ' + credenciales}).get_json()['token']
+
+    def buscar(consulta):
+        inicio = time.perf_counter()
+        respuesta = cliente.get('/json/lab/buscar', query_string={'q': consulta},
+                                headers={'x-access-token': token}).get_json()
+        return time.perf_counter() - inicio, len(respuesta['resultados'])
+
+    construccion, _ = buscar('inicial')
+    print(f'items={items} construccion del indice={construccion:.2f}s')
+
+    aleatorio = random.Random(1)
+    grupos = {
+        'prefijo (1-2 letras)': [aleatorio.choice(SILABAS)[:aleatorio.randint(1, 2)] for _ in range(200)],
+        'substring (3-5 letras)': [''.join(aleatorio.choice(SILABAS) for _ in range(2))[:5] for _ in range(200)],
+        'dos palabras': [f'{aleatorio.choice(SILABAS)}{aleatorio.choice(SILABAS)} {aleatorio.choice(SILABAS)}'
+                         for _ in range(200)],
+        'codigo': [f'M-{aleatorio.randint(0, items // 2 - 1):06}' for _ in range(200)],
+    }
+    print(f"{'consulta':<24} {'p50':>8} {'p95':>8} {'resultados':>11}")
+    for grupo, consultas in grupos.items():
+        medidas = [buscar(consulta) for consulta in consultas]
+        tiempos = [t for t, _ in medidas]
+        print(f"{grupo:<24} {percentil(tiempos, 0.5) * 1000:>6.1f}ms {percentil(tiempos, 0.95) * 1000:>6.1f}ms "
+              f"{sum(n for _, n in medidas) / len(medidas):>11.1f}")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,77 @@
+"""Cuenta los commits que hace cada endpoint que modifica datos.
+
+Uso:
+    python benchmarks/bench_commits.py
+
+Cada request debe hacer como maximo un commit (unidad de trabajo por request).
+Usa DATABASE_URL si esta definida, si no una base SQLite temporal. Retorna 1 si
+algun endpoint hace mas de un commit.
+"""
+import base64
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+from sqlalchemy import event
+from flasksystem import create_app, db, bcrypt
+from flasksystem.models import User, Reactivo, Materia, Formula, Ingrediente, Area
+
+# (metodo, url, json) en orden, los ids corresponden a lo creado por los requests anteriores
+ENDPOINTS = [
+    ('POST', '/json/lab/materia/create', {'nombre': 'Materia', 'codigo': 'M1', 'medida': 'Gramos', 'area': 'Lab'}),
+    ('PUT', '/json/lab/materia/2/alerta', {'bajo_stock': 10}),
+    ('PUT', '/json/lab/materia/2/add', {'cantidad': 100, 'observacion': 'bench'}),
+    ('PUT', '/json/lab/materia/2/reduce', {'cantidad': 1, 'observacion': 'bench'}),
+    ('POST', '/json/lab/reactivo/create', {'nombre': 'Reactivo', 'codigo': 'R1', 'medida': 'Gramos', 'area': 'Lab'}),
+    ('PUT', '/json/lab/reactivo/2/alerta', {'bajo_stock': 10}),
+    ('POST', '/json/lab/reactivo/2/add', {'cantidad': 100, 'observacion': 'bench'}),
+    ('PUT', '/json/lab/reactivo/2/reduce', {'cantidad': 1, 'lote': 'L1', 'observacion': 'bench'}),
+    ('POST', '/json/lab/reactivo/1/producir', {'cantidad': 1, 'nro_analisis': 1, 'observacion': 'bench'}),
+    ('POST', '/json/lab/movimientos/batch', [{'item': 'Materia', 'id': 2, 'tipo': 'Entrada', 'cantidad': 5},
+                                             {'item': 'Reactivo', 'id': 2, 'tipo': 'Salida', 'cantidad': 1,
+                                              'lote': 'L1'}]),
+    ('DELETE', '/json/lab/reactivo/2/delete', None),
+    ('DELETE', '/json/lab/materia/2/delete', None),
+    ('POST', '/json/register', {'username': 'otro', 'email': 'otro@bench.cl', 'password': 'x', 'area': 'Lab'}),
+]
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(User(username='bench', email='bench@bench.cl', area=Area.Lab.value,
+                            password=bcrypt.generate_password_hash('bench').decode('utf-8')))
+        reactivo = Reactivo(nombre='Base', codigo='R0', medida='Gramos', area=Area.Lab.value, tiene_formula=True)
+        formula = Formula(reactivo=reactivo)
+        formula.materias.append(Ingrediente(ratio=1, materia=Materia(nombre='Base', codigo='M0', medida='Gramos',
+                                                                     cantidad=10 ** 6, area=Area.Lab.value)))
+        db.session.add(formula)
+        db.session.commit()
+
+    cliente = app.test_client()
+    credenciales = base64.b64encode(b'bench@bench.cl:bench').decode()
+    token = cliente.post('/json/login', headers={'Authorization': 'Basic ' + credenciales}).get_json()['token']
+
+    contador = {'commits': 0}
+    with app.app_context():
+        event.listen(db.engine, 'commit', lambda conn: contador.__setitem__('commits', contador['commits'] + 1))
+
+    fallidos = 0
+    print(f"{'endpoint':<45} {'status':>6} {'commits':>7}")
+    for metodo, url, datos in ENDPOINTS:
+        contador['commits'] = 0
+        respuesta = cliente.open(url, method=metodo, json=datos, headers={'x-access-token': token})
+        print(f"{metodo + ' ' + url:<45} {respuesta.status_code:>6} {contador['commits']:>7}")
+        if contador['commits'] > 1 or respuesta.status_code >= 400:
+            fallidos += 1
+    return 1 if fallidos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
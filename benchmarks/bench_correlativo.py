@@ -0,0 +1,65 @@
+"""Asigna lotes desde varios hilos a la vez y verifica que no se repita ninguno.
+
+Los lotes de Lab y Bod comparten un mismo correlativo por año.
+
+Uso:
+    python benchmarks/bench_correlativo.py [hilos] [lotes_por_hilo]
+
+Usa DATABASE_URL si esta definida, si no una base SQLite temporal.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+from flasksystem import create_app, db
+from flasksystem.reactivos.utils import siguiente_lote
+
+
+def trabajador(app, nro_lotes, barrera, lotes, errores):
+    with app.app_context():
+        barrera.wait()
+        for i in range(nro_lotes):
+            try:
+                lotes.append(siguiente_lote(i, datetime.utcnow()))
+                db.session.commit()
+            except Exception as err:
+                db.session.rollback()
+                errores.append(err)
+
+
+def main(hilos=8, lotes_por_hilo=100):
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+    lotes, errores = [], []
+    barrera = threading.Barrier(hilos)
+    threads = [threading.Thread(target=trabajador, args=(app, lotes_por_hilo, barrera, lotes, errores))
+               for _ in range(hilos)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - inicio
+
+    # El nro de analisis varia por iteracion, lo que debe ser unico es el correlativo
+    correlativos = Counter(lote[3:7] for lote in lotes)
+    duplicados = {nro: n for nro, n in correlativos.items() if n > 1}
+    print(f"hilos={hilos} lotes={len(lotes)} errores={len(errores)} "
+          f"duplicados={len(duplicados)} lotes/s={len(lotes) / total:.0f}")
+    return 1 if duplicados else 0
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    sys.exit(main(*args))
@@ -0,0 +1,68 @@
+"""Mide la memoria usada por /json/<area>/historial/export segun el tamaño del historial.
+
+Uso:
+    python benchmarks/bench_export.py [filas ...]
+
+Para cada cantidad de filas siembra el historial, consume la respuesta en
+streaming y muestra el peak de memoria (tracemalloc) mientras se genera. El
+peak debe mantenerse constante aunque crezca el historial. Usa DATABASE_URL si
+esta definida, si no una base SQLite temporal.
+"""
+import base64
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+from flasksystem import create_app, db, bcrypt
+from flasksystem.models import User, Reactivo, Materia, HistorialReactivos, HistorialMaterias, Area
+
+
+def sembrar(filas, lote=10000):
+    db.drop_all()
+    db.create_all()
+    db.session.add(User(username='bench', email='bench@bench.cl', area=Area.Lab.value,
+                        password=bcrypt.generate_password_hash('bench').decode('utf-8')))
+    db.session.add(Reactivo(nombre='R', codigo='R', medida='Gramos', area=Area.Lab.value))
+    db.session.add(Materia(nombre='M', codigo='M', medida='Gramos', area=Area.Lab.value))
+    inicio = datetime.utcnow() - timedelta(days=365)
+    for desde in range(0, filas, lote):
+        fechas = [inicio + timedelta(minutes=desde + i) for i in range(min(lote, filas - desde))]
+        db.session.bulk_insert_mappings(HistorialReactivos, [
+            dict(cantidad=1, fecha_registro=f, reactivo_id=1, user_id=1, tipo='Entrada', area=Area.Lab.value,
+                 lote='L1', observacion='bench') for f in fechas])
+        db.session.bulk_insert_mappings(HistorialMaterias, [
+            dict(cantidad=1, fecha_registro=f, materia_id=1, user_id=1, tipo='Salida', area=Area.Lab.value,
+                 observacion='bench') for f in fechas])
+    db.session.commit()
+
+
+def main(*tamanos):
+    app = create_app()
+    credenciales = base64.b64encode(b'bench@bench.cl:bench').decode()
+    print(f"{'filas':>10} {'lineas':>10} {'segundos':>9} {'peak':>10}")
+    for filas in tamanos or (10000, 100000):
+        with app.app_context():
+            sembrar(filas)
+        cliente = app.test_client()
+        token = cliente.post('/json/login', headers={'Authorization': 'Basic ' + credenciales}).get_json()['token']
+
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        respuesta = cliente.get('/json/lab/historial/export', headers={'x-access-token': token}, buffered=False)
+        lineas = sum(bloque.count(b'\n') for bloque in respuesta.response)
+        respuesta.close()
+        total = time.perf_counter() - inicio
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{filas:>10} {lineas:>10} {total:>9.2f} {peak / 1024:>8.0f}KB")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,99 @@
+"""Cuenta las sentencias SQL de las vistas de historial con pocos y con muchos movimientos.
+
+Uso:
+    python benchmarks/bench_historial_consultas.py [movimientos]
+
+/home/historial, /lab/historial y /bod/historial deben hacer el mismo numero de
+sentencias sin importar cuantos movimientos existan (sin consultas por fila).
+Usa DATABASE_URL si esta definida, si no una base SQLite temporal. Retorna 1 si
+alguna vista crece con los datos o supera MAXIMO_SENTENCIAS.
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+from sqlalchemy import event
+from flasksystem import create_app, db, bcrypt
+from flasksystem.models import (User, Reactivo, Materia, HistorialReactivos, HistorialMaterias, HistorialQuimicos,
+                                Area)
+
+VISTAS = ['/home/historial', '/lab/historial', '/bod/historial']
+
+# Pagina de historial y, si no esta en cache, el usuario de la sesion
+MAXIMO_SENTENCIAS = 3
+
+
+def agregar_movimientos(usuario, cantidad):
+    for area in (Area.Lab.value, Area.Bod.value):
+        reactivo = Reactivo(nombre='Reactivo', codigo='R', medida='Gramos', area=area)
+        materia = Materia(nombre='Materia', codigo='M', medida='Gramos', area=area)
+        for _ in range(cantidad):
+            ahora = datetime.utcnow()
+            historial_reactivo = HistorialReactivos(cantidad=1, reactivo=reactivo, user=usuario, tipo='Entrada',
+                                                    area=area, fecha_registro=ahora)
+            historial_materia = HistorialMaterias(cantidad=1, materia=materia, user=usuario, tipo='Entrada', area=area,
+                                                  fecha_registro=ahora)
+            db.session.add_all([HistorialQuimicos(tipo='Reactivo', historial_reactivo=historial_reactivo,
+                                                  fecha_registro=ahora, area=area),
+                                HistorialQuimicos(tipo='Materia', historial_materia=historial_materia,
+                                                  fecha_registro=ahora, area=area)])
+    db.session.commit()
+
+
+def contar(app, cliente):
+    contador = {'sentencias': 0}
+
+    def sumar(*args):
+        contador['sentencias'] += 1
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', sumar)
+    resultado = {}
+    try:
+        for vista in VISTAS:
+            contador['sentencias'] = 0
+            respuesta = cliente.get(vista)
+            resultado[vista] = (respuesta.status_code, contador['sentencias'])
+    finally:
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', sumar)
+    return resultado
+
+
+def main(movimientos=500):
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        usuario = User(username='bench', email='bench@bench.cl', area=Area.Lab_Bod.value,
+                       password=bcrypt.generate_password_hash('bench').decode('utf-8'))
+        db.session.add(usuario)
+        agregar_movimientos(usuario, 2)
+
+    cliente = app.test_client()
+    cliente.post('/login', data={'email': 'bench@bench.cl', 'password': 'bench'})
+    # Deja el usuario de la sesion en la cache de principales, asi no se cuenta solo en la primera vista
+    cliente.get('/home')
+    pocos = contar(app, cliente)
+    with app.app_context():
+        agregar_movimientos(User.query.first(), movimientos)
+    muchos = contar(app, cliente)
+
+    fallidos = 0
+    print(f"{'vista':<20} {'status':>6} {'pocos':>6} {'muchos':>6}")
+    for vista in VISTAS:
+        status, sentencias_pocos = pocos[vista]
+        _, sentencias_muchos = muchos[vista]
+        print(f"{vista:<20} {status:>6} {sentencias_pocos:>6} {sentencias_muchos:>6}")
+        if status != 200 or sentencias_muchos != sentencias_pocos or sentencias_muchos > MAXIMO_SENTENCIAS:
+            fallidos += 1
+    return 1 if fallidos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(a) for a in sys.argv[1:2]]))
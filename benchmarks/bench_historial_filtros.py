@@ -0,0 +1,107 @@
+"""Mide los filtros del historial (desde, hasta, tipo, user_id, lote, reactivo_id) sobre una tabla grande.
+
+Uso:
+    python benchmarks/bench_historial_filtros.py [filas]
+
+Siembra `filas` historiales de reactivos (por defecto 2 millones) repartidos en
+3 años, 50 usuarios, 3 tipos y 20000 lotes. Para cada combinacion de filtros
+pide la primera pagina y la siguiente por /json/lab/reactivo/historial y
+muestra el tiempo de cada una y el indice usado. Usa DATABASE_URL si esta
+definida, si no una base SQLite temporal.
+"""
+import base64
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+from sqlalchemy import event
+from flasksystem import create_app, db, bcrypt
+from flasksystem.models import User, Reactivo, HistorialReactivos, Area
+
+USUARIOS = 50
+REACTIVOS = 1000
+LOTES = 20000
+
+FILTROS = [
+    '',
+    'tipo=Salida',
+    'user_id=7',
+    'tipo=Salida&user_id=7&desde={semana}',
+    'desde={semana}',
+    'desde={anio}&hasta={mes}',
+    'lote=Q200123',
+    'reactivo_id=42&tipo=Entrada',
+]
+
+
+def sembrar(filas, lote=50000):
+    db.drop_all()
+    db.create_all()
+    db.session.add(User(username='bench', email='bench@bench.cl', area=Area.Lab.value,
+                        password=bcrypt.generate_password_hash('bench').decode('utf-8')))
+    db.session.bulk_insert_mappings(User, [dict(username=f'u{i}', email=f'u{i}@bench.cl', password='x',
+                                                 area=Area.Lab.value) for i in range(2, USUARIOS + 1)])
+    db.session.bulk_insert_mappings(Reactivo, [dict(nombre=f'R{i}', codigo=f'R{i}', medida='Gramos',
+                                                    area=Area.Lab.value) for i in range(REACTIVOS)])
+    inicio = datetime.utcnow() - timedelta(days=3 * 365)
+    paso = 3 * 365 * 24 * 3600 / filas
+    aleatorio = random.Random(0)
+    for desde in range(0, filas, lote):
+        db.session.bulk_insert_mappings(HistorialReactivos, [
+            dict(cantidad=1, fecha_registro=inicio + timedelta(seconds=(desde + i) * paso),
+                 reactivo_id=aleatorio.randint(1, REACTIVOS), user_id=aleatorio.randint(1, USUARIOS),
+                 tipo=aleatorio.choice(('Entrada', 'Salida', 'Produccion')), area=Area.Lab.value,
+                 lote=f'Q{aleatorio.randint(200000, 200000 + LOTES)}')
+            for i in range(min(lote, filas - desde))])
+        db.session.commit()
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute('ANALYZE')
+    db.session.commit()
+
+
+def main(filas=2000000):
+    app = create_app()
+    with app.app_context():
+        sembrar(filas)
+        consultas = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, sql, params, *args: consultas.append((sql, params)))
+
+    cliente = app.test_client()
+    credenciales = base64.b64encode(b'bench@bench.cl:bench').decode()
+    token = cliente.post('/json/login', headers={'Authorization': 'Basic ' + credenciales}).get_json()['token']
+    hoy = datetime.utcnow()
+    fechas = {'semana': (hoy - timedelta(days=7)).date().isoformat(),
+              'mes': (hoy - timedelta(days=30)).date().isoformat(),
+              'anio': (hoy - timedelta(days=365)).date().isoformat()}
+
+    print(f"{'filtros':<42} {'filas':>6} {'pagina 1':>9} {'pagina 2':>9}  indice")
+    for filtro in FILTROS:
+        url = '/json/lab/reactivo/historial?' + filtro.format(**fechas)
+        tiempos = []
+        for _ in range(2):
+            del consultas[:]
+            inicio = time.perf_counter()
+            respuesta = cliente.get(url, headers={'x-access-token': token}).get_json()
+            tiempos.append(time.perf_counter() - inicio)
+            if not respuesta['siguiente']:
+                break
+            url = respuesta['siguiente']
+        sql, params = next(c for c in consultas if 'FROM historial_reactivos' in c[0])
+        with app.app_context():
+            prefijo = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+            plan = ' / '.join(str(fila[-1]) for fila in db.session.connection().execute(prefijo + sql, params))
+        pagina2 = f'{tiempos[1] * 1000:>7.1f}ms' if len(tiempos) > 1 else f"{'-':>9}"
+        print(f"{filtro or '(sin filtros)':<42} {len(respuesta['historiales']):>6} {tiempos[0] * 1000:>7.1f}ms "
+              f"{pagina2}  {plan}")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
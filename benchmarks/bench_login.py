@@ -0,0 +1,69 @@
+"""Mide el rendimiento de /json/login con varios clientes concurrentes.
+
+Uso:
+    python benchmarks/bench_login.py [clientes] [logins_por_cliente]
+
+BCRYPT_LOG_ROUNDS, BCRYPT_HILOS, BCRYPT_COLA y BCRYPT_ESPERA se toman del entorno
+igual que en la aplicacion. Los logins rechazados con 503 (cola de bcrypt llena o
+hash que supera BCRYPT_ESPERA) se cuentan aparte. Usa DATABASE_URL si esta definida, si no una base SQLite temporal.
+"""
+import base64
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+from flasksystem import create_app, db, bcrypt
+from flasksystem.models import User, Area
+
+
+def cliente(app, nro_logins, barrera, latencias, estados):
+    credenciales = base64.b64encode(b'bench@bench.cl:bench').decode()
+    with app.test_client() as c:
+        barrera.wait()
+        for _ in range(nro_logins):
+            inicio = time.perf_counter()
+            respuesta = c.post('/json/login', headers={'Authorization': 'Basic ' + credenciales})
+            latencias.append(time.perf_counter() - inicio)
+            estados.append(respuesta.status_code)
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def main(clientes=16, logins_por_cliente=10):
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(User(username='bench', email='bench@bench.cl', area=Area.Lab.value,
+                            password=bcrypt.generate_password_hash('bench').decode('utf-8')))
+        db.session.commit()
+
+    latencias, estados = [], []
+    barrera = threading.Barrier(clientes)
+    threads = [threading.Thread(target=cliente, args=(app, logins_por_cliente, barrera, latencias, estados))
+               for _ in range(clientes)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - inicio
+
+    exitosos = estados.count(200)
+    print(f"costo={app.config['BCRYPT_LOG_ROUNDS']} hilos={app.config['BCRYPT_HILOS']} "
+          f"cola={app.config['BCRYPT_COLA']} clientes={clientes}")
+    print(f"logins={len(estados)} ok={exitosos} 503={estados.count(503)} logins/s={exitosos / total:.1f} "
+          f"p50={percentil(latencias, 0.5) * 1000:.0f}ms p95={percentil(latencias, 0.95) * 1000:.0f}ms")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,64 @@
+"""Mide commits y latencia por produccion segun el numero de ingredientes de la formula.
+
+Uso:
+    python benchmarks/bench_produccion.py [repeticiones]
+
+Usa DATABASE_URL si esta definida, si no una base SQLite temporal.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+from sqlalchemy import event
+from flasksystem import create_app, db
+from flasksystem.models import User, Reactivo, Materia, Formula, Ingrediente, Area
+from flasksystem.reactivos.utils import producir_reactivo
+
+INGREDIENTES = (1, 4, 12, 24, 48)
+
+
+def crear_formula(nro_ingredientes, user):
+    reactivo = Reactivo(nombre=f'Reactivo {nro_ingredientes}', codigo=f'R{nro_ingredientes}', medida='Gramos',
+                        area=Area.Lab.value, tiene_formula=True)
+    formula = Formula(reactivo=reactivo)
+    for i in range(nro_ingredientes):
+        materia = Materia(nombre=f'Materia {nro_ingredientes}-{i}', codigo=f'M{i}', medida='Gramos',
+                          cantidad=10 ** 9, area=Area.Lab.value)
+        formula.materias.append(Ingrediente(ratio=1, materia=materia))
+    db.session.add(formula)
+    db.session.commit()
+    return reactivo
+
+
+def main(repeticiones=50):
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username='bench', email='bench@bench.cl', password='x', area=Area.Lab.value)
+        db.session.add(user)
+        db.session.commit()
+
+        contador = {'commits': 0}
+        event.listen(db.engine, 'commit', lambda conn: contador.__setitem__('commits', contador['commits'] + 1))
+
+        print(f"{'ingredientes':>12} {'commits/prod':>13} {'ms/prod':>9}")
+        for nro in INGREDIENTES:
+            reactivo = crear_formula(nro, user)
+            contador['commits'] = 0
+            inicio = time.perf_counter()
+            for i in range(repeticiones):
+                producir_reactivo(reactivo, 1, i, 'benchmark', user, Area.Lab.value)
+                # En la aplicacion el commit lo hace la unidad de trabajo al terminar el request
+                db.session.commit()
+            total = time.perf_counter() - inicio
+            print(f"{nro:>12} {contador['commits'] / repeticiones:>13.1f} {total / repeticiones * 1000:>9.2f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
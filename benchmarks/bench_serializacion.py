@@ -0,0 +1,80 @@
+"""Compara el costo por fila de serializar listados con marshmallow y con las proyecciones.
+
+Uso:
+    python benchmarks/bench_serializacion.py [filas]
+
+Siembra `filas` reactivos e historiales de reactivos (con su HistorialQuimicos) y
+mide consulta + serializacion de cada listado con el schema (instancias del ORM)
+y con la proyeccion de columnas. Verifica que ambos json sean identicos. Usa
+DATABASE_URL si esta definida, si no una base SQLite temporal.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+from flasksystem import create_app, db
+from flasksystem.models import User, Reactivo, HistorialReactivos, HistorialQuimicos, Area
+from flasksystem.schema import (reactivos_schema, historiales_reactivo_schema, reactivos_proyeccion,
+                                historiales_reactivo_proyeccion)
+
+
+def sembrar(filas, lote=10000):
+    db.drop_all()
+    db.create_all()
+    db.session.add(User(username='bench', email='bench@bench.cl', password='x', area=Area.Lab.value))
+    inicio = datetime.utcnow() - timedelta(days=365)
+    for desde in range(0, filas, lote):
+        n = min(lote, filas - desde)
+        db.session.bulk_insert_mappings(Reactivo, [
+            dict(nombre=f'R{desde + i}', codigo=f'R{desde + i}', medida='Gramos', area=Area.Lab.value, cantidad=i)
+            for i in range(n)])
+        fechas = [inicio + timedelta(seconds=desde + i) for i in range(n)]
+        db.session.bulk_insert_mappings(HistorialReactivos, [
+            dict(cantidad=1, fecha_registro=f, reactivo_id=1, user_id=1, tipo='Salida', area=Area.Lab.value,
+                 lote='L1', observacion='bench') for f in fechas])
+        db.session.bulk_insert_mappings(HistorialQuimicos, [
+            dict(tipo='Reactivo', reactivo_id=desde + i + 1, fecha_registro=f, area=Area.Lab.value)
+            for i, f in enumerate(fechas)])
+    db.session.commit()
+
+
+def medir(funcion):
+    db.session.expunge_all()
+    inicio = time.perf_counter()
+    output = funcion()
+    return time.perf_counter() - inicio, json.dumps(output, sort_keys=True)
+
+
+def main(filas=100000):
+    app = create_app()
+    with app.app_context():
+        sembrar(filas)
+        casos = {
+            'reactivos': (
+                lambda: reactivos_schema.dump(Reactivo.query.order_by(Reactivo.id).all()),
+                lambda: reactivos_proyeccion.dump(reactivos_proyeccion.query().order_by(Reactivo.id).all())),
+            'historiales reactivo': (
+                lambda: historiales_reactivo_schema.dump(HistorialReactivos.query.order_by(HistorialReactivos.id).all()),
+                lambda: historiales_reactivo_proyeccion.dump(
+                    historiales_reactivo_proyeccion.query().order_by(HistorialReactivos.id).all())),
+        }
+        distintos = 0
+        print(f"{'listado':<22} {'schema us/fila':>15} {'proyeccion us/fila':>19} {'identico':>9}")
+        for nombre, (schema, proyeccion) in casos.items():
+            t_schema, json_schema = medir(schema)
+            t_proyeccion, json_proyeccion = medir(proyeccion)
+            identico = json_schema == json_proyeccion
+            distintos += not identico
+            print(f"{nombre:<22} {t_schema / filas * 1e6:>15.1f} {t_proyeccion / filas * 1e6:>19.1f} {str(identico):>9}")
+    return 1 if distintos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(a) for a in sys.argv[1:2]]))
@@ -0,0 +1,110 @@
+"""Verifica que los snapshots de stock coincidan con el stock actual.
+
+Uso:
+    python benchmarks/bench_snapshot.py
+
+Crea materias con cantidad inicial (creacion json e importacion, que no dejan
+historial), registra movimientos, los mueve al dia anterior y escribe el snapshot
+de ese dia. Como no hay movimientos posteriores, el snapshot y
+/json/lab/stock?fecha=<hoy> deben ser iguales a la cantidad actual de cada item,
+tambien despues de nuevos movimientos sobre el snapshot, y antes de la creacion
+de los items no debe informar ninguno. Usa DATABASE_URL si esta definida, si no
+una base SQLite temporal. Retorna 1 si algun item no coincide.
+"""
+import base64
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+from flasksystem import create_app, db, bcrypt
+from flasksystem.models import (User, Reactivo, Materia, Formula, Ingrediente, HistorialReactivos, HistorialMaterias,
+                                HistorialQuimicos, StockSnapshot, Area)
+from flasksystem.main.utils import escribir_snapshot
+
+# (metodo, url, json) que dejan stock sin historial o con movimientos de todos los tipos
+OPERACIONES = [
+    ('POST', '/json/lab/materia/create', {'nombre': 'Creada', 'codigo': 'C1', 'medida': 'Gramos', 'area': 'Lab',
+                                          'cantidad': 50}),
+    ('POST', '/json/lab/materia/import', [{'nombre': 'Importada', 'codigo': 'I1', 'medida': 'Gramos', 'area': 'Lab',
+                                           'cantidad': 70}]),
+    ('PUT', '/json/lab/materia/2/add', {'cantidad': 5, 'observacion': 'bench'}),
+    ('PUT', '/json/lab/materia/3/reduce', {'cantidad': 3, 'observacion': 'bench'}),
+    ('POST', '/json/lab/reactivo/1/producir', {'cantidad': 2, 'nro_analisis': 1, 'observacion': 'bench'}),
+    ('POST', '/json/lab/movimientos/batch', [{'item': 'Materia', 'id': 2, 'tipo': 'Salida', 'cantidad': 1}]),
+]
+
+
+def comparar(etiqueta, esperado, obtenido):
+    distintos = {clave: (esperado.get(clave), obtenido.get(clave)) for clave in esperado.keys() | obtenido.keys()
+                 if obtenido.get(clave) != esperado.get(clave)}
+    print(f"{etiqueta:<30} items={len(esperado)} distintos={len(distintos)} {distintos or ''}")
+    return len(distintos)
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(User(username='bench', email='bench@bench.cl', area=Area.Lab.value,
+                            password=bcrypt.generate_password_hash('bench').decode('utf-8')))
+        reactivo = Reactivo(nombre='Base', codigo='R0', medida='Gramos', area=Area.Lab.value, tiene_formula=True)
+        formula = Formula(reactivo=reactivo)
+        formula.materias.append(Ingrediente(ratio=1, materia=Materia(nombre='Base', codigo='M0', medida='Gramos',
+                                                                     cantidad=1000, area=Area.Lab.value)))
+        db.session.add(formula)
+        db.session.commit()
+
+    cliente = app.test_client()
+    credenciales = base64.b64encode(b'bench@bench.cl:bench').decode()
+    token = cliente.post('/json/login', headers={'Authorization': 'Basic ' + credenciales}).get_json()['token']
+
+    def ejecutar(operaciones):
+        for metodo, url, datos in operaciones:
+            respuesta = cliente.open(url, method=metodo, json=datos, headers={'x-access-token': token})
+            if respuesta.status_code >= 400:
+                raise RuntimeError(f'{metodo} {url}: {respuesta.status_code} {respuesta.get_data(as_text=True)}')
+
+    def actual():
+        return {(tipo, id): cantidad for tipo, modelo in (('Reactivo', Reactivo), ('Materia', Materia))
+                for id, cantidad in db.session.query(modelo.id, modelo.cantidad)}
+
+    def consultado(fecha=None):
+        fecha = fecha or hoy
+        respuesta = cliente.get(f'/json/lab/stock?fecha={fecha.isoformat()}', headers={'x-access-token': token})
+        return {(item['tipo'], item['id']): item['cantidad'] for item in respuesta.get_json()['stock']}
+
+    hoy = datetime.utcnow().date()
+    ayer = hoy - timedelta(days=1)
+    distintos = 0
+    with app.app_context():
+        ejecutar(OPERACIONES)
+        distintos += comparar('stock hoy sin snapshot', actual(), consultado())
+
+        # Los items y sus movimientos pasan a ayer para poder escribir el snapshot de un dia terminado
+        for modelo in (Reactivo, Materia, HistorialReactivos, HistorialMaterias, HistorialQuimicos):
+            for fila in modelo.query:
+                fila.fecha_registro -= timedelta(days=1)
+        db.session.commit()
+        escribir_snapshot(Area.Lab.value, ayer)
+        db.session.commit()
+        snapshot = {(fila.tipo, fila.item_id): fila.cantidad
+                    for fila in StockSnapshot.query.filter_by(area=Area.Lab.value, fecha=ayer)}
+        distintos += comparar('snapshot de ayer', actual(), snapshot)
+        distintos += comparar('stock hoy sobre snapshot', actual(), consultado())
+
+        # Stock sin historial y movimientos posteriores al snapshot
+        ejecutar(OPERACIONES)
+        distintos += comparar('stock hoy con movimientos', actual(), consultado())
+        # Antes de crear los items no hay stock que informar
+        distintos += comparar('stock antes de los items', {}, consultado(ayer - timedelta(days=1)))
+    return 1 if distintos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
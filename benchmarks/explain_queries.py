@@ -0,0 +1,101 @@
+"""Imprime el plan de ejecucion (EXPLAIN) de las consultas de cada ruta.
+
+Uso:
+    python benchmarks/explain_queries.py [filas_a_sembrar]
+
+Si se indica un numero de filas se crea el esquema y se siembran historiales
+sinteticos antes de imprimir los planes; sin argumento se usa la base de
+DATABASE_URL tal como esta.
+"""
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+from flasksystem import create_app, db
+from flasksystem.models import (User, Reactivo, Materia, Quimico, Ingrediente, HistorialReactivos,
+                                HistorialMaterias, HistorialQuimicos, Area)
+
+
+def sembrar(filas, items=1000, usuarios=20, lote=10000):
+    db.drop_all()
+    db.create_all()
+    db.session.add_all([User(username=f'explain{i}', email=f'explain{i}@explain.cl', password='x',
+                             area=Area.Lab_Bod.value) for i in range(usuarios)])
+    areas = (Area.Lab.value, Area.Bod.value)
+    db.session.bulk_insert_mappings(Reactivo, [dict(nombre=f'R{i}', codigo=f'R{i}', medida='Gramos', area=areas[i % 2])
+                                               for i in range(items)])
+    db.session.bulk_insert_mappings(Materia, [dict(nombre=f'M{i}', codigo=f'M{i}', medida='Gramos', area=areas[i % 2])
+                                              for i in range(items)])
+    inicio = datetime.utcnow() - timedelta(days=3 * 365)
+    for desde in range(0, filas, lote):
+        n = min(lote, filas - desde)
+        fechas = [inicio + timedelta(minutes=desde + i) for i in range(n)]
+        db.session.bulk_insert_mappings(HistorialReactivos, [
+            dict(cantidad=1, fecha_registro=f, reactivo_id=random.randint(1, items), user_id=random.randint(1, usuarios),
+                 tipo='Entrada', area=areas[i % 2]) for i, f in enumerate(fechas)])
+        db.session.bulk_insert_mappings(HistorialMaterias, [
+            dict(cantidad=1, fecha_registro=f, materia_id=random.randint(1, items), user_id=random.randint(1, usuarios),
+                 tipo='Entrada', area=areas[i % 2]) for i, f in enumerate(fechas)])
+        db.session.bulk_insert_mappings(HistorialQuimicos, [
+            dict(tipo='Reactivo', reactivo_id=desde + i + 1, fecha_registro=f, area=areas[i % 2])
+            for i, f in enumerate(fechas)])
+    db.session.commit()
+    db.session.execute('ANALYZE')
+    db.session.commit()
+
+
+def consultas():
+    lab = Area.Lab.value
+    return {
+        'reactivos de un area': db.session.query(Reactivo).filter(Reactivo.area == lab).order_by(Reactivo.id),
+        'materias de un area': db.session.query(Materia).filter(Materia.area == lab).order_by(Materia.id),
+        'quimicos de un area': Quimico.query.filter_by(area=lab),
+        'historial reactivos de un area': HistorialReactivos.query.filter_by(area=lab)
+            .order_by(HistorialReactivos.fecha_registro.desc(), HistorialReactivos.id.desc()).limit(51),
+        'historial de un reactivo': HistorialReactivos.query.filter_by(reactivo_id=1)
+            .order_by(HistorialReactivos.fecha_registro.desc(), HistorialReactivos.id.desc()).limit(51),
+        'historial materias de un area': HistorialMaterias.query.filter_by(area=lab)
+            .order_by(HistorialMaterias.fecha_registro.desc(), HistorialMaterias.id.desc()).limit(51),
+        'historial de una materia': HistorialMaterias.query.filter_by(materia_id=1)
+            .order_by(HistorialMaterias.fecha_registro.desc(), HistorialMaterias.id.desc()).limit(51),
+        'historial quimicos de un area': HistorialQuimicos.query.filter_by(area=lab)
+            .order_by(HistorialQuimicos.fecha_registro.desc()),
+        'historial quimicos total': HistorialQuimicos.query.order_by(HistorialQuimicos.fecha_registro.desc()),
+        'historial reactivos de un usuario en un area': HistorialReactivos.query.filter_by(area=lab, user_id=1)
+            .order_by(HistorialReactivos.fecha_registro.desc(), HistorialReactivos.id.desc()).limit(51),
+        'historial materias de un usuario en un area': HistorialMaterias.query.filter_by(area=lab, user_id=1)
+            .order_by(HistorialMaterias.fecha_registro.desc(), HistorialMaterias.id.desc()).limit(51),
+        'ingredientes de una formula': Ingrediente.query.filter_by(formula_id=1),
+        'quimicos de un historial': HistorialQuimicos.query.filter_by(reactivo_id=1),
+    }
+
+
+def explicar(query):
+    compilado = query.statement.compile(dialect=db.engine.dialect)
+    if compilado.positional:
+        params = tuple(compilado.params[nombre] for nombre in compilado.positiontup)
+    else:
+        params = compilado.params
+    prefijo = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    return db.session.connection().execute(prefijo + str(compilado), params).fetchall()
+
+
+def main(filas=None):
+    app = create_app()
+    with app.app_context():
+        if filas:
+            sembrar(filas)
+        for nombre, query in consultas().items():
+            print(f'--- {nombre}')
+            for fila in explicar(query):
+                print('   ', ' | '.join(str(col) for col in fila))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else None)
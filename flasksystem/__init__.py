@@ -20,6 +20,7 @@ from flasksystem.materias.routes import materias
 from flasksystem.reactivos.routes import reactivos
 from flasksystem.users.routes import users
 from flasksystem.errors.handlers import errors
+from flasksystem.cache import cache_respuestas
 
 
 def create_app(config_class=Config):
@@ -31,6 +32,7 @@ def create_app(config_class=Config):
     login_manager.init_app(app)
     migrate.init_app(app, db)
     ma.init_app(app)
+    cache_respuestas.init_app(app)
 
     app.register_blueprint(main)
     app.register_blueprint(materias)
@@ -0,0 +1,294 @@
+import bisect
+import heapq
+import threading
+import unicodedata
+from array import array
+from sqlalchemy import event, select, text
+from sqlalchemy.orm.attributes import get_history
+from flasksystem import db
+from flasksystem.models import Reactivo, Materia, CatalogoVersion
+from flasksystem.cache import AREAS_CATALOGO
+
+BUSQUEDA_LIMITE = 20
+BUSQUEDA_MAXIMO = 100
+
+_MODELOS_BUSQUEDA = {Reactivo: 'Reactivo', Materia: 'Materia'}
+_CAMPOS_BUSQUEDA = ('nombre', 'codigo', 'medida', 'area')
+
+def normalizar(texto):
+    # Minusculas y sin tildes, 'Ácido' y 'acido' deben coincidir
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+def trigramas(texto):
+    # Cada palabra se rellena como en pg_trgm ('  palabra ') para que los prefijos cortos tengan trigramas
+    resultado = set()
+    for palabra in texto.split():
+        palabra = f'  {palabra} '
+        resultado.update(palabra[i:i + 3] for i in range(len(palabra) - 2))
+    return resultado
+
+def trigramas_consulta(palabra):
+    # Con 3 o mas letras se busca como substring, con menos como prefijo de alguna palabra
+    if len(palabra) >= 3:
+        return {palabra[i:i + 3] for i in range(len(palabra) - 2)}
+    palabra = f'  {palabra}'
+    return {palabra[i:i + 3] for i in range(len(palabra) - 2)}
+
+def coincide(palabra, texto):
+    if len(palabra) >= 3:
+        return palabra in texto
+    return f' {texto}'.find(f' {palabra}') >= 0
+
+class IndiceBusqueda:
+    """Indice de trigramas en memoria sobre nombre y codigo de los reactivos y materias de un area.
+
+    Cada trigrama guarda un array con las posiciones de los items que lo contienen.
+    Una busqueda recorre solo la lista del trigrama menos frecuente de la consulta y
+    verifica cada candidato. Los prefijos de una o dos letras, que coinciden con
+    gran parte del catalogo, usan un ranking ya ordenado por prefijo que se arma
+    la primera vez que se consulta y se mantiene al agregar items. Los items modificados o eliminados dejan su posicion vacia; el
+    indice se reconstruye cuando hay demasiadas.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.lock = threading.Lock()
+        # (tipo, id, nombre, codigo, medida, texto, nombre normalizado, codigo normalizado) o None
+        self._items = []
+        self._posiciones = {}
+        self._trigramas = {}
+        # (nombre o codigo normalizado, posicion) ordenados, para los prefijos cortos
+        self._nombres = []
+        self._codigos = []
+        # prefijo de 1 o 2 letras -> [(clave de orden, posicion)] ordenado
+        self._rankings = {}
+        self._eliminados = 0
+
+    def __len__(self):
+        return len(self._posiciones)
+
+    @property
+    def fragmentado(self):
+        return self._eliminados > max(len(self._items) // 4, 1000)
+
+    def agregar(self, tipo, id, nombre, codigo, medida, ordenar=True):
+        # Al construir el indice completo se usa ordenar=False y luego ordenar() una sola vez
+        self.quitar(tipo, id)
+        nombre_normalizado, codigo_normalizado = normalizar(nombre), normalizar(codigo)
+        texto = f'{nombre_normalizado} {codigo_normalizado}'
+        posicion = len(self._items)
+        self._items.append((tipo, id, nombre, codigo, medida, texto, nombre_normalizado, codigo_normalizado))
+        self._posiciones[(tipo, id)] = posicion
+        for trigrama in trigramas(texto):
+            posiciones = self._trigramas.get(trigrama)
+            if posiciones is None:
+                posiciones = self._trigramas[trigrama] = array('L')
+            posiciones.append(posicion)
+        if ordenar:
+            bisect.insort(self._nombres, (nombre_normalizado, posicion))
+            bisect.insort(self._codigos, (codigo_normalizado, posicion))
+            for prefijo in {nombre_normalizado[:1], nombre_normalizado[:2], codigo_normalizado[:1],
+                            codigo_normalizado[:2]}:
+                if prefijo in self._rankings:
+                    bisect.insort(self._rankings[prefijo], (self._orden(posicion, prefijo), posicion))
+        else:
+            self._nombres.append((nombre_normalizado, posicion))
+            self._codigos.append((codigo_normalizado, posicion))
+
+    def ordenar(self):
+        self._nombres.sort()
+        self._codigos.sort()
+
+    def quitar(self, tipo, id):
+        posicion = self._posiciones.pop((tipo, id), None)
+        if posicion is not None:
+            self._items[posicion] = None
+            self._eliminados += 1
+
+    def _orden(self, posicion, consulta):
+        # Primero el codigo exacto, luego los que empiezan con la consulta y despues el resto
+        item = self._items[posicion]
+        if item[7] == consulta:
+            orden = 0
+        elif item[6].startswith(consulta) or item[7].startswith(consulta):
+            orden = 1
+        else:
+            orden = 2
+        return (orden, len(item[6]), item[6], item[0], item[1])
+
+    def _candidato(self, posicion, consulta, palabras, tipo):
+        item = self._items[posicion]
+        if item is None or (tipo and item[0] != tipo):
+            return None
+        if not all(coincide(palabra, item[5]) for palabra in palabras):
+            return None
+        return (self._orden(posicion, consulta), item)
+
+    def _prefijo(self, ordenados, consulta):
+        i = bisect.bisect_left(ordenados, (consulta,))
+        while i < len(ordenados) and ordenados[i][0].startswith(consulta):
+            yield ordenados[i][1]
+            i += 1
+
+    def _ranking(self, prefijo):
+        ranking = self._rankings.get(prefijo)
+        if ranking is None:
+            posiciones = set(self._prefijo(self._nombres, prefijo)) | set(self._prefijo(self._codigos, prefijo))
+            ranking = self._rankings[prefijo] = sorted((self._orden(p, prefijo), p) for p in posiciones
+                                                       if self._items[p] is not None)
+        return ranking
+
+    def _resultados(self, candidatos, limite):
+        return [{'tipo': item[0], 'id': item[1], 'nombre': item[2], 'codigo': item[3], 'medida': item[4]}
+                for _, item in heapq.nsmallest(limite, candidatos, key=lambda candidato: candidato[0])]
+
+    def buscar(self, consulta, limite=BUSQUEDA_LIMITE, tipo=None):
+        consulta = normalizar(consulta).strip()
+        palabras = consulta.split()
+        if not palabras:
+            return []
+        if len(palabras) == 1 and len(consulta) < 3:
+            # Si hay suficientes nombres o codigos que empiezan con la consulta, son los mejores resultados
+            candidatos = []
+            for orden, posicion in self._ranking(consulta):
+                item = self._items[posicion]
+                if item is not None and (not tipo or item[0] == tipo):
+                    candidatos.append((orden, item))
+                    if len(candidatos) == limite:
+                        return self._resultados(candidatos, limite)
+
+        listas = []
+        for palabra in palabras:
+            for trigrama in trigramas_consulta(palabra):
+                posiciones = self._trigramas.get(trigrama)
+                if posiciones is None:
+                    return []
+                listas.append(posiciones)
+
+        candidatos = [c for c in (self._candidato(p, consulta, palabras, tipo) for p in min(listas, key=len)) if c]
+        return self._resultados(candidatos, limite)
+
+# Indice de cada area en este proceso y lock para que solo un request lo construya
+_indices = {}
+_construccion_lock = threading.Lock()
+
+def _clave_version(area):
+    return f'busqueda:{area}'
+
+def version_busqueda(area):
+    version = db.session.execute(select([CatalogoVersion.version])
+                                 .where(CatalogoVersion.area == _clave_version(area))).scalar()
+    return version or 0
+
+def construir_indice(area, version):
+    indice = IndiceBusqueda(version)
+    for modelo, tipo in _MODELOS_BUSQUEDA.items():
+        filas = (db.session.query(modelo.id, modelo.nombre, modelo.codigo, modelo.medida)
+                 .filter(modelo.area == area).order_by(modelo.id))
+        for fila in filas:
+            indice.agregar(tipo, *fila, ordenar=False)
+    indice.ordenar()
+    return indice
+
+def buscar(area, consulta, limite=BUSQUEDA_LIMITE, tipo=None):
+    """Top `limite` reactivos y materias del area cuyo nombre o codigo contienen `consulta`.
+
+    El indice se construye en la primera busqueda del proceso y se reconstruye si
+    otro proceso cambio el catalogo (version de busqueda distinta).
+    """
+    version = version_busqueda(area)
+    indice = _indices.get(area)
+    if indice is None or indice.version != version or indice.fragmentado:
+        with _construccion_lock:
+            indice = _indices.get(area)
+            if indice is None or indice.version != version or indice.fragmentado:
+                indice = _indices[area] = construir_indice(area, version)
+    with indice.lock:
+        return indice.buscar(consulta, limite, tipo)
+
+def busqueda_modificada(area):
+    # Para cambios que no pasan por el flush del ORM (bulk inserts): el indice del area se reconstruye
+    db.session.info.setdefault('busqueda', {})[area] = None
+
+def _registrar(session, area, operacion):
+    cambios = session.info.setdefault('busqueda', {})
+    if area not in cambios:
+        cambios[area] = []
+    if cambios[area] is not None:
+        cambios[area].append(operacion)
+
+@event.listens_for(db.session, 'after_flush')
+def _busqueda_after_flush(session, flush_context):
+    for obj in session.new:
+        tipo = _MODELOS_BUSQUEDA.get(type(obj))
+        if tipo:
+            _registrar(session, obj.area, ('agregar', tipo, obj.id, obj.nombre, obj.codigo, obj.medida))
+    for obj in session.dirty:
+        tipo = _MODELOS_BUSQUEDA.get(type(obj))
+        if not tipo or not any(get_history(obj, campo).has_changes() for campo in _CAMPOS_BUSQUEDA):
+            continue
+        for area in get_history(obj, 'area').deleted:
+            _registrar(session, area, ('quitar', tipo, obj.id))
+        _registrar(session, obj.area, ('agregar', tipo, obj.id, obj.nombre, obj.codigo, obj.medida))
+    for obj in session.deleted:
+        tipo = _MODELOS_BUSQUEDA.get(type(obj))
+        if tipo:
+            _registrar(session, obj.area, ('quitar', tipo, obj.id))
+
+@event.listens_for(db.session, 'after_bulk_delete')
+def _busqueda_after_bulk_delete(contexto):
+    tipo = _MODELOS_BUSQUEDA.get(contexto.mapper.class_)
+    if not tipo:
+        return
+    # Con synchronize_session='evaluate' se conocen los objetos eliminados, si no se reconstruye todo
+    eliminados = getattr(contexto, 'matched_objects', None)
+    if eliminados is None:
+        for area in AREAS_CATALOGO:
+            contexto.session.info.setdefault('busqueda', {})[area] = None
+        return
+    for obj in eliminados:
+        _registrar(contexto.session, obj.area, ('quitar', tipo, obj.id))
+
+@event.listens_for(db.session, 'after_bulk_update')
+def _busqueda_after_bulk_update(contexto):
+    campos = {getattr(campo, 'key', campo) for campo in contexto.values}
+    if contexto.mapper.class_ in _MODELOS_BUSQUEDA and campos & set(_CAMPOS_BUSQUEDA):
+        for area in AREAS_CATALOGO:
+            contexto.session.info.setdefault('busqueda', {})[area] = None
+
+@event.listens_for(db.session, 'before_commit')
+def _incrementar_version_busqueda(session):
+    session.flush()
+    confirmados = []
+    for area, operaciones in session.info.pop('busqueda', {}).items():
+        clave = _clave_version(area)
+        session.execute(text("INSERT INTO catalogo_version (area, version) VALUES (:area, 1) "
+                             "ON CONFLICT (area) DO UPDATE SET version = catalogo_version.version + 1"),
+                        {'area': clave})
+        version = session.execute(select([CatalogoVersion.version]).where(CatalogoVersion.area == clave)).scalar()
+        confirmados.append((area, version, operaciones))
+    if confirmados:
+        session.info['busqueda_confirmada'] = confirmados
+
+@event.listens_for(db.session, 'after_commit')
+def _actualizar_indices(session):
+    # Si nadie mas cambio el catalogo se aplican los cambios al indice, si no se reconstruira al buscar
+    for area, version, operaciones in session.info.pop('busqueda_confirmada', ()):
+        indice = _indices.get(area)
+        if indice is None or operaciones is None:
+            continue
+        with indice.lock:
+            if indice.version != version - 1:
+                continue
+            for operacion in operaciones:
+                if operacion[0] == 'agregar':
+                    indice.agregar(*operacion[1:])
+                else:
+                    indice.quitar(*operacion[1:])
+            indice.version = version
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_busqueda(session):
+    session.info.pop('busqueda', None)
+    session.info.pop('busqueda_confirmada', None)
@@ -0,0 +1,292 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response, abort, current_app, g
+from sqlalchemy import event, inspect, select, text
+from flasksystem import db
+from flasksystem.models import Reactivo, Materia, Quimico, Formula, Ingrediente, CatalogoVersion, Area
+from flasksystem.main.utils import AREAS_URL
+
+AREAS_CATALOGO = (Area.Lab.value, Area.Bod.value)
+
+# Modelos cuyos cambios invalidan el catalogo. Formula e Ingrediente no tienen area e invalidan todas
+_MODELOS_CATALOGO = (Reactivo, Materia, Quimico, Formula, Ingrediente)
+
+# Prefijo de la version propia de cada item en catalogo_version ('R:<id>', 'M:<id>') y su parametro en la url
+ITEMS_CACHE = {'Reactivo': ('R', 'reactivo_id'), 'Materia': ('M', 'materia_id')}
+
+# Columnas de materia que aparecen en las formulas (ingredientes_formula)
+_COLUMNAS_FORMULA = ('nombre', 'medida')
+
+def clave_item(tipo, id):
+    return f'{ITEMS_CACHE[tipo][0]}:{id}'
+
+def clave_items(area):
+    # Generacion de todas las respuestas por item del area, aumenta con cambios masivos sin items conocidos
+    return f'items:{area}'
+
+def clave_formulas(area):
+    return f'formulas:{area}'
+
+def version_catalogo(area):
+    version = db.session.execute(select([CatalogoVersion.version]).where(CatalogoVersion.area == area)).scalar()
+    return version or 0
+
+def versiones_catalogo(claves):
+    filas = db.session.execute(select([CatalogoVersion.area, CatalogoVersion.version])
+                               .where(CatalogoVersion.area.in_(claves)))
+    versiones = dict(filas.fetchall())
+    return [versiones.get(clave, 0) for clave in claves]
+
+def etag_catalogo(f):
+    """Responde 304 Not Modified si el cliente ya tiene la version vigente del catalogo del area.
+
+    El ETag se calcula con la version del area y la url, sin cargar nada con el ORM.
+    El area se toma de la url (/json/<area>/...). Va despues de @token_required.
+    """
+    @wraps(f)
+    def decorated(usuario_actual, *args, **kwargs):
+        area = AREAS_URL.get(request.path.split('/')[2])
+        if area is None:
+            return abort(404)
+        if usuario_actual.area != area and usuario_actual.area != Area.Lab_Bod.value:
+            return abort(403)
+
+        g.area_catalogo = area
+        g.version_catalogo = version_catalogo(area)
+        etag = hashlib.md5(f'{g.version_catalogo}:{request.full_path}'.encode()).hexdigest()
+        if request.if_none_match.contains(etag):
+            respuesta = make_response('', 304)
+        else:
+            respuesta = make_response(f(usuario_actual, *args, **kwargs))
+            if respuesta.status_code != 200:
+                return respuesta
+        respuesta.set_etag(etag)
+        respuesta.headers['Cache-Control'] = 'private, no-cache'
+        return respuesta
+    return decorated
+
+class CacheLocal:
+    """LRU en proceso acotado por el tamaño total (en bytes) de las respuestas guardadas."""
+
+    def __init__(self, maximo_bytes):
+        self.maximo_bytes = maximo_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.desalojos = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            valor = self._entradas.get(clave)
+            if valor is None:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.hits += 1
+            return valor
+
+    def set(self, clave, valor):
+        tamano = len(clave) + len(valor)
+        if tamano > self.maximo_bytes:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self.bytes -= len(clave) + len(anterior)
+            self._entradas[clave] = valor
+            self.bytes += tamano
+            while self.bytes > self.maximo_bytes:
+                vieja, valor_viejo = self._entradas.popitem(last=False)
+                self.bytes -= len(vieja) + len(valor_viejo)
+                self.desalojos += 1
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'local', 'hits': self.hits, 'misses': self.misses, 'ratio': _ratio(self.hits, self.misses),
+                    'entradas': len(self._entradas), 'bytes': self.bytes, 'maximo_bytes': self.maximo_bytes,
+                    'desalojos': self.desalojos}
+
+class ClienteMemoria:
+    """Reemplazo local de un cliente redis (get, set con ex e info) para desarrollo y pruebas."""
+
+    def __init__(self):
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            valor, vence = self._datos.get(clave, (None, None))
+            if vence is not None and vence <= time.time():
+                del self._datos[clave]
+                return None
+            return valor
+
+    def set(self, clave, valor, ex=None):
+        with self._lock:
+            self._datos[clave] = (valor, time.time() + ex if ex else None)
+
+    def info(self, seccion=None):
+        with self._lock:
+            return {'used_memory': sum(len(clave) + len(valor) for clave, (valor, _) in self._datos.items())}
+
+class CacheCompartido:
+    """Cache compartido entre procesos sobre un cliente con la interfaz de redis.
+
+    Las claves antiguas no se borran, expiran por TTL al cambiar la version del catalogo.
+    """
+
+    def __init__(self, cliente, ttl):
+        self.cliente = cliente
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, clave):
+        valor = self.cliente.get(clave)
+        if valor is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return valor
+
+    def set(self, clave, valor):
+        self.cliente.set(clave, valor, ex=self.ttl)
+
+    def stats(self):
+        return {'backend': 'compartido', 'hits': self.hits, 'misses': self.misses,
+                'ratio': _ratio(self.hits, self.misses), 'bytes': self.cliente.info('memory').get('used_memory')}
+
+def _ratio(hits, misses):
+    return round(hits / (hits + misses), 4) if hits + misses else None
+
+class CacheRespuestas:
+    """Extension que crea el backend del cache de respuestas segun la configuracion de la app."""
+
+    def init_app(self, app):
+        if app.config['RESPUESTAS_CACHE'] == 'compartido':
+            if app.config['RESPUESTAS_CACHE_URL']:
+                import redis
+                cliente = redis.Redis.from_url(app.config['RESPUESTAS_CACHE_URL'])
+            else:
+                cliente = ClienteMemoria()
+            backend = CacheCompartido(cliente, app.config['RESPUESTAS_CACHE_TTL'])
+        else:
+            backend = CacheLocal(app.config['RESPUESTAS_CACHE_BYTES'])
+        app.extensions['cache_respuestas'] = backend
+
+    @property
+    def backend(self):
+        return current_app.extensions['cache_respuestas']
+
+cache_respuestas = CacheRespuestas()
+
+def cache_respuesta(f):
+    """Guarda el cuerpo json de las respuestas 200 y lo reutiliza mientras no cambie el catalogo del area.
+
+    Para los listados del area: la clave incluye la version del catalogo, asi cualquier ruta
+    que modifique el area deja obsoletas sus respuestas al hacer commit. Los detalles de un
+    item usan cache_respuesta_item. Va despues de @etag_catalogo.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        clave = f'respuesta:{g.version_catalogo}:{request.full_path}'
+        cuerpo = cache_respuestas.backend.get(clave)
+        if cuerpo is not None:
+            return current_app.response_class(cuerpo, mimetype='application/json')
+        respuesta = make_response(f(*args, **kwargs))
+        if respuesta.status_code == 200:
+            cache_respuestas.backend.set(clave, respuesta.get_data())
+        return respuesta
+    return decorated
+
+def cache_respuesta_item(tipo, formula=False):
+    """Como cache_respuesta, pero para el detalle de un item: la clave usa la version propia del item.
+
+    Asi un movimiento de stock solo deja obsoletas las respuestas del item movido y no las de
+    todo el area. Con `formula` la clave tambien incluye la version de las formulas del area.
+    Va despues de @etag_catalogo.
+    """
+    def decorador(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            area = g.area_catalogo
+            claves = [clave_items(area), clave_item(tipo, kwargs[ITEMS_CACHE[tipo][1]])]
+            if formula:
+                claves.append(clave_formulas(area))
+            versiones = ':'.join(str(version) for version in versiones_catalogo(claves))
+            clave = f'respuesta:{versiones}:{request.full_path}'
+            cuerpo = cache_respuestas.backend.get(clave)
+            if cuerpo is not None:
+                return current_app.response_class(cuerpo, mimetype='application/json')
+            respuesta = make_response(f(*args, **kwargs))
+            if respuesta.status_code == 200:
+                cache_respuestas.backend.set(clave, respuesta.get_data())
+            return respuesta
+        return decorated
+    return decorador
+
+def _areas_modificadas(session):
+    return session.info.setdefault('areas_modificadas', set())
+
+def catalogo_modificado(area, items=None):
+    """Para cambios que no pasan por el flush del ORM (bulk inserts, INSERT ... SELECT).
+
+    `items` son los (tipo, id) modificados, sin ellos se invalidan todas las respuestas por item del area.
+    """
+    versiones = _areas_modificadas(db.session)
+    versiones.add(area)
+    if items is None:
+        versiones.add(clave_items(area))
+    else:
+        versiones.update(clave_item(tipo, id) for tipo, id in items)
+
+@event.listens_for(db.session, 'after_flush')
+def _catalogo_after_flush(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, _MODELOS_CATALOGO):
+            continue
+        # Agregar historiales a un reactivo o materia solo modifica sus colecciones
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        area = getattr(obj, 'area', None)
+        versiones = _areas_modificadas(session)
+        versiones.update([area] if area else AREAS_CATALOGO)
+        if isinstance(obj, (Reactivo, Materia)):
+            versiones.add(clave_item(type(obj).__name__, obj.id))
+            # Las formulas muestran nombre y medida de sus materias
+            if isinstance(obj, Materia) and obj in session.dirty and any(
+                    inspect(obj).attrs[columna].history.has_changes() for columna in _COLUMNAS_FORMULA):
+                versiones.add(clave_formulas(area))
+        elif isinstance(obj, (Formula, Ingrediente)):
+            versiones.update(clave_formulas(area) for area in AREAS_CATALOGO)
+
+@event.listens_for(db.session, 'after_bulk_update')
+@event.listens_for(db.session, 'after_bulk_delete')
+def _catalogo_after_bulk(contexto):
+    # Sin saber que filas cambiaron se invalidan todas las respuestas del catalogo
+    clase = contexto.mapper.class_
+    if clase in _MODELOS_CATALOGO:
+        versiones = _areas_modificadas(contexto.session)
+        versiones.update(AREAS_CATALOGO)
+        if clase in (Reactivo, Materia):
+            versiones.update(clave_items(area) for area in AREAS_CATALOGO)
+        if clase in (Materia, Formula, Ingrediente):
+            versiones.update(clave_formulas(area) for area in AREAS_CATALOGO)
+
+@event.listens_for(db.session, 'before_commit')
+def _incrementar_versiones(session):
+    # La version se incrementa en la misma transaccion que los cambios, una vez por commit
+    session.flush()
+    for area in sorted(session.info.pop('areas_modificadas', ())):
+        session.execute(text("INSERT INTO catalogo_version (area, version) VALUES (:area, 1) "
+                             "ON CONFLICT (area) DO UPDATE SET version = catalogo_version.version + 1"),
+                        {'area': area})
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_areas_modificadas(session):
+    session.info.pop('areas_modificadas', None)
@@ -3,4 +3,16 @@ import os
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Costo de bcrypt, los hashes guardados con otro costo se recalculan al iniciar sesion
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    # Hilos que calculan hashes y cuantas solicitudes pueden esperar antes de responder 503
+    BCRYPT_HILOS = int(os.environ.get('BCRYPT_HILOS', 4))
+    BCRYPT_COLA = int(os.environ.get('BCRYPT_COLA', 16))
+    # Segundos que un request espera su hash antes de responder 503
+    BCRYPT_ESPERA = float(os.environ.get('BCRYPT_ESPERA', 10))
+    # Cache de respuestas json: 'local' (LRU en proceso) o 'compartido' (cliente redis en RESPUESTAS_CACHE_URL)
+    RESPUESTAS_CACHE = os.environ.get('RESPUESTAS_CACHE', 'local')
+    RESPUESTAS_CACHE_BYTES = int(os.environ.get('RESPUESTAS_CACHE_BYTES', 32 * 1024 * 1024))
+    RESPUESTAS_CACHE_URL = os.environ.get('RESPUESTAS_CACHE_URL')
+    RESPUESTAS_CACHE_TTL = int(os.environ.get('RESPUESTAS_CACHE_TTL', 3600))
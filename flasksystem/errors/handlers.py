@@ -2,6 +2,10 @@ from flask import Blueprint, render_template, jsonify
 
 errors = Blueprint('errors', __name__)
 
+@errors.app_errorhandler(400)
+def error_400(error):
+    return jsonify({'error': 'Solicitud invalida'}), 400
+
 @errors.app_errorhandler(403)
 def error_403(error):
     return jsonify({'error': 'No tienes permisos para hacer esto'}), 403
@@ -17,3 +21,7 @@ def error_405(error):
 @errors.app_errorhandler(500)
 def error_500(error):
     return jsonify({'error': 'Algo salio mal'}), 500
+
+@errors.app_errorhandler(503)
+def error_503(error):
+    return jsonify({'error': 'Servicio ocupado, intenta nuevamente'}), 503, {'Retry-After': '1'}
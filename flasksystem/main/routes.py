@@ -1,9 +1,18 @@
-from flask import render_template, url_for, redirect, request, Blueprint
+from flask import (render_template, url_for, redirect, request, abort, Blueprint, jsonify, Response,
+                   stream_with_context)
 from flask_login import current_user, login_required
-from flasksystem.models import HistorialQuimicos, Quimico, Area
-from flasksystem.main.utils import check_lab, check_bod
+from flasksystem.models import HistorialQuimicos, Materia, Area
+from flasksystem.main.utils import (check_lab, check_bod, cargar_relaciones_historial, paginar, inventario, bajo_stock,
+                                    json_check_area, exportar_historial, fecha_parametro, tipos_parametro,
+                                    registrar_movimientos, confirmar_sesion, areas_usuario, genealogia_lote,
+                                    lotes_materia, entero_parametro, stock_en_fecha)
+from flasksystem.users.routes import token_required
+from flasksystem.cache import etag_catalogo, cache_respuesta, cache_respuestas, catalogo_modificado
+from flasksystem.users.utils import principales
+from flasksystem.busqueda import buscar, BUSQUEDA_LIMITE, BUSQUEDA_MAXIMO
 
 main = Blueprint('main', __name__)
+main.after_request(confirmar_sesion)
 
 @main.route("/")
 def index():
@@ -28,33 +37,114 @@ def about():
 @main.route("/home/historial")
 @login_required
 def home_historial():
-    historiales = HistorialQuimicos.query.order_by(HistorialQuimicos.fecha_registro.desc()).all()
-    return render_template('ver_historial.html', historiales=historiales)
+    historiales, cursor = paginar(cargar_relaciones_historial(HistorialQuimicos.query), HistorialQuimicos)
+    return render_template('ver_historial.html', historiales=historiales, cursor=cursor)
 
 @main.route("/lab")
 @login_required
 def lab_home():
     check_lab()
-    quimicos = Quimico.query.filter_by(area=Area.Lab.value).all()
+    quimicos = inventario(Area.Lab.value)
     return render_template('lab/home.html', title='Lab Home', quimicos=quimicos, area='Lab', user=current_user)
 
 @main.route("/lab/historial")
 @login_required
 def lab_home_historial():
     check_lab()
-    historiales = HistorialQuimicos.query.filter_by(area=Area.Lab.value).order_by(HistorialQuimicos.fecha_registro.desc()).all()
-    return render_template('ver_historial.html', historiales=historiales, area='Lab')
+    historiales, cursor = paginar(cargar_relaciones_historial(HistorialQuimicos.query.filter_by(area=Area.Lab.value)), HistorialQuimicos)
+    return render_template('ver_historial.html', historiales=historiales, cursor=cursor, area='Lab')
 
 @main.route("/bod")
 @login_required
 def bod_home():
     check_bod()
-    quimicos = Quimico.query.filter_by(area=Area.Bod.value).all()
+    quimicos = inventario(Area.Bod.value)
     return render_template('bod/home.html', title='Bod Home', quimicos=quimicos, area='Bod', user=current_user)
 
 @main.route("/bod/historial")
 @login_required
 def bod_home_historial():
     check_bod()
-    historiales = HistorialQuimicos.query.filter_by(area=Area.Bod.value).order_by(HistorialQuimicos.fecha_registro.desc()).all()
-    return render_template('ver_historial.html', historiales=historiales, area='Bod')
\ No newline at end of file
+    historiales, cursor = paginar(cargar_relaciones_historial(HistorialQuimicos.query.filter_by(area=Area.Bod.value)), HistorialQuimicos)
+    return render_template('ver_historial.html', historiales=historiales, cursor=cursor, area='Bod')
+
+@main.route("/json/<area>/bajo-stock")
+@token_required
+@etag_catalogo
+@cache_respuesta
+def json_bajo_stock(usuario_actual, area):
+    area = json_check_area(usuario_actual, area)
+    output = [dict(fila) for fila in bajo_stock(area)]
+    return jsonify({'bajo_stock': output})
+
+@main.route("/json/<area>/historial/export")
+@token_required
+def json_exportar_historial(usuario_actual, area):
+    area = json_check_area(usuario_actual, area)
+    lineas = exportar_historial(area, desde=fecha_parametro('desde'), hasta=fecha_parametro('hasta', fin_de_dia=True),
+                                tipos=tipos_parametro())
+    return Response(stream_with_context(lineas), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename=historial_{area.lower()}.ndjson'})
+
+@main.route("/json/<area>/movimientos/batch", methods=['POST'])
+@token_required
+def json_movimientos_batch(usuario_actual, area):
+    area = json_check_area(usuario_actual, area)
+
+    movimientos = request.get_json()
+    if not movimientos or not isinstance(movimientos, list):
+        return jsonify({'mensaje': 'Invalid request'}), 400
+
+    stock, errores = registrar_movimientos(area, usuario_actual.id, movimientos)
+    if errores:
+        return jsonify({'mensaje': 'No se registro ningun movimiento', 'errores': errores}), 422
+    catalogo_modificado(area, items=[(fila['item'], fila['id']) for fila in stock])
+    return jsonify({'mensaje': f'Se registraron {len(movimientos)} movimientos', 'movimientos': len(movimientos),
+                    'stock': stock})
+
+@main.route("/json/<area>/buscar")
+@token_required
+def json_buscar(usuario_actual, area):
+    area = json_check_area(usuario_actual, area)
+    consulta = request.args.get('q', '').strip()
+    tipo = request.args.get('tipo')
+    if not consulta or tipo not in (None, 'Reactivo', 'Materia'):
+        return jsonify({'mensaje': 'Invalid request'}), 400
+    limite = min(max(request.args.get('limit', BUSQUEDA_LIMITE, type=int), 1), BUSQUEDA_MAXIMO)
+    return jsonify({'resultados': buscar(area, consulta, limite, tipo)})
+
+@main.route("/json/lote/<lote>")
+@token_required
+def json_lote(usuario_actual, lote):
+    movimientos = genealogia_lote(lote, areas_usuario(usuario_actual))
+    if not movimientos:
+        return jsonify({'mensaje': 'No se encontro el lote'}), 404
+    return jsonify({'lote': lote, 'movimientos': movimientos})
+
+@main.route("/json/<area>/materia/<int:materia_id>/lotes")
+@token_required
+def json_lotes_materia(usuario_actual, area, materia_id):
+    area = json_check_area(usuario_actual, area)
+    materia = Materia.query.get_or_404(materia_id)
+    if materia.area != area:
+        return abort(403)
+    lotes = lotes_materia(materia.id, desde=fecha_parametro('desde'), hasta=fecha_parametro('hasta', fin_de_dia=True))
+    return jsonify({'materia_id': materia.id, 'lotes': lotes})
+
+@main.route("/json/<area>/stock")
+@token_required
+def json_stock(usuario_actual, area):
+    area = json_check_area(usuario_actual, area)
+    fecha = fecha_parametro('fecha', fin_de_dia=True)
+    tipo = request.args.get('tipo')
+    item_id = entero_parametro('id')
+    if fecha is None or tipo not in (None, 'Reactivo', 'Materia') or (item_id is not None and tipo is None):
+        return jsonify({'mensaje': 'Invalid request'}), 400
+    snapshot, stock = stock_en_fecha(area, fecha, tipos=(tipo,) if tipo else ('Reactivo', 'Materia'), item_id=item_id)
+    return jsonify({'fecha': fecha.isoformat(), 'snapshot': snapshot.isoformat() if snapshot else None,
+                    'stock': stock})
+
+@main.route("/json/cache/stats")
+@token_required
+def json_cache_stats(usuario_actual):
+    return jsonify({'principales': principales.stats(), 'respuestas': cache_respuestas.backend.stats()})
@@ -1,5 +1,35 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
 from flask_login import current_user
-from flask import abort
+from flask import abort, request, jsonify, url_for
+from sqlalchemy import or_, and_, exists, literal, null, select, union_all, func, case
+from sqlalchemy.orm import joinedload, contains_eager
+from marshmallow import ValidationError
+from flasksystem import db
+from flasksystem.models import (Quimico, Materia, Reactivo, HistorialQuimicos, HistorialMaterias,
+                                HistorialReactivos, StockSnapshot, Area)
+
+LIMITE_PAGINA = 50
+LIMITE_PAGINA_MAXIMO = 500
+
+AREAS_URL = {'lab': Area.Lab.value, 'bod': Area.Bod.value}
+
+# Las producciones se registran como 'Produccion' en reactivos y 'Producción' en materias
+TIPOS_EQUIVALENTES = {'Produccion': ('Produccion', 'Producción'), 'Producción': ('Produccion', 'Producción')}
+
+def confirmar_sesion(response):
+    """Unidad de trabajo por request: un solo commit si la respuesta no es un error (status < 400), si no rollback."""
+    if response.is_streamed:
+        # Las respuestas en streaming solo leen y su cursor sigue abierto hasta enviar el cuerpo
+        return response
+    if response.status_code < 400:
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return response
 
 def check_lab():
     if current_user.area != 'Lab' and current_user.area != 'Lab_Bod':
@@ -15,4 +45,519 @@ def check_only_lab():
 
 def check_only_bod():
     if current_user.area != 'Bod':
-        return abort(403)
\ No newline at end of file
+        return abort(403)
+
+# Verificaciones de area para las rutas json, usan el area de los claims del token
+def json_only_lab(usuario_actual):
+    if usuario_actual.area != Area.Lab.value:
+        return abort(403)
+
+def json_lab(usuario_actual):
+    if usuario_actual.area != Area.Lab.value and usuario_actual.area != Area.Lab_Bod.value:
+        return abort(403)
+
+def json_only_bod(usuario_actual):
+    if usuario_actual.area != Area.Bod.value:
+        return abort(403)
+
+def json_bod(usuario_actual):
+    if usuario_actual.area != Area.Bod.value and usuario_actual.area != Area.Lab_Bod.value:
+        return abort(403)
+
+def codificar_cursor(fila):
+    valor = f'{fila.fecha_registro.isoformat()}|{fila.id}'
+    return base64.urlsafe_b64encode(valor.encode()).decode()
+
+def decodificar_cursor(cursor):
+    try:
+        fecha, id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(fecha), int(id)
+    except (ValueError, UnicodeError):
+        return abort(400)
+
+def paginar(query, modelo):
+    """Pagina por keyset sobre (fecha_registro, id) descendente.
+
+    Lee `limit` y `after` de la query string y retorna las filas de la pagina
+    junto al cursor de la siguiente (None si es la ultima).
+    """
+    limite = min(max(request.args.get('limit', LIMITE_PAGINA, type=int), 1), LIMITE_PAGINA_MAXIMO)
+    cursor = request.args.get('after')
+    if cursor:
+        fecha, id = decodificar_cursor(cursor)
+        query = query.filter(or_(modelo.fecha_registro < fecha,
+                                 and_(modelo.fecha_registro == fecha, modelo.id < id)))
+    filas = query.order_by(modelo.fecha_registro.desc(), modelo.id.desc()).limit(limite + 1).all()
+    if len(filas) > limite:
+        filas = filas[:limite]
+        return filas, codificar_cursor(filas[-1])
+    return filas, None
+
+def campos_parametro(proyeccion):
+    """Aplica ?fields=campo1,campo2 a la proyeccion de un listado, 400 si algun campo no existe."""
+    fields = request.args.get('fields')
+    if not fields:
+        return proyeccion
+    try:
+        return proyeccion.campos(campo.strip() for campo in fields.split(',') if campo.strip())
+    except ValueError:
+        return abort(400)
+
+def pagina_json(clave, output, cursor):
+    siguiente = None
+    if cursor:
+        args = dict(request.args.to_dict(), after=cursor)
+        siguiente = url_for(request.endpoint, **request.view_args, **args)
+    return jsonify({clave: output, 'cursor': cursor, 'siguiente': siguiente})
+
+def cargar_relaciones_historial(query):
+    # Carga ambas ramas (materia y reactivo) con su item y usuario en la misma consulta,
+    # asi ver_historial.html no dispara consultas por cada fila
+    return query.options(
+        joinedload(HistorialQuimicos.historial_materia).joinedload(HistorialMaterias.materia),
+        joinedload(HistorialQuimicos.historial_materia).joinedload(HistorialMaterias.user),
+        joinedload(HistorialQuimicos.historial_reactivo).joinedload(HistorialReactivos.reactivo),
+        joinedload(HistorialQuimicos.historial_reactivo).joinedload(HistorialReactivos.user))
+
+def json_check_area(usuario_actual, area):
+    # Traduce el area de la url ('lab' o 'bod') y verifica que el usuario tenga acceso a ella
+    if area not in AREAS_URL:
+        return abort(404)
+    if usuario_actual.area != AREAS_URL[area] and usuario_actual.area != Area.Lab_Bod.value:
+        return abort(403)
+    return AREAS_URL[area]
+
+def areas_usuario(usuario_actual):
+    # Areas cuyos datos puede ver el usuario en las rutas json que no llevan area en la url
+    if usuario_actual.area == Area.Lab_Bod.value:
+        return [Area.Lab.value, Area.Bod.value]
+    return [usuario_actual.area]
+
+def alerta_bajo_stock(modelo, historial_fk):
+    # Solo se alerta si el item ya tuvo movimientos, igual que en las vistas de inventario
+    return and_(modelo.cantidad <= modelo.bajo_stock, exists().where(historial_fk == modelo.id))
+
+def inventario(area):
+    """Retorna (quimico, alerta) de todo el inventario del area en una sola consulta."""
+    alerta = or_(alerta_bajo_stock(Materia, HistorialMaterias.materia_id),
+                 alerta_bajo_stock(Reactivo, HistorialReactivos.reactivo_id))
+    return (db.session.query(Quimico, alerta.label('alerta'))
+            .outerjoin(Materia, Quimico.materia_id == Materia.id)
+            .outerjoin(Reactivo, Quimico.reactivo_id == Reactivo.id)
+            .options(contains_eager(Quimico.materia), contains_eager(Quimico.reactivo))
+            .filter(Quimico.area == area)
+            .order_by(Quimico.id)
+            .all())
+
+def bajo_stock(area):
+    """Materias y reactivos del area con cantidad <= bajo_stock y movimientos registrados."""
+    def columnas(tipo, modelo):
+        return [literal(tipo).label('tipo'), modelo.id, modelo.nombre, modelo.codigo,
+                modelo.cantidad, modelo.bajo_stock, modelo.medida]
+
+    consulta = union_all(
+        select(columnas('Materia', Materia))
+            .where(and_(Materia.area == area, alerta_bajo_stock(Materia, HistorialMaterias.materia_id))),
+        select(columnas('Reactivo', Reactivo))
+            .where(and_(Reactivo.area == area, alerta_bajo_stock(Reactivo, HistorialReactivos.reactivo_id))))
+    return db.session.execute(consulta.order_by('tipo', 'id')).fetchall()
+
+def eliminar_historiales(modelo, columna_item, item_id, columna_quimico, chunk=None):
+    """Elimina los historiales de un item y sus HistorialQuimicos con DELETE por conjunto.
+
+    Con `chunk` se eliminan de a `chunk` historiales con un commit por bloque, para
+    no mantener los locks durante todo el borrado de items con muchos movimientos.
+    """
+    historiales = db.session.query(modelo.id).filter(columna_item == item_id)
+    if not chunk:
+        HistorialQuimicos.query.filter(columna_quimico.in_(historiales)).delete(synchronize_session=False)
+        modelo.query.filter(columna_item == item_id).delete(synchronize_session=False)
+        return
+    while True:
+        ids = [id for id, in historiales.limit(chunk)]
+        if not ids:
+            return
+        HistorialQuimicos.query.filter(columna_quimico.in_(ids)).delete(synchronize_session=False)
+        modelo.query.filter(modelo.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+def fecha_parametro(nombre, fin_de_dia=False):
+    """Lee una fecha ISO de los parametros de la url, responde 400 si no es valida.
+
+    Con `fin_de_dia` una fecha sin hora se toma hasta el final de ese dia.
+    """
+    valor = request.args.get(nombre)
+    if not valor:
+        return None
+    try:
+        fecha = datetime.fromisoformat(valor)
+    except ValueError:
+        return abort(400)
+    if fin_de_dia and len(valor) == 10:
+        fecha += timedelta(days=1, microseconds=-1)
+    return fecha
+
+def tipos_parametro():
+    tipo = request.args.get('tipo')
+    if not tipo:
+        return None
+    return TIPOS_EQUIVALENTES.get(tipo, (tipo,))
+
+def entero_parametro(nombre):
+    valor = request.args.get(nombre)
+    if valor is None:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        return abort(400)
+
+def chunk_parametro():
+    # Tamaño de bloque de los borrados por partes, con LIMIT 0 o negativo el borrado no avanza
+    chunk = entero_parametro('chunk')
+    if chunk is not None and chunk <= 0:
+        return abort(400)
+    return chunk
+
+def filtrar_historial(query, modelo):
+    """Aplica al historial los filtros de la url: desde, hasta, tipo, user_id, lote y reactivo_id o materia_id.
+
+    Cada filtro tiene un indice que termina en (fecha_registro, id), por lo que se
+    combinan con la paginacion sin ordenar en memoria.
+    """
+    desde = fecha_parametro('desde')
+    hasta = fecha_parametro('hasta', fin_de_dia=True)
+    tipos = tipos_parametro()
+    user_id = entero_parametro('user_id')
+    columna_item = HistorialReactivos.reactivo_id if modelo is HistorialReactivos else HistorialMaterias.materia_id
+    item_id = entero_parametro(columna_item.key)
+    lote = request.args.get('lote')
+    if desde:
+        query = query.filter(modelo.fecha_registro >= desde)
+    if hasta:
+        query = query.filter(modelo.fecha_registro <= hasta)
+    if tipos:
+        query = query.filter(modelo.tipo.in_(tipos))
+    if user_id is not None:
+        query = query.filter(modelo.user_id == user_id)
+    if item_id is not None:
+        query = query.filter(columna_item == item_id)
+    if lote:
+        # Solo los historiales de reactivos tienen lote
+        if modelo is not HistorialReactivos:
+            return abort(400)
+        query = query.filter(modelo.lote == lote)
+    return query
+
+def exportar_historial(area, desde=None, hasta=None, tipos=None, tamano_lote=1000):
+    """Genera el historial de reactivos y materias del area como lineas json (NDJSON).
+
+    Usa un cursor del lado del servidor y lee de a `tamano_lote` filas, por lo que la
+    memoria usada no depende del tamaño del historial.
+    """
+    def consulta(nombre, modelo, item_id, lote):
+        condiciones = [modelo.area == area]
+        if desde:
+            condiciones.append(modelo.fecha_registro >= desde)
+        if hasta:
+            condiciones.append(modelo.fecha_registro <= hasta)
+        if tipos:
+            condiciones.append(modelo.tipo.in_(tipos))
+        return select([literal(nombre).label('historial'), modelo.id, item_id.label('item_id'), modelo.user_id,
+                       modelo.tipo, modelo.cantidad, modelo.observacion, lote.label('lote'), modelo.fecha_registro]
+                      ).where(and_(*condiciones))
+
+    historial = union_all(
+        consulta('Reactivo', HistorialReactivos, HistorialReactivos.reactivo_id, HistorialReactivos.lote),
+        consulta('Materia', HistorialMaterias, HistorialMaterias.materia_id, null())
+    ).order_by('fecha_registro', 'historial', 'id')
+
+    resultado = db.session.connection().execution_options(stream_results=True).execute(historial)
+    try:
+        while True:
+            filas = resultado.fetchmany(tamano_lote)
+            if not filas:
+                return
+            yield ''.join(json.dumps(dict(fila, fecha_registro=fila.fecha_registro.isoformat())) + '\n'
+                          for fila in filas)
+    finally:
+        resultado.close()
+
+def filas_importacion():
+    """Filas a importar desde un arreglo json o un archivo csv (campo `archivo` o cuerpo text/csv)."""
+    if 'archivo' in request.files:
+        contenido = io.TextIOWrapper(request.files['archivo'].stream, encoding='utf-8-sig')
+    elif request.mimetype == 'text/csv':
+        contenido = io.StringIO(request.get_data(as_text=True))
+    else:
+        filas = request.get_json(silent=True)
+        return filas if isinstance(filas, list) else None
+    # En el csv las celdas vacias se omiten para que se usen los valores por defecto
+    return [{campo: valor for campo, valor in fila.items() if campo and valor not in (None, '')}
+            for fila in csv.DictReader(contenido)]
+
+def importar_catalogo(modelo, schema, tipo, area, filas):
+    """Valida e inserta en lote los items del catalogo y sus Quimico.
+
+    Todas las filas se validan en una sola pasada; si alguna tiene errores no se
+    inserta nada y se retornan los errores por indice de fila. Retorna
+    (cantidad importada, errores).
+    """
+    for fila in filas:
+        if isinstance(fila, dict):
+            fila.pop('id', None)
+            fila['area'] = area
+    try:
+        items = schema.load(filas, many=True)
+    except ValidationError as err:
+        return 0, err.messages
+
+    # return_defaults deja en cada item el id insertado, asi los Quimico se enlazan solo a
+    # los items de esta importacion y no a los de otras transacciones concurrentes
+    db.session.bulk_save_objects(items, return_defaults=True)
+    columna = 'reactivo_id' if modelo is Reactivo else 'materia_id'
+    db.session.bulk_insert_mappings(Quimico, [{'tipo': tipo, columna: item.id, 'area': area} for item in items])
+    return len(items), {}
+
+# item del movimiento: (modelo, historial, fk del historial, fk en HistorialQuimicos)
+# Tipos de historial que descuentan stock: en materias la produccion es el consumo de la formula
+TIPOS_DESCUENTO = {'Reactivo': ('Salida',), 'Materia': ('Salida', 'Produccion', 'Producción')}
+
+MOVIMIENTOS = {'Reactivo': (Reactivo, HistorialReactivos, 'reactivo_id', 'reactivo_id'),
+               'Materia': (Materia, HistorialMaterias, 'materia_id', 'materia_id')}
+
+def validar_movimiento(movimiento):
+    if not isinstance(movimiento, dict):
+        return 'json invalido'
+    if movimiento.get('item') not in MOVIMIENTOS:
+        return "item debe ser 'Reactivo' o 'Materia'"
+    if movimiento.get('tipo') not in ('Entrada', 'Salida'):
+        return "tipo debe ser 'Entrada' o 'Salida'"
+    for campo in ('id', 'cantidad'):
+        if not isinstance(movimiento.get(campo), int) or isinstance(movimiento.get(campo), bool):
+            return f'Ingresa un {campo} valido'
+    if movimiento['cantidad'] <= 0:
+        return 'La cantidad ingresada debe ser mayor a 0'
+    if movimiento['item'] == 'Reactivo' and movimiento['tipo'] == 'Salida' and not movimiento.get('lote'):
+        return 'Las salidas de reactivos requieren un lote'
+    for campo, largo in (('observacion', 100), ('lote', 20)):
+        valor = movimiento.get(campo)
+        if valor is not None and not isinstance(valor, str):
+            return f'{campo} debe ser texto'
+        if valor and len(valor) > largo:
+            return f'{campo} demasiado largo'
+    return None
+
+def registrar_movimientos(area, user_id, movimientos):
+    """Registra una lista de entradas y salidas de reactivos y materias del area.
+
+    Todo o nada: se bloquean las filas afectadas, se valida el stock aplicando los
+    movimientos en orden y, si ninguno falla, se actualiza cada tabla con un UPDATE
+    y se insertan los historiales y sus HistorialQuimicos en lote. Retorna
+    (stock final por item, errores por indice de movimiento).
+    """
+    errores = {}
+    for i, movimiento in enumerate(movimientos):
+        error = validar_movimiento(movimiento)
+        if error:
+            errores[i] = error
+    if errores:
+        return None, errores
+
+    # Stock actual de los items, bloqueados en orden de id para evitar deadlocks
+    stock = {}
+    for item, (modelo, _, _, _) in MOVIMIENTOS.items():
+        ids = {m['id'] for m in movimientos if m['item'] == item}
+        if ids:
+            filas = (db.session.query(modelo.id, modelo.cantidad, modelo.area)
+                     .filter(modelo.id.in_(ids)).order_by(modelo.id).with_for_update().all())
+            stock.update({(item, fila.id): fila for fila in filas})
+
+    saldos = {}
+    for i, movimiento in enumerate(movimientos):
+        clave = (movimiento['item'], movimiento['id'])
+        if clave not in stock:
+            errores[i] = f"no existe {movimiento['item'].lower()} con ID = {movimiento['id']}"
+            continue
+        if stock[clave].area != area:
+            errores[i] = f"{movimiento['item'].lower()} con ID = {movimiento['id']} no pertenece al area"
+            continue
+        saldo = saldos.get(clave, stock[clave].cantidad)
+        saldo += movimiento['cantidad'] if movimiento['tipo'] == 'Entrada' else -movimiento['cantidad']
+        if saldo < 0:
+            errores[i] = f"la cantidad ingresada supera al stock actual ({saldos.get(clave, stock[clave].cantidad)})"
+            continue
+        saldos[clave] = saldo
+    if errores:
+        return None, errores
+
+    ahora = datetime.utcnow()
+    for item, (modelo, historial, fk, fk_quimico) in MOVIMIENTOS.items():
+        nuevos = {id: saldo for (tipo, id), saldo in saldos.items() if tipo == item}
+        if not nuevos:
+            continue
+        db.session.execute(modelo.__table__.update()
+                           .where(modelo.id.in_(nuevos))
+                           .values(cantidad=case(nuevos, value=modelo.id)))
+
+        registros = []
+        for m in movimientos:
+            if m['item'] == item:
+                registro = dict(observacion=m.get('observacion') or '', cantidad=m['cantidad'], user_id=user_id,
+                                tipo=m['tipo'], area=area, fecha_registro=ahora)
+                registro[fk] = m['id']
+                if historial is HistorialReactivos:
+                    registro['lote'] = m.get('lote')
+                registros.append(registro)
+        # Con return_defaults cada registro queda con su id, asi los HistorialQuimicos apuntan
+        # solo a los historiales de este lote aunque otras transacciones inserten a la vez
+        db.session.bulk_insert_mappings(historial, registros, return_defaults=True)
+        db.session.bulk_insert_mappings(HistorialQuimicos, [
+            {'tipo': item, fk_quimico: registro['id'], 'fecha_registro': ahora, 'area': area}
+            for registro in registros])
+
+    return [{'item': item, 'id': id, 'cantidad': saldo} for (item, id), saldo in sorted(saldos.items())], {}
+
+def genealogia_lote(lote, areas):
+    """Movimientos de reactivo del lote con las materias que consumio su produccion, en una sola consulta.
+
+    Las producciones antiguas cuyos consumos no se pudieron enlazar al migrar retornan `consumos` vacio.
+    """
+    filas = (db.session.query(HistorialReactivos.id, HistorialReactivos.reactivo_id, Reactivo.nombre.label('reactivo'),
+                              HistorialReactivos.tipo, HistorialReactivos.cantidad, HistorialReactivos.fecha_registro,
+                              HistorialReactivos.observacion, HistorialReactivos.user_id, HistorialReactivos.area,
+                              HistorialMaterias.id.label('consumo_id'), HistorialMaterias.materia_id,
+                              Materia.nombre.label('materia'), Materia.codigo, Materia.medida,
+                              HistorialMaterias.cantidad.label('consumo'))
+             .join(Reactivo, Reactivo.id == HistorialReactivos.reactivo_id)
+             .outerjoin(HistorialMaterias, HistorialMaterias.produccion_id == HistorialReactivos.id)
+             .outerjoin(Materia, Materia.id == HistorialMaterias.materia_id)
+             .filter(HistorialReactivos.lote == lote, HistorialReactivos.area.in_(areas))
+             .order_by(HistorialReactivos.fecha_registro, HistorialReactivos.id, HistorialMaterias.id))
+    movimientos = {}
+    for fila in filas:
+        movimiento = movimientos.get(fila.id)
+        if movimiento is None:
+            movimiento = movimientos[fila.id] = {
+                'id': fila.id, 'reactivo_id': fila.reactivo_id, 'reactivo': fila.reactivo, 'tipo': fila.tipo,
+                'cantidad': fila.cantidad, 'fecha_registro': fila.fecha_registro.isoformat(),
+                'observacion': fila.observacion, 'user_id': fila.user_id, 'area': fila.area, 'consumos': []}
+        if fila.consumo_id is not None:
+            movimiento['consumos'].append({'id': fila.consumo_id, 'materia_id': fila.materia_id, 'materia': fila.materia,
+                                           'codigo': fila.codigo, 'medida': fila.medida, 'cantidad': fila.consumo})
+    return list(movimientos.values())
+
+def lotes_materia(materia_id, desde=None, hasta=None):
+    """Lotes producidos con la materia, a partir de sus movimientos de consumo."""
+    query = (db.session.query(HistorialMaterias.id, HistorialMaterias.cantidad, HistorialMaterias.fecha_registro,
+                              HistorialReactivos.id.label('produccion_id'), HistorialReactivos.lote,
+                              HistorialReactivos.reactivo_id, Reactivo.nombre.label('reactivo'))
+             .join(HistorialReactivos, HistorialReactivos.id == HistorialMaterias.produccion_id)
+             .join(Reactivo, Reactivo.id == HistorialReactivos.reactivo_id)
+             .filter(HistorialMaterias.materia_id == materia_id))
+    if desde:
+        query = query.filter(HistorialMaterias.fecha_registro >= desde)
+    if hasta:
+        query = query.filter(HistorialMaterias.fecha_registro <= hasta)
+    return [{'id': fila.id, 'cantidad': fila.cantidad, 'fecha_registro': fila.fecha_registro.isoformat(),
+             'produccion_id': fila.produccion_id, 'lote': fila.lote, 'reactivo_id': fila.reactivo_id,
+             'reactivo': fila.reactivo}
+            for fila in query.order_by(HistorialMaterias.fecha_registro.desc(), HistorialMaterias.id.desc())]
+
+def variaciones_stock(tipo, area, desde=None, hasta=None, ids=None):
+    """Suma de los movimientos de cada item del area con `desde` < fecha_registro <= `hasta`."""
+    _, historial, columna, _ = MOVIMIENTOS[tipo]
+    columna = getattr(historial, columna)
+    signo = case([(historial.tipo.in_(TIPOS_DESCUENTO[tipo]), -historial.cantidad)], else_=historial.cantidad)
+    query = db.session.query(columna, func.sum(signo)).filter(historial.area == area)
+    if desde:
+        query = query.filter(historial.fecha_registro > desde)
+    if hasta:
+        query = query.filter(historial.fecha_registro <= hasta)
+    if ids is not None:
+        query = query.filter(columna.in_(ids))
+    return {id: int(suma) for id, suma in query.group_by(columna)}
+
+def fin_snapshot(fecha):
+    # Ultimo instante cubierto por el snapshot del dia `fecha`
+    return datetime.combine(fecha + timedelta(days=1), time()) - timedelta(microseconds=1)
+
+def items_en_fecha(modelo, area, hasta):
+    # Items del area que existian en `hasta`, los creados antes de registrar la fecha existen siempre
+    return (db.session.query(modelo.id, modelo.nombre, modelo.codigo, modelo.medida, modelo.cantidad)
+            .filter(modelo.area == area, or_(modelo.fecha_registro.is_(None), modelo.fecha_registro <= hasta)))
+
+def stock_en_fecha(area, hasta, tipos=('Reactivo', 'Materia'), item_id=None):
+    """Stock de cada item del area en el instante `hasta`, sin los items creados despues.
+
+    Parte del ultimo snapshot que cubre `hasta` y le suma los movimientos posteriores, asi el
+    costo depende del intervalo entre snapshots y no del largo del historial. Los items creados
+    despues del snapshot no estan en el: parten del stock actual y se les resta lo movido
+    despues de `hasta`, ya que su stock inicial no queda en el historial. Sin snapshot previo
+    (antes del primero que escribe `manage.py snapshot`) todos los items se calculan asi.
+    Retorna (fecha del snapshot usado o None, stock).
+    """
+    snapshot = (db.session.query(func.max(StockSnapshot.fecha))
+                .filter(StockSnapshot.area == area,
+                        StockSnapshot.fecha <= (hasta + timedelta(microseconds=1)).date() - timedelta(days=1))
+                .scalar())
+    ids = None if item_id is None else [item_id]
+    output = []
+    for tipo in tipos:
+        modelo = MOVIMIENTOS[tipo][0]
+        items = items_en_fecha(modelo, area, hasta)
+        if item_id is not None:
+            items = items.filter(modelo.id == item_id)
+        items = items.order_by(modelo.id).all()
+        base, variaciones = {}, {}
+        if snapshot:
+            base = db.session.query(StockSnapshot.item_id, StockSnapshot.cantidad).filter_by(area=area, fecha=snapshot,
+                                                                                            tipo=tipo)
+            if item_id is not None:
+                base = base.filter_by(item_id=item_id)
+            base = dict(base)
+            variaciones = variaciones_stock(tipo, area, desde=fin_snapshot(snapshot), hasta=hasta, ids=ids)
+        faltantes = [item.id for item in items if item.id not in base]
+        posteriores = variaciones_stock(tipo, area, desde=hasta, ids=faltantes) if faltantes else {}
+        for item in items:
+            if item.id in base:
+                cantidad = base[item.id] + variaciones.get(item.id, 0)
+            else:
+                cantidad = item.cantidad - posteriores.get(item.id, 0)
+            output.append({'tipo': tipo, 'id': item.id, 'nombre': item.nombre, 'codigo': item.codigo,
+                           'medida': item.medida, 'cantidad': cantidad})
+    return snapshot, output
+
+def escribir_snapshot(area, fecha):
+    """Guarda el stock del area al terminar el dia `fecha`, reemplazando el snapshot de ese dia si existe.
+
+    Se calcula desde el stock actual menos los movimientos posteriores al dia, no desde el
+    snapshot anterior, asi incluye el stock que entro sin historial (creacion o importacion).
+    Los items creados despues del dia no se incluyen. El dia debe haber terminado, un
+    snapshot parcial no incluiria los movimientos que faltan.
+    """
+    fin = fin_snapshot(fecha)
+    if fin >= datetime.utcnow():
+        raise ValueError(f'El dia {fecha} no ha terminado')
+    filas = []
+    for tipo, (modelo, _, _, _) in MOVIMIENTOS.items():
+        posteriores = variaciones_stock(tipo, area, desde=fin)
+        filas.extend({'area': area, 'fecha': fecha, 'tipo': tipo, 'item_id': item.id,
+                      'cantidad': item.cantidad - posteriores.get(item.id, 0)}
+                     for item in items_en_fecha(modelo, area, fin))
+    StockSnapshot.query.filter_by(area=area, fecha=fecha).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(StockSnapshot, filas)
+    return len(filas)
+
+def fecha_snapshot_inicial(area):
+    """Dia anterior al primer movimiento del area si aun no tiene snapshots, si no None.
+
+    Un snapshot de ese dia hace que las consultas de stock de cualquier fecha con historial
+    partan de un snapshot.
+    """
+    if db.session.query(exists().where(StockSnapshot.area == area)).scalar():
+        return None
+    fechas = [db.session.query(func.min(historial.fecha_registro)).filter(historial.area == area).scalar()
+              for _, historial, _, _ in MOVIMIENTOS.values()]
+    fechas = [fecha for fecha in fechas if fecha is not None]
+    return min(fechas).date() - timedelta(days=1) if fechas else None
@@ -3,15 +3,23 @@ from flask_login import current_user, login_required
 from flasksystem import db
 from flasksystem.models import Materia, HistorialMaterias, Quimico, HistorialQuimicos, Area
 from flasksystem.materias.forms import MateriaForm, AddMateriaForm, ReduceMateriaForm
-from flasksystem.main.utils import check_bod, check_lab, check_only_bod, check_only_lab
+from flasksystem.main.utils import (check_bod, check_lab, check_only_bod, check_only_lab, paginar, pagina_json,
+                                    campos_parametro, filtrar_historial, confirmar_sesion, json_lab, json_bod,
+                                    json_only_lab, json_only_bod, filas_importacion, chunk_parametro)
+from flasksystem.materias.utils import eliminar_materia, importar_materias, buscar_materias
 from flasksystem.main.forms import ModBajoStockForm
-from flasksystem.schema import (materia_schema, materias_schema, historial_materia_schema, historiales_materia_schema,
+from flasksystem.schema import (materia_schema, historial_materia_schema,
                                 quimico_schema, quimicos_schema, historial_quimico_schema, historiales_quimico_schema,
-                                materia_bajo_stock_schema)
+                                materia_bajo_stock_schema, materias_proyeccion, historiales_materia_proyeccion)
 from flasksystem.users.routes import token_required
+from flasksystem.cache import etag_catalogo, cache_respuesta, cache_respuesta_item
 from marshmallow import ValidationError
 
 materias = Blueprint('materias', __name__)
+materias.after_request(confirmar_sesion)
+
+# Paginas de resultados del buscador de materias de las formulas
+BUSCAR_PAGINAS = 10
 
 # --------------------------------SECTOR DE ROUTES LABORATORIO----------------------------------------------
 
@@ -24,15 +32,27 @@ def lab_new_materia():
         materia = Materia(nombre=form.nombre.data, codigo=form.codigo.data, medida=form.medida.data, 
                             bajo_stock=form.bajo_stock.data, area=Area.Lab.value)
         db.session.add(materia)
-        db.session.commit()
         quimico = Quimico(tipo='Materia', materia=materia, area=Area.Lab.value)
         db.session.add(quimico)
-        db.session.commit()        
         flash('La materia se ha creado exitosamente!', 'success')
         return redirect(url_for('main.lab_home'))
     return render_template('crear_materia.html', title='Nueva Materia',
                             form=form, legend='Nueva Materia', area='Lab')
 
+@materias.route("/lab/materia/buscar")
+@login_required
+def lab_buscar_materia():
+    check_lab()
+    consulta = request.args.get('q', '').strip()
+    pagina = min(max(request.args.get('pagina', 1, type=int), 1), BUSCAR_PAGINAS)
+    if not consulta:
+        return jsonify({'resultados': [], 'siguiente': None})
+    resultados, hay_mas = buscar_materias(Area.Lab.value, consulta, pagina)
+    siguiente = None
+    if hay_mas and pagina < BUSCAR_PAGINAS:
+        siguiente = url_for('materias.lab_buscar_materia', q=consulta, pagina=pagina + 1)
+    return jsonify({'resultados': resultados, 'siguiente': siguiente})
+
 @materias.route("/lab/materia/<int:materia_id>")
 @login_required
 def lab_materia(materia_id):
@@ -52,7 +72,6 @@ def lab_alerta_materia(materia_id):
     form = ModBajoStockForm()
     if form.validate_on_submit():
         materia.bajo_stock = form.bajo_stock.data
-        db.session.commit()
         flash('Actualizada la cantidad para la alerta de bajo stock', 'success')
         return redirect(url_for('materias.lab_materia', materia_id=materia.id))
     return render_template('modificar_alerta.html', form=form, legend='Modifica Alerta', area='Lab', materia=materia)
@@ -78,10 +97,9 @@ def lab_add_materia(materia_id):
         historial = HistorialMaterias(observacion=form.observacion.data, cantidad=form.cantidad.data,
                                          materia=materia, user = current_user, tipo='Entrada', area=Area.Lab.value)
         db.session.add(historial)
-        db.session.commit()
+        db.session.flush()
         historial_quimico = HistorialQuimicos(tipo='Materia',historial_materia = historial, fecha_registro = historial.fecha_registro, area=Area.Lab.value)
         db.session.add(historial_quimico)
-        db.session.commit()
         flash('Se ha añadido la entrada de materia', 'success')
         return redirect(url_for('materias.lab_materia', materia_id=materia.id))
     return render_template('añadir_materia.html', title='Menu Materia', 
@@ -121,10 +139,9 @@ def lab_reduce_materia(materia_id):
         historial = HistorialMaterias(observacion=form.observacion.data, cantidad=form.cantidad.data, 
                                         materia=materia, user = current_user, tipo='Salida', area=Area.Lab.value)
         db.session.add(historial)
-        db.session.commit()
+        db.session.flush()
         historial_quimico = HistorialQuimicos(tipo='Materia',historial_materia = historial, fecha_registro = historial.fecha_registro, area=Area.Lab.value)
         db.session.add(historial_quimico)
-        db.session.commit()        
         flash('Se ha añadido la salida de materia', 'success')
         return redirect(url_for('materias.lab_materia', materia_id=materia.id))
     return render_template('salida_materia.html', title='Menu Materia', 
@@ -140,18 +157,7 @@ def lab_delete_materia(materia_id):
     if materia.formulas != []:
         flash('Esta materia es parte de una o más formulas. Si desea eliminarla por favor elimine la(s) formula(s) de la(s) que es parte', 'danger')
         return redirect(url_for('materias.lab_materia', materia_id = materia.id))
-    historiales = HistorialMaterias.query.filter_by(materia_id=materia_id).all()
-    quimicos = Quimico.query.filter_by(materia_id=materia_id).all()
-    # Eliminar Tablas dependientes de Materia
-    for historial in historiales:
-        q_historiales = HistorialQuimicos.query.filter_by(materia_id=historial.id).all()
-        for q_historial in q_historiales:
-            db.session.delete(q_historial)
-        db.session.delete(historial)
-    for quimico in quimicos:
-        db.session.delete(quimico)
-    db.session.delete(materia)
-    db.session.commit()
+    eliminar_materia(materia)
     flash('La materia se ha eliminado', 'success')
     return redirect(url_for('main.lab_home'))
 
@@ -169,15 +175,27 @@ def bod_new_materia():
         materia = Materia(nombre=form.nombre.data, codigo=form.codigo.data, medida=form.medida.data, 
                             bajo_stock=form.bajo_stock.data, area=Area.Bod.value)
         db.session.add(materia)
-        db.session.commit()
         quimico = Quimico(tipo='Materia', materia=materia, area=Area.Bod.value)
         db.session.add(quimico)
-        db.session.commit()        
         flash('La materia se ha creado exitosamente!', 'success')
         return redirect(url_for('main.bod_home'))
     return render_template('crear_materia.html', title='Nueva Materia',
                             form=form, legend='Nueva Materia', area='Bod')
 
+@materias.route("/bod/materia/buscar")
+@login_required
+def bod_buscar_materia():
+    check_bod()
+    consulta = request.args.get('q', '').strip()
+    pagina = min(max(request.args.get('pagina', 1, type=int), 1), BUSCAR_PAGINAS)
+    if not consulta:
+        return jsonify({'resultados': [], 'siguiente': None})
+    resultados, hay_mas = buscar_materias(Area.Bod.value, consulta, pagina)
+    siguiente = None
+    if hay_mas and pagina < BUSCAR_PAGINAS:
+        siguiente = url_for('materias.bod_buscar_materia', q=consulta, pagina=pagina + 1)
+    return jsonify({'resultados': resultados, 'siguiente': siguiente})
+
 @materias.route("/bod/materia/<int:materia_id>")
 @login_required
 def bod_materia(materia_id):
@@ -197,7 +215,6 @@ def bod_alerta_materia(materia_id):
     form = ModBajoStockForm()
     if form.validate_on_submit():
         materia.bajo_stock = form.bajo_stock.data
-        db.session.commit()
         flash('Actualizada la cantidad para la alerta de bajo stock', 'success')
         return redirect(url_for('materias.bod_materia', materia_id=materia.id))
     # return render template alerta_reactivo.html
@@ -224,10 +241,9 @@ def bod_add_materia(materia_id):
         historial = HistorialMaterias(observacion=form.observacion.data, cantidad=form.cantidad.data, 
                                         materia=materia, user = current_user, tipo='Entrada', area=Area.Bod.value)
         db.session.add(historial)
-        db.session.commit()
+        db.session.flush()
         historial_quimico = HistorialQuimicos(tipo='Materia',historial_materia = historial, fecha_registro = historial.fecha_registro, area=Area.Bod.value)
         db.session.add(historial_quimico)
-        db.session.commit()
         flash('Se ha añadido la salida de materia', 'success')
         return redirect(url_for('materias.bod_materia', materia_id=materia.id))
     return render_template('añadir_materia.html', title='Menu Materia', 
@@ -267,10 +283,9 @@ def bod_reduce_materia(materia_id):
         historial = HistorialMaterias(observacion=form.observacion.data, cantidad=form.cantidad.data, materia=materia, 
                                         user = current_user, tipo='Salida', area=Area.Bod.value)
         db.session.add(historial)
-        db.session.commit()
+        db.session.flush()
         historial_quimico = HistorialQuimicos(tipo='Materia',historial_materia = historial, fecha_registro = historial.fecha_registro, area=Area.Bod.value)
         db.session.add(historial_quimico)
-        db.session.commit()        
         flash('Se ha añadido la entrada de materia', 'success')
         return redirect(url_for('materias.bod_materia', materia_id=materia.id))
     return render_template('salida_materia.html', title='Menu Materia', 
@@ -286,40 +301,13 @@ def bod_delete_materia(materia_id):
     if materia.formulas != []:
         flash('Esta materia es parte de una o más formulas. Si desea eliminarla por favor elimine la(s) formula(s) de la(s) que es parte', 'danger')
         return redirect(url_for('materias.bod_materia', materia_id = materia.id))
-    historiales = HistorialMaterias.query.filter_by(materia_id=materia_id).all()
-    quimicos = Quimico.query.filter_by(materia_id=materia_id).all()
-    # Eliminar Tablas dependientes de Materia
-    for historial in historiales:
-        q_historiales = HistorialQuimicos.query.filter_by(materia_id=historial.id).all()
-        for q_historial in q_historiales:
-            db.session.delete(q_historial)
-        db.session.delete(historial)
-    for quimico in quimicos:
-        db.session.delete(quimico)
-    db.session.delete(materia)
-    db.session.commit()
+    eliminar_materia(materia)
     flash('La materia se ha eliminado', 'success')
     return redirect(url_for('main.bod_home'))
 
 
 # ----------------------------------------------------------------------------------------------------------
 
-def json_only_lab(usuario_actual):
-    if usuario_actual.area != Area.Lab.value:
-        return abort(403)
-
-def json_lab(usuario_actual):
-    if usuario_actual.area != Area.Lab.value and usuario_actual.area != Area.Lab_Bod.value:
-        return abort(403)
-
-def json_only_bod(usuario_actual):
-    if usuario_actual != Area.Bod.value:
-        return abort(403)
-
-def json_bod(usuario_actual):
-    if usuario_actual != Area.Bod.value and usuario_actual.area != Area.Lab_Bod.value:
-        return abort(403)
-
 # --------------------------------SECTOR DE ROUTES API LAB--------------------------------------------------
 
 @materias.route("/json/lab/materia/create", methods=['POST'])
@@ -338,14 +326,29 @@ def json_lab_new_materia(usuario_actual):
         return jsonify(err.messages), 422
 
     db.session.add(materia)
-    db.session.commit()
     quimico = Quimico(tipo='Materia', materia=materia, area=Area.Lab.value)
     db.session.add(quimico)
-    db.session.commit()     
+    db.session.flush()
     return materia_schema.jsonify(materia)
 
+@materias.route("/json/lab/materia/import", methods=['POST'])
+@token_required
+def json_lab_import_materias(usuario_actual):
+    json_only_lab(usuario_actual)
+
+    filas = filas_importacion()
+    if not filas:
+        return jsonify({'mensaje': 'Invalid request'}), 400
+
+    cantidad, errores = importar_materias(Area.Lab.value, filas)
+    if errores:
+        return jsonify({'mensaje': 'Ninguna fila fue importada', 'errores': errores}), 422
+    return jsonify({'mensaje': f'Se importaron {cantidad} materias', 'cantidad': cantidad}), 201
+
 @materias.route("/json/lab/materia/<int:materia_id>")
 @token_required
+@etag_catalogo
+@cache_respuesta_item('Materia')
 def json_lab_materia(usuario_actual, materia_id):
     json_lab(usuario_actual)
     materia = Materia.query.get(materia_id)
@@ -379,15 +382,18 @@ def json_lab_alerta_materia(usuario_actual, materia_id):
         print(err.messages)
         return jsonify(err.messages), 422
 
-    db.session.commit()
+    db.session.flush()
     return materia_schema.jsonify(materia)
 
 @materias.route("/json/lab/materia/home")
 @token_required
+@etag_catalogo
+@cache_respuesta
 def json_lab_home_materia(usuario_actual):
     json_lab(usuario_actual)
-    materias = db.session.query(Materia).filter(Materia.area == Area.Lab.value).all()
-    output = materias_schema.dump(materias)
+    proyeccion = campos_parametro(materias_proyeccion)
+    materias = proyeccion.query().filter(Materia.area == Area.Lab.value).all()
+    output = proyeccion.dump(materias)
     return jsonify({'materias' : output})
 
 @materias.route("/json/lab/materia/<int:materia_id>/add", methods=['PUT'])
@@ -422,12 +428,12 @@ def json_lab_add_materia(usuario_actual, materia_id):
         observacion = ""
         
     materia.cantidad += cantidad
-    historial = HistorialMaterias(observacion=observacion, cantidad=cantidad, materia=materia, user=usuario_actual, tipo='Entrada', area=Area.Lab.value)
+    historial = HistorialMaterias(observacion=observacion, cantidad=cantidad, materia=materia, user_id=usuario_actual.id, tipo='Entrada', area=Area.Lab.value)
     db.session.add(historial)
-    db.session.commit()
+    db.session.flush()
     historial_quimico = HistorialQuimicos(tipo='Materia',historial_materia = historial, fecha_registro = historial.fecha_registro, area=Area.Lab.value)
     db.session.add(historial_quimico)
-    db.session.commit()
+    db.session.flush()
     return materia_schema.jsonify(materia)
 
 @materias.route("/json/lab/materia/<int:materia_id>/reduce", methods=['PUT'])
@@ -462,12 +468,12 @@ def json_lab_reduce_materia(usuario_actual, materia_id):
         return jsonify({"error": descripcion}), 422
 
     materia.cantidad -= cantidad
-    historial = HistorialMaterias(observacion=observacion, cantidad=cantidad, materia=materia, user = usuario_actual, tipo='Salida', area=Area.Lab.value)
+    historial = HistorialMaterias(observacion=observacion, cantidad=cantidad, materia=materia, user_id=usuario_actual.id, tipo='Salida', area=Area.Lab.value)
     db.session.add(historial)
-    db.session.commit()
+    db.session.flush()
     historial_quimico = HistorialQuimicos(tipo='Materia',historial_materia = historial, fecha_registro = historial.fecha_registro, area=Area.Lab.value)
     db.session.add(historial_quimico)
-    db.session.commit()    
+    db.session.flush()
     return materia_schema.jsonify(materia)
 
 @materias.route("/json/lab/materia/<int:materia_id>/delete", methods=['DELETE'])
@@ -485,24 +491,14 @@ def json_lab_delete_materia(usuario_actual, materia_id):
     if materia.formulas != []:
         return jsonify({"error": "esta materia es parte de una o mas formulas, si deseas eliminarla entonces elimina las formulas de las que es parte."}), 422
 
-    historiales = HistorialMaterias.query.filter_by(materia_id=materia_id).all()
-    quimicos = Quimico.query.filter_by(materia_id=materia_id).all()
-    # Eliminar Tablas dependientes de Materia
-    for historial in historiales:
-        q_historiales = HistorialQuimicos.query.filter_by(materia_id=historial.id).all()
-        for q_historial in q_historiales:
-            db.session.delete(q_historial)
-        db.session.delete(historial)
-    for quimico in quimicos:
-        db.session.delete(quimico)
-    db.session.delete(materia)
-    db.session.commit()
+    eliminar_materia(materia, chunk=chunk_parametro())
     return jsonify({"success": "se ha eliminado correctamente la materia"})
 # ----------------------------------------------------------------------------------------------------------
 
 @materias.route("/json/lab/materia/<int:materia_id>/historial")
 @token_required
 def json_lab_materia_historial(usuario_actual, materia_id):
+    json_lab(usuario_actual)
     materia = Materia.query.get(materia_id)
     if not materia:
         id = f"no existe materia con ID = {materia_id}"
@@ -510,11 +506,21 @@ def json_lab_materia_historial(usuario_actual, materia_id):
 
     if materia.area != Area.Lab.value:
         return abort(403)
-    historiales = HistorialMaterias.query.filter_by(materia_id=materia_id).all()
-    # if not historiales:
-    #     return jsonify({'mensaje': 'Esta materia no tiene historiales'})
-    # output = historiales_materia_schema.dump(historiales)
-    return jsonify({'historiales': output})
+    proyeccion = campos_parametro(historiales_materia_proyeccion)
+    query = filtrar_historial(proyeccion.query().filter_by(materia_id=materia_id), HistorialMaterias)
+    historiales, cursor = paginar(query, HistorialMaterias)
+    output = proyeccion.dump(historiales)
+    return pagina_json('historiales', output, cursor)
+
+@materias.route("/json/lab/materia/historial")
+@token_required
+def json_lab_historial_materias(usuario_actual):
+    json_lab(usuario_actual)
+    proyeccion = campos_parametro(historiales_materia_proyeccion)
+    query = filtrar_historial(proyeccion.query().filter_by(area=Area.Lab.value), HistorialMaterias)
+    historiales, cursor = paginar(query, HistorialMaterias)
+    output = proyeccion.dump(historiales)
+    return pagina_json('historiales', output, cursor)
 
 # --------------------------------SECTOR DE ROUTES API BOD--------------------------------------------------
 
@@ -534,14 +540,29 @@ def json_bod_new_materia(usuario_actual):
         return jsonify(err.messages), 422
 
     db.session.add(materia)
-    db.session.commit()
     quimico = Quimico(tipo='Materia', materia=materia, area=Area.Bod.value)
     db.session.add(quimico)
-    db.session.commit()     
+    db.session.flush()
     return materia_schema.jsonify(materia)
 
+@materias.route("/json/bod/materia/import", methods=['POST'])
+@token_required
+def json_bod_import_materias(usuario_actual):
+    json_only_bod(usuario_actual)
+
+    filas = filas_importacion()
+    if not filas:
+        return jsonify({'mensaje': 'Invalid request'}), 400
+
+    cantidad, errores = importar_materias(Area.Bod.value, filas)
+    if errores:
+        return jsonify({'mensaje': 'Ninguna fila fue importada', 'errores': errores}), 422
+    return jsonify({'mensaje': f'Se importaron {cantidad} materias', 'cantidad': cantidad}), 201
+
 @materias.route("/json/bod/materia/<int:materia_id>")
 @token_required
+@etag_catalogo
+@cache_respuesta_item('Materia')
 def json_bod_materia(usuario_actual, materia_id):
     json_bod(usuario_actual)
     materia = Materia.query.get(materia_id)
@@ -575,22 +596,25 @@ def json_bod_alerta_materia(usuario_actual, materia_id):
         print(err.messages)
         return jsonify(err.messages), 422
 
-    db.session.commit()
+    db.session.flush()
     return materia_schema.jsonify(materia)
 
 @materias.route("/json/bod/materia/home")
 @token_required
+@etag_catalogo
+@cache_respuesta
 def json_bod_home_materia(usuario_actual):
     json_bod(usuario_actual)
-    materias = db.session.query(Materia).filter(Materia.area == Area.Bod.value).all()
-    output = materias_schema.dump(materias)
+    proyeccion = campos_parametro(materias_proyeccion)
+    materias = proyeccion.query().filter(Materia.area == Area.Bod.value).all()
+    output = proyeccion.dump(materias)
     return jsonify({'materias' : output})
 
 @materias.route("/json/bod/materia/<int:materia_id>/add", methods=['PUT'])
 @token_required
 def json_bod_add_materia(usuario_actual, materia_id):
     json_only_bod(usuario_actual)
-    materia = Materia.query.get(materia_id).first()
+    materia = Materia.query.get(materia_id)
     if not materia:
         id = f"no existe materia con ID = {materia_id}"
         return jsonify({"error": id}), 404
@@ -618,12 +642,12 @@ def json_bod_add_materia(usuario_actual, materia_id):
         observacion = ""
         
     materia.cantidad += cantidad
-    historial = HistorialMaterias(observacion=observacion, cantidad=cantidad, materia=materia, user=usuario_actual, tipo='Entrada', area=Area.Bod.value)
+    historial = HistorialMaterias(observacion=observacion, cantidad=cantidad, materia=materia, user_id=usuario_actual.id, tipo='Entrada', area=Area.Bod.value)
     db.session.add(historial)
-    db.session.commit()
+    db.session.flush()
     historial_quimico = HistorialQuimicos(tipo='Materia',historial_materia = historial, fecha_registro = historial.fecha_registro, area=Area.Bod.value)
     db.session.add(historial_quimico)
-    db.session.commit()
+    db.session.flush()
     return materia_schema.jsonify(materia)
 
 @materias.route("/json/bod/materia/<int:materia_id>/reduce", methods=['PUT'])
@@ -658,12 +682,12 @@ def json_bod_reduce_materia(usuario_actual, materia_id):
         return jsonify({"error": descripcion}), 422
 
     materia.cantidad -= cantidad
-    historial = HistorialMaterias(observacion=observacion, cantidad=cantidad, materia=materia, user = usuario_actual, tipo='Salida', area=Area.Bod.value)
+    historial = HistorialMaterias(observacion=observacion, cantidad=cantidad, materia=materia, user_id=usuario_actual.id, tipo='Salida', area=Area.Bod.value)
     db.session.add(historial)
-    db.session.commit()
+    db.session.flush()
     historial_quimico = HistorialQuimicos(tipo='Materia',historial_materia = historial, fecha_registro = historial.fecha_registro, area=Area.Bod.value)
     db.session.add(historial_quimico)
-    db.session.commit()    
+    db.session.flush()
     return materia_schema.jsonify(materia)
 
 @materias.route("/json/bod/materia/<int:materia_id>/delete", methods=['DELETE'])
@@ -681,18 +705,7 @@ def json_bod_delete_materia(usuario_actual, materia_id):
     if materia.formulas != []:
         return jsonify({"error": "esta materia es parte de una o mas formulas, si deseas eliminarla entonces elimina las formulas de las que es parte."}), 422
 
-    historiales = HistorialMaterias.query.filter_by(materia_id=materia_id).all()
-    quimicos = Quimico.query.filter_by(materia_id=materia_id).all()
-    # Eliminar Tablas dependientes de Materia
-    for historial in historiales:
-        q_historiales = HistorialQuimicos.query.filter_by(materia_id=historial.id).all()
-        for q_historial in q_historiales:
-            db.session.delete(q_historial)
-        db.session.delete(historial)
-    for quimico in quimicos:
-        db.session.delete(quimico)
-    db.session.delete(materia)
-    db.session.commit()
+    eliminar_materia(materia, chunk=chunk_parametro())
     return jsonify({"success": "se ha eliminado correctamente la materia"})
 
 # ----------------------------------------------------------------------------------
@@ -700,6 +713,7 @@ def json_bod_delete_materia(usuario_actual, materia_id):
 @materias.route("/json/bod/materia/<int:materia_id>/historial")
 @token_required
 def json_bod_materia_historial(usuario_actual, materia_id):
+    json_bod(usuario_actual)
     materia = Materia.query.get(materia_id)
     if not materia:
         id = f"no existe materia con ID = {materia_id}"
@@ -707,11 +721,21 @@ def json_bod_materia_historial(usuario_actual, materia_id):
 
     if materia.area != Area.Bod.value:
         return abort(403)
-    historiales = HistorialMaterias.query.filter_by(materia_id=materia_id).all()
-    # if not historiales:
-    #     return jsonify({'mensaje': 'Esta materia no tiene historiales'})
-    output = historiales_materia_schema.dump(historiales)
-    return jsonify({'historiales': output})
+    proyeccion = campos_parametro(historiales_materia_proyeccion)
+    query = filtrar_historial(proyeccion.query().filter_by(materia_id=materia_id), HistorialMaterias)
+    historiales, cursor = paginar(query, HistorialMaterias)
+    output = proyeccion.dump(historiales)
+    return pagina_json('historiales', output, cursor)
+
+@materias.route("/json/bod/materia/historial")
+@token_required
+def json_bod_historial_materias(usuario_actual):
+    json_bod(usuario_actual)
+    proyeccion = campos_parametro(historiales_materia_proyeccion)
+    query = filtrar_historial(proyeccion.query().filter_by(area=Area.Bod.value), HistorialMaterias)
+    historiales, cursor = paginar(query, HistorialMaterias)
+    output = proyeccion.dump(historiales)
+    return pagina_json('historiales', output, cursor)
 
 
 # NOTAS:
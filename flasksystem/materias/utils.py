@@ -0,0 +1,32 @@
+from flasksystem.models import Materia, HistorialMaterias, HistorialQuimicos, Quimico
+from flasksystem.main.utils import eliminar_historiales, importar_catalogo
+from flasksystem.schema import importar_materias_schema
+from flasksystem.cache import catalogo_modificado
+from flasksystem.busqueda import busqueda_modificada, buscar
+
+def eliminar_materia(materia, chunk=None):
+    """Elimina una materia junto a sus historiales y su Quimico con un numero fijo de sentencias.
+
+    La materia no debe ser parte de ninguna formula, eso se valida en las rutas.
+    """
+    eliminar_historiales(HistorialMaterias, HistorialMaterias.materia_id, materia.id,
+                         HistorialQuimicos.materia_id, chunk)
+    Quimico.query.filter_by(materia_id=materia.id).delete(synchronize_session=False)
+    Materia.query.filter_by(id=materia.id).delete(synchronize_session='evaluate')
+
+def importar_materias(area, filas):
+    cantidad, errores = importar_catalogo(Materia, importar_materias_schema, 'Materia', area, filas)
+    if cantidad:
+        # Solo se agregan items nuevos, las respuestas de los existentes siguen vigentes
+        catalogo_modificado(area, items=())
+        busqueda_modificada(area)
+    return cantidad, errores
+
+def buscar_materias(area, consulta, pagina, tamano=20):
+    """Pagina `pagina` (desde 1) de las materias del area que coinciden con `consulta`.
+
+    Retorna (materias, hay_mas).
+    """
+    desde = (pagina - 1) * tamano
+    resultados = buscar(area, consulta, desde + tamano + 1, tipo='Materia')
+    return resultados[desde:desde + tamano], len(resultados) > desde + tamano
@@ -1,12 +1,8 @@
 import enum
 from datetime import datetime
-from flasksystem import db, login_manager
+from flasksystem import db
 from flask_login import UserMixin
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
 class Area(enum.Enum):
     Lab = 'Lab'
     Bod = 'Bod'
@@ -49,6 +45,8 @@ class User(db.Model, UserMixin):
     reactivos = db.relationship('HistorialReactivos', backref='user', lazy=True)
     materias = db.relationship('HistorialMaterias', backref='user', lazy=True)
     area = db.Column(db.String(15), nullable=False)
+    # Se incrementa para revocar los tokens emitidos con una version anterior
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     def __repr__(self):
         return f"User('{self.username}', '{self.email}', '{self.area.value}')"
@@ -56,23 +54,27 @@ class User(db.Model, UserMixin):
 class Quimico(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     tipo = db.Column(db.String(20), nullable=False)
-    reactivo_id = db.Column(db.Integer, db.ForeignKey('reactivo.id'))
-    materia_id = db.Column(db.Integer, db.ForeignKey('materia.id'))
-    area = db.Column(db.String(15), nullable=False)
+    reactivo_id = db.Column(db.Integer, db.ForeignKey('reactivo.id', ondelete='CASCADE'), index=True)
+    materia_id = db.Column(db.Integer, db.ForeignKey('materia.id', ondelete='CASCADE'), index=True)
+    area = db.Column(db.String(15), nullable=False, index=True)
 
 class Reactivo(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
     codigo = db.Column(db.String(30), nullable=False)
     medida = db.Column(db.String(20), nullable=False)
-    historial = db.relationship('HistorialReactivos', backref='reactivo', lazy=True)
-    quimico = db.relationship('Quimico', backref='reactivo', lazy=True)
+    historial = db.relationship('HistorialReactivos', backref='reactivo', lazy=True, passive_deletes=True)
+    quimico = db.relationship('Quimico', backref='reactivo', lazy=True, passive_deletes=True)
     cantidad = db.Column(db.Integer, nullable=False, default=0)
     bajo_stock = db.Column(db.Integer, nullable=False, default=0)
     tipo = db.Column(db.String(20), nullable=False, default='Reactivo')
-    formula = db.relationship('Formula', uselist=False, back_populates='reactivo') #Acceso a los datos de la tabla Formula
+    formula = db.relationship('Formula', uselist=False, back_populates='reactivo', passive_deletes=True) #Acceso a los datos de la tabla Formula
     area = db.Column(db.String(15), nullable=False)
     tiene_formula = db.Column(db.Boolean, nullable=False, default=False)
+    # Creacion del item, el stock historico lo omite antes de esta fecha. Nula en los items anteriores a la columna
+    fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_reactivo_area_id', 'area', 'id'),)
     
     # def __init__(self, nombre, codigo, medida, bajo_stock, area):
     #     self.nombre = nombre
@@ -89,38 +91,54 @@ class HistorialReactivos(db.Model):
     observacion = db.Column(db.String(100), nullable=True)
     cantidad = db.Column(db.Integer, nullable=False)
     fecha_registro = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    reactivo_id = db.Column(db.Integer, db.ForeignKey('reactivo.id'), nullable=False)
+    reactivo_id = db.Column(db.Integer, db.ForeignKey('reactivo.id', ondelete='CASCADE'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     tipo = db.Column(db.String(10), nullable=False)
-    historial_quimico = db.relationship('HistorialQuimicos', backref='historial_reactivo', lazy=True)
+    historial_quimico = db.relationship('HistorialQuimicos', backref='historial_reactivo', lazy=True, passive_deletes=True)
     lote = db.Column(db.String(20))
     area = db.Column(db.String(15), nullable=False)
 
+    # Indices para los listados y filtros del historial ordenados por (fecha_registro, id) descendente
+    __table_args__ = (db.Index('ix_historial_reactivos_area_fecha', area, fecha_registro.desc(), id.desc()),
+                      db.Index('ix_historial_reactivos_reactivo_fecha', reactivo_id, fecha_registro.desc(), id.desc()),
+                      db.Index('ix_historial_reactivos_user_area_fecha', user_id, area, fecha_registro.desc(), id.desc()),
+                      db.Index('ix_historial_reactivos_area_tipo_fecha', area, tipo, fecha_registro.desc(), id.desc()),
+                      db.Index('ix_historial_reactivos_lote_fecha', lote, fecha_registro.desc(), id.desc()))
+
 class Ingrediente(db.Model):
     materia_id = db.Column(db.Integer, db.ForeignKey('materia.id'), primary_key=True)
-    formula_id = db.Column(db.Integer, db.ForeignKey('formula.id'), primary_key=True)
+    formula_id = db.Column(db.Integer, db.ForeignKey('formula.id', ondelete='CASCADE'), primary_key=True, index=True)
     ratio = db.Column(db.DECIMAL, nullable=False)
     materia = db.relationship('Materia', back_populates='formulas', passive_deletes='all') #Acceso a los datos de la tabla Materia
     formula = db.relationship('Formula', back_populates='materias', passive_deletes='all') #Acceso a los datos de la tabla Formula
 
-class BodCorr(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    nro = db.Column(db.Integer, nullable=False, default=1)
-
-class LabCorr(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    nro = db.Column(db.Integer, nullable=False, default=1)
-
-# Cambiar BODCORR Y LABCORR A UN SOLO CORRELATIVO (QUIZAS ELEJIR UN MEJOR NOMBRE)
-# class Correlativo(db.Model):
-#     id = db.Column(db.Integer, primary_key=True)
-#     nro = db.Column(db.Integer, nullable=False, default=1)
+class Correlativo(db.Model):
+    # Un contador por clave y año, reemplaza a BodCorr y LabCorr. Los lotes de Lab y Bod comparten la clave 'Lotes'
+    area = db.Column(db.String(15), primary_key=True)
+    anio = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    nro = db.Column(db.Integer, nullable=False, default=0)
+
+class CatalogoVersion(db.Model):
+    # Version del catalogo de cada area, aumenta con cada cambio de reactivos, materias o formulas.
+    # Las filas 'busqueda:<area>' aumentan solo cuando cambian nombres o codigos (indice de busqueda).
+    # El cache de respuestas por item usa 'R:<id>', 'M:<id>', 'items:<area>' y 'formulas:<area>'
+    area = db.Column(db.String(15), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class StockSnapshot(db.Model):
+    # Stock de cada reactivo y materia del area al terminar el dia `fecha` (UTC), lo escribe `manage.py snapshot`.
+    # Sin llave foranea porque item_id apunta a reactivo o materia segun `tipo`
+    area = db.Column(db.String(15), primary_key=True)
+    fecha = db.Column(db.Date, primary_key=True)
+    tipo = db.Column(db.String(20), primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    cantidad = db.Column(db.Integer, nullable=False)
 
 class Formula(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    reactivo_id = db.Column(db.Integer, db.ForeignKey('reactivo.id'))
+    reactivo_id = db.Column(db.Integer, db.ForeignKey('reactivo.id', ondelete='CASCADE'), index=True)
     reactivo = db.relationship('Reactivo', back_populates='formula') # Accso a los datos de la tabla Reactivo
-    materias = db.relationship('Ingrediente', back_populates='formula') # Acceso a los datos de la tabla Ingrediente
+    materias = db.relationship('Ingrediente', back_populates='formula', passive_deletes=True) # Acceso a los datos de la tabla Ingrediente
 
     def __repr__(self):
         return f"Formula('{self.id}')"
@@ -131,13 +149,17 @@ class Materia(db.Model):
     nombre = db.Column(db.String(100), nullable=False)
     codigo = db.Column(db.String(30), nullable=False)
     medida = db.Column(db.String(20), nullable=False)
-    historial = db.relationship('HistorialMaterias', backref='materia', lazy=True)
-    quimico = db.relationship('Quimico', backref='materia', lazy=True)
+    historial = db.relationship('HistorialMaterias', backref='materia', lazy=True, passive_deletes=True)
+    quimico = db.relationship('Quimico', backref='materia', lazy=True, passive_deletes=True)
     cantidad = db.Column(db.Integer, nullable=False, default=0)
     bajo_stock = db.Column(db.Integer, nullable=False, default=0)
     tipo = db.Column(db.String(20), nullable=False, default='Materia')
     formulas = db.relationship('Ingrediente', back_populates='materia') #Acceso a los datos de la tabla Ingredientes
     area = db.Column(db.String(15), nullable=False)
+    # Creacion del item, el stock historico lo omite antes de esta fecha. Nula en los items anteriores a la columna
+    fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_materia_area_id', 'area', 'id'),)
     
     def __repr__(self):
         return f"Materia Prima('{self.nombre}', '{self.codigo}', '{self.medida}', '{self.area}')"
@@ -147,16 +169,27 @@ class HistorialMaterias(db.Model):
     observacion = db.Column(db.String(100), nullable=True)
     cantidad = db.Column(db.Integer, nullable=False)
     fecha_registro = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    materia_id = db.Column(db.Integer, db.ForeignKey('materia.id'), nullable=False)
+    materia_id = db.Column(db.Integer, db.ForeignKey('materia.id', ondelete='CASCADE'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     tipo = db.Column(db.String(10), nullable=False) 
-    historial_quimico = db.relationship('HistorialQuimicos', backref='historial_materia', lazy=True)
+    historial_quimico = db.relationship('HistorialQuimicos', backref='historial_materia', lazy=True, passive_deletes=True)
     area = db.Column(db.String(15), nullable=False)
+    # Produccion de reactivo que consumio esta materia, permite recorrer un lote hasta sus materias
+    produccion_id = db.Column(db.Integer, db.ForeignKey('historial_reactivos.id', ondelete='SET NULL'), index=True)
+    produccion = db.relationship('HistorialReactivos', backref=db.backref('consumos', lazy=True, passive_deletes=True))
+
+    __table_args__ = (db.Index('ix_historial_materias_area_fecha', area, fecha_registro.desc(), id.desc()),
+                      db.Index('ix_historial_materias_materia_fecha', materia_id, fecha_registro.desc(), id.desc()),
+                      db.Index('ix_historial_materias_user_area_fecha', user_id, area, fecha_registro.desc(), id.desc()),
+                      db.Index('ix_historial_materias_area_tipo_fecha', area, tipo, fecha_registro.desc(), id.desc()))
 
 class HistorialQuimicos(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     tipo = db.Column(db.String(20), nullable=False)
-    reactivo_id = db.Column(db.Integer, db.ForeignKey('historial_reactivos.id'))
-    materia_id = db.Column(db.Integer, db.ForeignKey('historial_materias.id'))
+    reactivo_id = db.Column(db.Integer, db.ForeignKey('historial_reactivos.id', ondelete='CASCADE'), index=True)
+    materia_id = db.Column(db.Integer, db.ForeignKey('historial_materias.id', ondelete='CASCADE'), index=True)
     fecha_registro = db.Column(db.DateTime, nullable=False)
     area = db.Column(db.String(15), nullable=False)
+
+    __table_args__ = (db.Index('ix_historial_quimicos_area_fecha', area, fecha_registro.desc(), id.desc()),
+                      db.Index('ix_historial_quimicos_fecha', fecha_registro.desc(), id.desc()))
@@ -1,9 +1,63 @@
 from flasksystem import db
 from flasksystem.models import Medida, Materia, Area
 from flask_wtf import FlaskForm
-from wtforms import StringField, SubmitField, SelectField, IntegerField, DecimalField
+from sqlalchemy import inspect
+from wtforms import Field, StringField, SubmitField, SelectField, IntegerField, DecimalField
 from wtforms.validators import DataRequired, Length, ValidationError
-from wtforms.ext.sqlalchemy.fields import QuerySelectMultipleField
+from wtforms.widgets import Select
+
+def etiqueta_materia(m):
+    return 'id: '+str(m.id) +' | nombre: '+m.nombre+' | codigo: '+m.codigo
+
+class LazyQuerySelectMultipleField(Field):
+    """Como QuerySelectMultipleField, pero sin cargar todas las opciones.
+
+    Solo se renderizan las opciones ya elegidas, el resto se buscan desde el navegador
+    (ver formula.html). Al validar, los ids enviados se cargan con una sola consulta
+    IN sobre `query_factory()`, un id que no este en esa consulta es invalido.
+    """
+    widget = Select(multiple=True)
+
+    def __init__(self, label=None, validators=None, query_factory=None, get_label=str, **kwargs):
+        super().__init__(label, validators, **kwargs)
+        self.query_factory = query_factory
+        self.get_label = get_label
+        self._ids = []
+        self._objetos = None
+        self._invalido = False
+
+    @property
+    def data(self):
+        if self._objetos is None:
+            self._objetos = []
+            if self._ids:
+                query = self.query_factory()
+                pk = inspect(query.column_descriptions[0]['entity']).primary_key[0]
+                objetos = {getattr(objeto, pk.key): objeto for objeto in query.filter(pk.in_(self._ids))}
+                self._objetos = [objetos[id] for id in self._ids if id in objetos]
+                self._invalido = self._invalido or len(self._objetos) != len(self._ids)
+        return self._objetos
+
+    @data.setter
+    def data(self, objetos):
+        self._ids = []
+        self._objetos = list(objetos) if objetos else None
+
+    def process_formdata(self, valuelist):
+        try:
+            self._ids = list(dict.fromkeys(int(valor) for valor in valuelist))
+        except ValueError:
+            self._ids = []
+            self._invalido = True
+        self._objetos = None
+
+    def iter_choices(self):
+        for objeto in self.data:
+            yield (objeto.id, self.get_label(objeto), True)
+
+    def pre_validate(self, form):
+        if self.data is not None and self._invalido:
+            raise ValidationError(self.gettext('Not a valid choice'))
 
 class ReactivoForm(FlaskForm):
     nombre = StringField('Nombre', validators=[DataRequired(), Length(max=100)])
@@ -46,15 +100,18 @@ class ReduceReactivoForm(FlaskForm):
             raise ValidationError('Ingresa una cantidad mayor a 0')
 
 class NewFormulaForm(FlaskForm):
-    materias = QuerySelectMultipleField('Elige Materias',query_factory=lambda: db.session.query(Materia), get_pk=lambda m: m.id, get_label=lambda m:'id: '+str(m.id) +' | nombre: '+m.nombre+' | codigo: '+m.codigo, validators=[DataRequired()]) #, widget=LazySelect()
+    materias = LazyQuerySelectMultipleField('Elige Materias', query_factory=lambda: db.session.query(Materia),
+                                            get_label=etiqueta_materia, validators=[DataRequired()])
     submit = SubmitField('Ingresa')
 
 class LabNewFormulaForm(FlaskForm):
-    materias = QuerySelectMultipleField('Elige Materias',query_factory=lambda: db.session.query(Materia).filter(Materia.area==Area.Lab.value), get_pk=lambda m: m.id, get_label=lambda m:'id: '+str(m.id) +' | nombre: '+m.nombre+' | codigo: '+m.codigo, validators=[DataRequired()]) #, widget=LazySelect()
+    materias = LazyQuerySelectMultipleField('Elige Materias', query_factory=lambda: db.session.query(Materia).filter(Materia.area==Area.Lab.value),
+                                            get_label=etiqueta_materia, validators=[DataRequired()])
     submit = SubmitField('Ingresa')
 
 class BodNewFormulaForm(FlaskForm):
-    materias = QuerySelectMultipleField('Elige Materias',query_factory=lambda: db.session.query(Materia).filter(Materia.area==Area.Bod.value), get_pk=lambda m: m.id, get_label=lambda m:'id: '+str(m.id) +' | nombre: '+m.nombre+' | codigo: '+m.codigo, validators=[DataRequired()]) #, widget=LazySelect()
+    materias = LazyQuerySelectMultipleField('Elige Materias', query_factory=lambda: db.session.query(Materia).filter(Materia.area==Area.Bod.value),
+                                            get_label=etiqueta_materia, validators=[DataRequired()])
     submit = SubmitField('Ingresa')
 
 class NewIngrediente(FlaskForm):
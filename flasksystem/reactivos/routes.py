@@ -1,22 +1,27 @@
-from datetime import datetime
 from flask import render_template, url_for, flash, redirect, request, abort, jsonify, Blueprint
 from flask_login import current_user, login_required
 from flasksystem import db
-from flasksystem.models import (Reactivo, HistorialReactivos, HistorialMaterias, Quimico, 
-                                Formula, Ingrediente, HistorialQuimicos, Area, BodCorr)
+from flasksystem.models import (Reactivo, HistorialReactivos, Quimico, 
+                                Formula, Ingrediente, HistorialQuimicos, Area)
 from flasksystem.reactivos.forms import (AddReactivoForm, ReduceReactivoForm, ReactivoForm, 
                                         NewFormulaForm, NewIngrediente, ConsultaForm, 
                                         LabNewFormulaForm, BodNewFormulaForm, ProdReactivoForm)
 from flasksystem.main.forms import ModBajoStockForm
-from flasksystem.main.utils import check_bod, check_lab, check_only_bod, check_only_lab
-from flasksystem.reactivos.utils import is_number
-from flasksystem.schema import (reactivo_schema, reactivos_schema, historial_reactivo_schema, historiales_reactivo_schema,
+from flasksystem.main.utils import (check_bod, check_lab, check_only_bod, check_only_lab, paginar, pagina_json,
+                                    campos_parametro, filtrar_historial, json_check_area, confirmar_sesion, json_lab,
+                                    json_bod, json_only_lab, json_only_bod, filas_importacion, chunk_parametro)
+from flasksystem.reactivos.utils import (is_number, producir_reactivo, consultar_produccion, capacidad_produccion,
+                                         eliminar_reactivo, ingredientes_formula, importar_reactivos)
+from flasksystem.schema import (reactivo_schema, historial_reactivo_schema,
                                 quimico_schema, quimicos_schema, historial_quimico_schema, historiales_quimico_schema,
-                                reactivo_bajo_stock_schema, materias_schema)
+                                reactivo_bajo_stock_schema, materias_schema, reactivos_proyeccion,
+                                historiales_reactivo_proyeccion)
 from flasksystem.users.routes import token_required
+from flasksystem.cache import etag_catalogo, cache_respuesta, cache_respuesta_item
 from marshmallow import ValidationError
 
 reactivos = Blueprint('reactivos', __name__)
+reactivos.after_request(confirmar_sesion)
 
 # --------------------------------SECTOR DE ROUTES LABORATORIO----------------------------------------------
 
@@ -29,10 +34,8 @@ def lab_new_reactivo():
         reactivo = Reactivo(nombre=form.nombre.data, codigo=form.codigo.data, 
                             medida=form.medida.data, bajo_stock=form.bajo_stock.data, area=Area.Lab.value)
         db.session.add(reactivo)
-        db.session.commit()
         quimico = Quimico(tipo='Reactivo', reactivo=reactivo, area=Area.Lab.value)
         db.session.add(quimico)
-        db.session.commit()
         flash('El reactivo se ha creado exitosamente!', 'success')
         return redirect(url_for('main.lab_home'))
     return render_template('crear_reactivo.html', title='Nuevo Reactivo', 
@@ -57,7 +60,6 @@ def lab_alerta_reactivo(reactivo_id):
     form = ModBajoStockForm()
     if form.validate_on_submit():
         reactivo.bajo_stock = form.bajo_stock.data
-        db.session.commit()
         flash('Actualizada la cantidad para la alerta de bajo stock', 'success')
         return redirect(url_for('reactivos.lab_reactivo', reactivo_id=reactivo.id))
     # return render template alerta_reactivo.html
@@ -84,10 +86,9 @@ def lab_add_reactivo(reactivo_id):
         historial = HistorialReactivos(observacion=form.observacion.data, cantidad=form.cantidad.data, 
                                         reactivo=reactivo, user = current_user, tipo='Entrada', area=Area.Lab.value)
         db.session.add(historial)
-        db.session.commit()
+        db.session.flush()
         historial_quimico = HistorialQuimicos(tipo='Reactivo', historial_reactivo=historial, fecha_registro=historial.fecha_registro, area=Area.Lab.value)
         db.session.add(historial_quimico)
-        db.session.commit()
         flash('Se ha añadido la entrada de reactivo', 'success')
         return redirect(url_for('reactivos.lab_reactivo', reactivo_id=reactivo.id))
     return render_template('añadir_reactivo.html', title='Menu Reactivo', 
@@ -127,10 +128,9 @@ def lab_reduce_reactivo(reactivo_id):
         historial = HistorialReactivos(observacion=form.observacion.data, cantidad=form.cantidad.data, lote=form.lote.data, 
                                         reactivo=reactivo, user = current_user, tipo='Salida', area=Area.Lab.value)
         db.session.add(historial)
-        db.session.commit()
+        db.session.flush()
         historial_quimico = HistorialQuimicos(tipo='Reactivo', historial_reactivo=historial, fecha_registro=historial.fecha_registro, area=Area.Lab.value)
         db.session.add(historial_quimico)
-        db.session.commit()
         flash('Se ha añadido la entrada de reactivo', 'success')
         return redirect(url_for('reactivos.lab_reactivo', reactivo_id=reactivo.id))
     return render_template('salida_reactivo.html', title='Menu Reactivo', 
@@ -143,22 +143,7 @@ def lab_delete_reactivo(reactivo_id):
     reactivo = Reactivo.query.get_or_404(reactivo_id)
     if reactivo.area != Area.Lab.value:
         return abort(403)
-    historiales = HistorialReactivos.query.filter_by(reactivo_id=reactivo_id).all()
-    quimicos = Quimico.query.filter_by(reactivo_id=reactivo_id).all()
-    formulas = Formula.query.filter_by(reactivo_id=reactivo_id).all()
-    # Eliminar Tablas dependientes de reactivo
-    for historial in historiales:
-        q_historiales = HistorialQuimicos.query.filter_by(reactivo_id=historial.id).all()
-        for q_historial in q_historiales:
-            db.session.delete(q_historial)
-        db.session.delete(historial)
-    for quimico in quimicos:
-        db.session.delete(quimico)
-    for formula in formulas:
-        Ingrediente.query.filter_by(formula_id = formula.id).delete()
-        db.session.delete(formula)
-    db.session.delete(reactivo)
-    db.session.commit()
+    eliminar_reactivo(reactivo)
     flash('El reactivo se ha eliminado', 'success')
     return redirect(url_for('main.lab_home'))
 
@@ -179,7 +164,6 @@ def lab_formula(reactivo_id):
             ing = Ingrediente(ratio=0, materia=materia)
             formula.materias.append(ing)
         db.session.add(formula)
-        db.session.commit()
         flash('Ingrese los ratios de las materias seleccionadas', 'info')
         return redirect(url_for('reactivos.lab_ingrediente', reactivo_id=reactivo.id))
     return render_template('formula.html', form=form, legend='Menu Formulas', area='Lab')
@@ -220,7 +204,6 @@ def lab_ingrediente(reactivo_id):
             ingrediente.ratio = form['ratio_'+str(i)]  
             i += 1
         reactivo.tiene_formula = True
-        db.session.commit()
 
         flash('Formula Creada', 'success')     
         return redirect(url_for('reactivos.lab_reactivo', reactivo_id=reactivo.id))
@@ -245,74 +228,14 @@ def lab_entrada_reactivo(reactivo_id):
         if ingrediente.ratio == 0:
             Ingrediente.query.filter_by(formula_id=formula.id).delete()
             db.session.delete(formula)
-            db.session.commit()
             flash('El proceso de asignarle formula al reactivo fue detenido antes de finalizar. Para asignarle una formula por favor complete el proceso', 'warning')
             return redirect(url_for('reactivos.lab_formula', reactivo_id = reactivo.id))
 
     form = ProdReactivoForm()
     if form.validate_on_submit():
-        ingredientes = Ingrediente.query.filter_by(formula_id=formula.id)
-        flag = True
-        for assoc in ingredientes:
-            if (assoc.materia.cantidad - form.cantidad.data * assoc.ratio) < 0:
-                flag = False
-                break
-        if flag:
-            
-            correlativo = BodCorr.query.first()
-            if correlativo:
-                correlativo.nro += 1 
-                db.session.commit()
-            else:
-                new_correlativo = BodCorr()
-                db.session.add(new_correlativo)
-                db.session.commit()
-
-            last = db.session.query(HistorialReactivos).filter(HistorialReactivos.area == Area.Lab.value).order_by(HistorialReactivos.id.desc()).first()
-            año_actual = datetime.utcnow().strftime("%y")
-            if last:
-                print("EXISTE LAST")
-                año_anterior = last.fecha_registro.strftime("%y")
-                if año_anterior != año_actual:
-                    correlativo = BodCorr.query.first()
-                    print("LOS AÑOS SON DIFERENTES")
-                    if correlativo:
-                        correlativo.nro = 1
-                        db.session.commit()
-                    else:
-                        new_correlativo = BodCorr()
-                        db.session.add(new_correlativo)
-                        db.session.commit()
-
-            correlativo = BodCorr.query.first()
-            nro_correlativo = f'{correlativo.nro:04}'
-            nro_analisis = f'{form.nro_analisis.data:04}'
-            lote = 'Q'+año_actual+nro_correlativo+nro_analisis
-                       
-            for assoc in ingredientes:
-                # print(assoc.materia.cantidad)
-                # print("-")
-                # print(assoc.ratio)
-                # print(assoc.materia.cantidad - assoc.ratio)
-                assoc.materia.cantidad -= (form.cantidad.data * assoc.ratio)
-                historial = HistorialMaterias(observacion=f"Produccion de reactivo [{reactivo.id}, {reactivo.nombre}]", 
-                                                cantidad=form.cantidad.data*assoc.ratio, materia=assoc.materia, 
-                                                user=current_user, tipo='Producción', area='Lab') # Quizas cambiar el tipo
-                db.session.add(historial)
-                db.session.commit()
-                historial_quimico = HistorialQuimicos(tipo='Materia', historial_materia = historial, 
-                                                        fecha_registro = historial.fecha_registro, area='Lab')
-                db.session.add(historial_quimico)
-                db.session.commit()
-            reactivo.cantidad += form.cantidad.data
-            historial = HistorialReactivos(observacion=form.observacion.data, cantidad=form.cantidad.data, 
-                                            reactivo=reactivo, user=current_user, tipo='Produccion', area='Lab', lote=lote) # Quizas cambiar el tipo
-            db.session.add(historial)
-            db.session.commit() 
-            historial_quimico = HistorialQuimicos(tipo='Reactivo', historial_reactivo = historial, 
-                                                    fecha_registro = historial.fecha_registro, area='Lab')
-            db.session.add(historial_quimico)
-            db.session.commit()
+        lote = producir_reactivo(reactivo, form.cantidad.data, form.nro_analisis.data, form.observacion.data, 
+                                    current_user, Area.Lab.value)
+        if lote:
             flash('Se ha producido con exito el reactivo', 'success')
             return redirect(url_for('reactivos.lab_reactivo', reactivo_id=reactivo.id))
         else:
@@ -339,21 +262,18 @@ def lab_consulta(reactivo_id):
         if ingrediente.ratio == 0:
             Ingrediente.query.filter_by(formula_id = formula.id).delete()
             db.session.delete(formula)
-            db.session.commit()
             flash('El proceso de asignarle formula al reactivo fue detenido antes de finalizar. Para asignarle una formula por favor complete el proceso', 'warning')
             return redirect(url_for('reactivos.lab_formula', reactivo_id = reactivo.id))
 
     form = ConsultaForm()
     if form.validate_on_submit():
-        flag = True
-        for assoc in ingredientes:
-            if (assoc.materia.cantidad - form.cantidad.data * assoc.ratio) < 0:
-                flag = False
-                break
-        if flag:
+        consulta = consultar_produccion(reactivo, form.cantidad.data)
+        limitantes = ', '.join(materia['nombre'] for materia in consulta['limitantes'])
+        if consulta['posible']:
             flash(f"Es posible crear {form.cantidad.data} {reactivo.medida} de reactivo", 'info')
         else:
             flash(f'No es posible crear {form.cantidad.data} {reactivo.medida} de reactivo', 'warning')
+        flash(f"Con el stock actual se pueden crear hasta {consulta['cantidad_maxima']} {reactivo.medida} (limitado por: {limitantes})", 'info')
         return redirect(url_for('reactivos.lab_consulta', reactivo_id = reactivo.id))
     return render_template('consulta.html', form=form, legend='Consulta', reactivo = reactivo, area='Lab')
 
@@ -371,10 +291,8 @@ def bod_new_reactivo():
         reactivo = Reactivo(nombre=form.nombre.data, codigo=form.codigo.data, 
                             medida=form.medida.data, bajo_stock=form.bajo_stock.data, area=Area.Bod.value)
         db.session.add(reactivo)
-        db.session.commit()
         quimico = Quimico(tipo='Reactivo', reactivo=reactivo, area=Area.Bod.value)
         db.session.add(quimico)
-        db.session.commit()
         flash('El reactivo se ha creado exitosamente!', 'success')
         return redirect(url_for('main.bod_home'))
     return render_template('crear_reactivo.html', title='Nuevo Reactivo', 
@@ -399,7 +317,6 @@ def bod_alerta_reactivo(reactivo_id):
     form = ModBajoStockForm()
     if form.validate_on_submit():
         reactivo.bajo_stock = form.bajo_stock.data
-        db.session.commit()
         flash('Actualizada la cantidad para la alerta de bajo stock', 'success')
         return redirect(url_for('reactivos.bod_reactivo', reactivo_id=reactivo.id))
     return render_template('alerta_reactivo.html', form=form, legend='Modifica Alerta', area='Bod', reactivo=reactivo)
@@ -425,10 +342,9 @@ def bod_add_reactivo(reactivo_id):
         historial = HistorialReactivos(observacion=form.observacion.data, cantidad=form.cantidad.data, 
                                         reactivo=reactivo, user = current_user, tipo='Entrada', area=Area.Bod.value)
         db.session.add(historial)
-        db.session.commit()
+        db.session.flush()
         historial_quimico = HistorialQuimicos(tipo='Reactivo',historial_reactivo=historial, fecha_registro=historial.fecha_registro, area=Area.Bod.value)
         db.session.add(historial_quimico)
-        db.session.commit()
         flash('Se ha añadido la entrada de reactivo', 'success')
         return redirect(url_for('reactivos.bod_reactivo', reactivo_id=reactivo.id))
     return render_template('añadir_reactivo.html', title='Menu Reactivo', 
@@ -467,10 +383,9 @@ def bod_reduce_reactivo(reactivo_id):
         historial = HistorialReactivos(observacion=form.observacion.data, cantidad=form.cantidad.data, lote=form.lote.data, 
                                         reactivo=reactivo, user = current_user, tipo='Salida', area=Area.Bod.value)
         db.session.add(historial)
-        db.session.commit()
+        db.session.flush()
         historial_quimico = HistorialQuimicos(tipo='Reactivo',historial_reactivo=historial, fecha_registro=historial.fecha_registro, area=Area.Bod.value)
         db.session.add(historial_quimico)
-        db.session.commit()
         flash('Se ha añadido la entrada de reactivo', 'success')
         return redirect(url_for('reactivos.bod_reactivo', reactivo_id=reactivo.id))
     return render_template('salida_reactivo.html', title='Menu Reactivo', 
@@ -483,22 +398,7 @@ def bod_delete_reactivo(reactivo_id):
     reactivo = Reactivo.query.get_or_404(reactivo_id)
     if reactivo.area != Area.Bod.value:
         return abort(403)
-    historiales = HistorialReactivos.query.filter_by(reactivo_id=reactivo_id).all()
-    quimicos = Quimico.query.filter_by(reactivo_id=reactivo_id).all()
-    formulas = Formula.query.filter_by(reactivo_id=reactivo_id).all()
-    # Eliminar Tablas dependientes de reactivo
-    for historial in historiales:
-        q_historiales = HistorialQuimicos.query.filter_by(reactivo_id=historial.id).all()
-        for q_historial in q_historiales:
-            db.session.delete(q_historial)
-        db.session.delete(historial)
-    for quimico in quimicos:
-        db.session.delete(quimico)
-    for formula in formulas:
-        Ingrediente.query.filter_by(formula_id = formula.id).delete()
-        db.session.delete(formula)
-    db.session.delete(reactivo)
-    db.session.commit()
+    eliminar_reactivo(reactivo)
     flash('El reactivo se ha eliminado', 'success')
     return redirect(url_for('main.bod_home'))
 
@@ -521,7 +421,6 @@ def bod_formula(reactivo_id):
             ing = Ingrediente(ratio=0, materia=materia)
             formula.materias.append(ing)
         db.session.add(formula)
-        db.session.commit()
         flash('Ingrese los ratios de las materias seleccionadas', 'info')
         return redirect(url_for('reactivos.bod_ingrediente', reactivo_id=reactivo.id))
     return render_template('formula.html', form=form, legend='Menu Formulas', area='Bod')
@@ -561,7 +460,6 @@ def bod_ingrediente(reactivo_id):
             ingrediente.ratio = form['ratio_'+str(i)]  
             i += 1
         reactivo.tiene_formula = True
-        db.session.commit()
 
         flash('Formula Creada', 'success')     
         return redirect(url_for('reactivos.bod_reactivo', reactivo_id=reactivo.id))
@@ -586,72 +484,14 @@ def bod_entrada_reactivo(reactivo_id):
         if ingrediente.ratio == 0:
             Ingrediente.query.filter_by(formula_id=formula.id).delete()
             db.session.delete(formula)
-            db.session.commit()
             flash('El proceso de asignarle formula al reactivo fue detenido antes de finalizar. Para asignarle una formula por favor complete el proceso', 'warning')
             return redirect(url_for('reactivos.bod_formula', reactivo_id = reactivo.id))
 
     form = ProdReactivoForm()
     if form.validate_on_submit():
-        ingredientes = Ingrediente.query.filter_by(formula_id=formula.id)
-        flag = True
-        for assoc in ingredientes:
-            if (assoc.materia.cantidad - form.cantidad.data * assoc.ratio) < 0:
-                flag = False
-                break
-        if flag:
-            correlativo = BodCorr.query.first()
-            if correlativo:
-                correlativo.nro += 1 
-                db.session.commit()
-            else:
-                new_correlativo = BodCorr()
-                db.session.add(new_correlativo)
-                db.session.commit()
-
-            last = db.session.query(HistorialReactivos).filter(HistorialReactivos.area == Area.Bod.value).order_by(HistorialReactivos.id.desc()).first()
-            año_actual = datetime.utcnow().strftime("%y")
-            if last:
-                print("EXISTE LAST")
-                año_anterior = last.fecha_registro.strftime("%y")
-                if año_anterior != año_actual:
-                    correlativo = BodCorr.query.first()
-                    print("LOS AÑOS SON DIFERENTES")
-                    if correlativo:
-                        correlativo.nro = 1
-                        db.session.commit()
-                    else:
-                        new_correlativo = BodCorr()
-                        db.session.add(new_correlativo)
-                        db.session.commit()
-
-            correlativo = BodCorr.query.first()
-            nro_correlativo = f'{correlativo.nro:04}'
-            nro_analisis = f'{form.nro_analisis.data:04}'
-            lote = 'Q'+año_actual+nro_correlativo+nro_analisis
-            for assoc in ingredientes:
-                # print(assoc.materia.cantidad)
-                # print("-")
-                # print(assoc.ratio)
-                # print(assoc.materia.cantidad - assoc.ratio)
-                assoc.materia.cantidad -= (form.cantidad.data * assoc.ratio)
-                historial = HistorialMaterias(observacion=f"Produccion de reactivo [{reactivo.id}, {reactivo.nombre}]", 
-                                                cantidad=form.cantidad.data*assoc.ratio, materia=assoc.materia, 
-                                                user=current_user, tipo='Produccion', area='Bod') # Quizas cambiar el tipo
-                db.session.add(historial)
-                db.session.commit()
-                historial_quimico = HistorialQuimicos(tipo='Materia', historial_materia = historial, 
-                                                        fecha_registro = historial.fecha_registro, area='Bod')
-                db.session.add(historial_quimico)
-                db.session.commit()
-            reactivo.cantidad += form.cantidad.data
-            historial = HistorialReactivos(observacion=form.observacion.data, cantidad=form.cantidad.data, 
-                                            reactivo=reactivo, user=current_user, tipo='Produccion', area='Bod', lote=lote) # Quizas cambiar el tipo
-            db.session.add(historial)
-            db.session.commit() 
-            historial_quimico = HistorialQuimicos(tipo='Reactivo', historial_reactivo = historial, 
-                                                    fecha_registro = historial.fecha_registro, area='Bod')
-            db.session.add(historial_quimico)
-            db.session.commit()
+        lote = producir_reactivo(reactivo, form.cantidad.data, form.nro_analisis.data, form.observacion.data, 
+                                    current_user, Area.Bod.value)
+        if lote:
             flash('Se ha producido con exito el reactivo', 'success')
             return redirect(url_for('reactivos.bod_reactivo', reactivo_id=reactivo.id))
         else:
@@ -678,42 +518,23 @@ def bod_consulta(reactivo_id):
         if ingrediente.ratio == 0:
             Ingrediente.query.filter_by(formula_id = formula.id).delete()
             db.session.delete(formula)
-            db.session.commit()
             flash('El proceso de asignarle formula al reactivo fue detenido antes de finalizar. Para asignarle una formula por favor complete el proceso', 'warning')
             return redirect(url_for('reactivos.bod_formula', reactivo_id = reactivo.id))
 
     form = ConsultaForm()
     if form.validate_on_submit():
-        flag = True
-        for assoc in ingredientes:
-            if (assoc.materia.cantidad - form.cantidad.data * assoc.ratio) < 0:
-                flag = False
-                break
-        if flag:
+        consulta = consultar_produccion(reactivo, form.cantidad.data)
+        limitantes = ', '.join(materia['nombre'] for materia in consulta['limitantes'])
+        if consulta['posible']:
             flash(f"Es posible crear {form.cantidad.data} {reactivo.medida} de reactivo", 'info')
         else:
             flash(f'No es posible crear {form.cantidad.data} {reactivo.medida} de reactivo', 'warning')
+        flash(f"Con el stock actual se pueden crear hasta {consulta['cantidad_maxima']} {reactivo.medida} (limitado por: {limitantes})", 'info')
         return redirect(url_for('reactivos.bod_consulta', reactivo_id = reactivo.id))
     return render_template('consulta.html', form=form, legend='Consulta', reactivo = reactivo, area='Bod')
 
 # ----------------------------------------------------------------------------------------------------------    
 
-def json_only_lab(usuario_actual):
-    if usuario_actual.area != Area.Lab.value:
-        return abort(403)
-
-def json_lab(usuario_actual):
-    if usuario_actual.area != Area.Lab.value and usuario_actual.area != Area.Lab_Bod.value:
-        return abort(403)
-
-def json_only_bod(usuario_actual):
-    if usuario_actual != Area.Bod.value:
-        return abort(403)
-
-def json_bod(usuario_actual):
-    if usuario_actual != Area.Bod.value and usuario_actual.area != Area.Lab_Bod.value:
-        return abort(403)
-
 # --------------------------------SECTOR DE ROUTES API LAB--------------------------------------------------
 
 @reactivos.route("/json/lab/reactivo/create", methods=['POST'])
@@ -732,14 +553,29 @@ def json_lab_new_reactivo(usuario_actual):
         return jsonify(err.messages), 422
 
     db.session.add(reactivo)
-    db.session.commit()
     quimico = Quimico(tipo='Reactivo', reactivo=reactivo, area=Area.Lab.value)
     db.session.add(quimico)
-    db.session.commit()
+    db.session.flush()
     return reactivo_schema.jsonify(reactivo)
 
+@reactivos.route("/json/lab/reactivo/import", methods=['POST'])
+@token_required
+def json_lab_import_reactivos(usuario_actual):
+    json_only_lab(usuario_actual)
+
+    filas = filas_importacion()
+    if not filas:
+        return jsonify({'mensaje': 'Invalid request'}), 400
+
+    cantidad, errores = importar_reactivos(Area.Lab.value, filas)
+    if errores:
+        return jsonify({'mensaje': 'Ninguna fila fue importada', 'errores': errores}), 422
+    return jsonify({'mensaje': f'Se importaron {cantidad} reactivos', 'cantidad': cantidad}), 201
+
 @reactivos.route("/json/lab/reactivo/<int:reactivo_id>")
 @token_required
+@etag_catalogo
+@cache_respuesta_item('Reactivo')
 def json_lab_reactivo(usuario_actual, reactivo_id):
     json_lab(usuario_actual)
     reactivo = Reactivo.query.get(reactivo_id)
@@ -752,6 +588,24 @@ def json_lab_reactivo(usuario_actual, reactivo_id):
     output = reactivo_schema.dump(reactivo)
     return output
 
+@reactivos.route("/json/lab/reactivo/<int:reactivo_id>/formula")
+@token_required
+@etag_catalogo
+@cache_respuesta_item('Reactivo', formula=True)
+def json_lab_formula(usuario_actual, reactivo_id):
+    json_lab(usuario_actual)
+    reactivo = Reactivo.query.get(reactivo_id)
+    if not reactivo:
+        id = f"no existe reactivo con ID = {reactivo_id}"
+        return jsonify({"error": id}), 404
+    if reactivo.area != Area.Lab.value:
+        return abort(403)
+
+    if not reactivo.tiene_formula:
+        return jsonify({"error": "Este reactivo no tiene una formula asociada"}), 422
+
+    return jsonify({"reactivo_id": reactivo.id, "ingredientes": ingredientes_formula(reactivo)})
+
 @reactivos.route("/json/lab/reactivo/<int:reactivo_id>/alerta", methods=['PUT'])
 @token_required
 def json_lab_alerta_reactivo(usuario_actual, reactivo_id):
@@ -786,16 +640,19 @@ def json_lab_alerta_reactivo(usuario_actual, reactivo_id):
     except ValidationError as err:
         return jsonify(err.messages)
 
-    db.session.commit()
+    db.session.flush()
     return reactivo_schema.jsonify(reactivo)
 
 @reactivos.route("/json/lab/reactivo/home")
 @token_required
+@etag_catalogo
+@cache_respuesta
 def json_lab_home_reactivo(usuario_actual):
     json_lab(usuario_actual)
     # reactivos = Reactivo.query.filter_by(area=Area.Lab).all() # Esta forma no tiene order_by
-    reactivos = db.session.query(Reactivo).filter(Reactivo.area == Area.Lab.value).all()
-    output = reactivos_schema.dump(reactivos)
+    proyeccion = campos_parametro(reactivos_proyeccion)
+    reactivos = proyeccion.query().filter(Reactivo.area == Area.Lab.value).all()
+    output = proyeccion.dump(reactivos)
     return jsonify({"reactivos" : output})
 
 @reactivos.route("/json/lab/reactivo/<int:reactivo_id>/add", methods=['POST'])
@@ -832,12 +689,12 @@ def json_lab_add_reactivo(usuario_actual, reactivo_id):
         observacion = ""
 
     reactivo.cantidad += cantidad
-    historial = HistorialReactivos(observacion=observacion, cantidad=cantidad, reactivo=reactivo, user=usuario_actual, tipo='Entrada', area=Area.Lab.value)
+    historial = HistorialReactivos(observacion=observacion, cantidad=cantidad, reactivo=reactivo, user_id=usuario_actual.id, tipo='Entrada', area=Area.Lab.value)
     db.session.add(historial)
-    db.session.commit()
+    db.session.flush()
     historial_quimico = HistorialQuimicos(tipo='Reactivo', historial_reactivo=historial, fecha_registro=historial.fecha_registro, area=Area.Lab.value)
     db.session.add(historial_quimico)
-    db.session.commit()
+    db.session.flush()
     return reactivo_schema.jsonify(reactivo)
 
 @reactivos.route("/json/lab/reactivo/<int:reactivo_id>/historial")
@@ -852,19 +709,23 @@ def json_lab_historial_reactivo_especifico(usuario_actual, reactivo_id):
     if reactivo.area != Area.Lab.value:
         return abort(403)
 
-    historiales = HistorialReactivos.query.filter_by(reactivo=reactivo).all()
-    if not historiales:
+    proyeccion = campos_parametro(historiales_reactivo_proyeccion)
+    query = filtrar_historial(proyeccion.query().filter_by(reactivo_id=reactivo.id), HistorialReactivos)
+    historiales, cursor = paginar(query, HistorialReactivos)
+    if not historiales and not request.args.get('after'):
         return jsonify({'mensaje': 'Esta materia no tiene historiales'})
-    output = historiales_reactivo_schema.dump(historiales)
-    return jsonify({'historiales': output})
+    output = proyeccion.dump(historiales)
+    return pagina_json('historiales', output, cursor)
 
 @reactivos.route("/json/lab/reactivo/historial")
 @token_required
 def json_lab_historial_reactivos(usuario_actual):
     json_lab(usuario_actual)
-    historiales = HistorialReactivos.query.filter_by(area=Area.Lab.value).all()
-    output = historiales_reactivo_schema.dump(historiales)
-    return jsonify({"historiales": output})
+    proyeccion = campos_parametro(historiales_reactivo_proyeccion)
+    query = filtrar_historial(proyeccion.query().filter_by(area=Area.Lab.value), HistorialReactivos)
+    historiales, cursor = paginar(query, HistorialReactivos)
+    output = proyeccion.dump(historiales)
+    return pagina_json('historiales', output, cursor)
 
 @reactivos.route("/json/lab/reactivo/<int:reactivo_id>/reduce", methods=['PUT'])
 @token_required
@@ -906,12 +767,12 @@ def json_lab_reduce_reactivo(usuario_actual, reactivo_id):
 
     reactivo.cantidad -= cantidad
     historial = HistorialReactivos(observacion=observacion, cantidad=cantidad, lote=lote, 
-                                    reactivo=reactivo, user=usuario_actual, tipo='Salida', area=Area.Lab.value)
+                                    reactivo=reactivo, user_id=usuario_actual.id, tipo='Salida', area=Area.Lab.value)
     db.session.add(historial)
-    db.session.commit()
+    db.session.flush()
     historial_quimico = HistorialQuimicos(tipo='Reactivo', historial_reactivo=historial, fecha_registro=historial.fecha_registro, area=Area.Lab.value)
     db.session.add(historial_quimico)
-    db.session.commit()
+    db.session.flush()
     return reactivo_schema.jsonify(reactivo)
 
 @reactivos.route("/json/lab/reactivo/<int:reactivo_id>/delete", methods=['DELETE'])
@@ -927,22 +788,7 @@ def json_lab_delete_reactivo(usuario_actual, reactivo_id):
     if reactivo.area != Area.Lab.value:
         return abort(403)
 
-    historiales = HistorialReactivos.query.filter_by(reactivo_id=reactivo_id).all()
-    quimicos = Quimico.query.filter_by(reactivo_id=reactivo_id).all()
-    formulas = Formula.query.filter_by(reactivo_id=reactivo_id).all()
-    # Eliminar Tablas dependientes de reactivo
-    for historial in historiales:
-        q_historiales = HistorialQuimicos.query.filter_by(reactivo_id=historial.id).all()
-        for q_historial in q_historiales:
-            db.session.delete(q_historial)
-        db.session.delete(historial)
-    for quimico in quimicos:
-        db.session.delete(quimico)
-    for formula in formulas:
-        Ingrediente.query.filter_by(formula_id = formula.id).delete()
-        db.session.delete(formula)
-    db.session.delete(reactivo)
-    db.session.commit()
+    eliminar_reactivo(reactivo, chunk=chunk_parametro())
     return jsonify({"success": "se ha eliminado correctamente el reactivo"})
 
 @reactivos.route("/json/lab/reactivo/<int:reactivo_id>/producir", methods=['POST'])
@@ -992,73 +838,14 @@ def json_lab_entrada_reactivo(usuario_actual, reactivo_id):
         if ingrediente.ratio == 0:
             Ingrediente.query.filter_by(formula_id=formula.id).delete()
             db.session.delete(formula)
+            # La limpieza de la formula incompleta se confirma aunque la respuesta sea un error
             db.session.commit()
             return jsonify({"error": "Este reactivo no tiene una formula asociada"}), 422
 
-    ingredientes = Ingrediente.query.filter_by(formula_id=formula.id)
-    flag = True
-    for assoc in ingredientes:
-        if (assoc.materia.cantidad - cantidad * assoc.ratio) < 0:
-            flag = False
-            break
-    if flag:
-        
-        correlativo = BodCorr.query.first()
-        if correlativo:
-            correlativo.nro += 1 
-            db.session.commit()
-        else:
-            new_correlativo = BodCorr()
-            db.session.add(new_correlativo)
-            db.session.commit()
-
-        last = db.session.query(HistorialReactivos).filter(HistorialReactivos.area == Area.Lab.value).order_by(HistorialReactivos.id.desc()).first()
-        año_actual = datetime.utcnow().strftime("%y")
-        if last:
-            # print("EXISTE LAST")
-            año_anterior = last.fecha_registro.strftime("%y")
-            if año_anterior != año_actual:
-                correlativo = BodCorr.query.first()
-                # print("LOS AÑOS SON DIFERENTES")
-                if correlativo:
-                    correlativo.nro = 1
-                    db.session.commit()
-                else:
-                    new_correlativo = BodCorr()
-                    db.session.add(new_correlativo)
-                    db.session.commit()
-
-        correlativo = BodCorr.query.first()
-        nro_correlativo = f'{correlativo.nro:04}'
-        nro_analisis = f'{nro_analisis:04}'
-        lote = 'Q'+año_actual+nro_correlativo+nro_analisis
-                    
-        for assoc in ingredientes:
-            # print(assoc.materia.cantidad)
-            # print("-")
-            # print(assoc.ratio)
-            # print(assoc.materia.cantidad - assoc.ratio)
-            assoc.materia.cantidad -= (cantidad * assoc.ratio)
-            historial = HistorialMaterias(observacion=f"Produccion de reactivo [{reactivo.id}, {reactivo.nombre}]", 
-                                            cantidad=cantidad*assoc.ratio, materia=assoc.materia, 
-                                            user=usuario_actual, tipo='Producción', area='Lab') # Quizas cambiar el tipo
-            db.session.add(historial)
-            db.session.commit()
-            historial_quimico = HistorialQuimicos(tipo='Materia', historial_materia = historial, 
-                                                    fecha_registro = historial.fecha_registro, area='Lab')
-            db.session.add(historial_quimico)
-            db.session.commit()
-        reactivo.cantidad += cantidad
-        historial = HistorialReactivos(observacion=observacion, cantidad=cantidad, 
-                                        reactivo=reactivo, user=current_user, tipo='Produccion', area='Lab', lote=lote) # Quizas cambiar el tipo
-        db.session.add(historial)
-        db.session.commit() 
-        historial_quimico = HistorialQuimicos(tipo='Reactivo', historial_reactivo = historial, 
-                                                fecha_registro = historial.fecha_registro, area='Lab')
-        db.session.add(historial_quimico)
-        db.session.commit()
+    lote = producir_reactivo(reactivo, cantidad, nro_analisis, observacion, usuario_actual, Area.Lab.value)
+    if lote:
         descripcion = f"Se ha producido con exito {cantidad} {reactivo.medida} de {reactivo.nombre}"
-        return jsonify({"success": descripcion})
+        return jsonify({"success": descripcion, "lote": lote})
     else:
         return jsonify({"error": "No es posible producir esta cantidad de reactivo debido a que la cantidad ingresada supera al stock de las materias"})
 
@@ -1072,7 +859,7 @@ def json_lab_consulta(usuario_actual, reactivo_id):
         id = f"no existe reactivo con ID = {reactivo_id}"
         return jsonify({"error": id}), 404    
 
-    if reactivo.area != Area.Bod.value:
+    if reactivo.area != Area.Lab.value:
         return abort(403)
 
     if not reactivo.tiene_formula:
@@ -1100,20 +887,16 @@ def json_lab_consulta(usuario_actual, reactivo_id):
         if ingrediente.ratio == 0:
             Ingrediente.query.filter_by(formula_id = formula.id).delete()
             db.session.delete(formula)
+            # La limpieza de la formula incompleta se confirma aunque la respuesta sea un error
             db.session.commit()
             return jsonify({"error": "Este reactivo no tiene una formula asociada"}), 422
 
-    flag = True
-    for assoc in ingredientes:
-        if (assoc.materia.cantidad - cantidad * assoc.ratio) < 0:
-            flag = False
-            break
-    if flag:
-        descripcion = f"Es posible crear {cantidad} {reactivo.medida} de reactivo"
-        return jsonify({"mensaje": descripcion})
+    consulta = consultar_produccion(reactivo, cantidad)
+    if consulta['posible']:
+        consulta['mensaje'] = f"Es posible crear {cantidad} {reactivo.medida} de reactivo"
     else:
-        descripcion = f'No es posible crear {cantidad} {reactivo.medida} de reactivo'
-        return jsonify({"mensaje": descripcion})
+        consulta['mensaje'] = f'No es posible crear {cantidad} {reactivo.medida} de reactivo'
+    return jsonify(consulta)
 # ----------------------------------------------------------------------------------------------------------
 
 
@@ -1135,14 +918,29 @@ def json_bod_new_reactivo(usuario_actual):
         return jsonify(err.messages), 422
 
     db.session.add(reactivo)
-    db.session.commit()
     quimico = Quimico(tipo='Reactivo', reactivo=reactivo, area=Area.Bod.value)
     db.session.add(quimico)
-    db.session.commit()
+    db.session.flush()
     return reactivo_schema.jsonify(reactivo)
 
+@reactivos.route("/json/bod/reactivo/import", methods=['POST'])
+@token_required
+def json_bod_import_reactivos(usuario_actual):
+    json_only_bod(usuario_actual)
+
+    filas = filas_importacion()
+    if not filas:
+        return jsonify({'mensaje': 'Invalid request'}), 400
+
+    cantidad, errores = importar_reactivos(Area.Bod.value, filas)
+    if errores:
+        return jsonify({'mensaje': 'Ninguna fila fue importada', 'errores': errores}), 422
+    return jsonify({'mensaje': f'Se importaron {cantidad} reactivos', 'cantidad': cantidad}), 201
+
 @reactivos.route("/json/bod/reactivo/<int:reactivo_id>")
 @token_required
+@etag_catalogo
+@cache_respuesta_item('Reactivo')
 def json_bod_reactivo(usuario_actual, reactivo_id):
     json_bod(usuario_actual)
     reactivo = Reactivo.query.get(reactivo_id)
@@ -1155,6 +953,24 @@ def json_bod_reactivo(usuario_actual, reactivo_id):
     output = reactivo_schema.dump(reactivo)
     return output
 
+@reactivos.route("/json/bod/reactivo/<int:reactivo_id>/formula")
+@token_required
+@etag_catalogo
+@cache_respuesta_item('Reactivo', formula=True)
+def json_bod_formula(usuario_actual, reactivo_id):
+    json_bod(usuario_actual)
+    reactivo = Reactivo.query.get(reactivo_id)
+    if not reactivo:
+        id = f"no existe reactivo con ID = {reactivo_id}"
+        return jsonify({"error": id}), 404
+    if reactivo.area != Area.Bod.value:
+        return abort(403)
+
+    if not reactivo.tiene_formula:
+        return jsonify({"error": "Este reactivo no tiene una formula asociada"}), 422
+
+    return jsonify({"reactivo_id": reactivo.id, "ingredientes": ingredientes_formula(reactivo)})
+
 @reactivos.route("/json/bod/reactivo/<int:reactivo_id>/alerta", methods=['PUT'])
 @token_required
 def json_bod_alerta_reactivo(usuario_actual, reactivo_id):
@@ -1189,16 +1005,19 @@ def json_bod_alerta_reactivo(usuario_actual, reactivo_id):
     except ValidationError as err:
         return jsonify(err.messages)
 
-    db.session.commit()
+    db.session.flush()
     return reactivo_schema.jsonify(reactivo)
 
 @reactivos.route("/json/bod/reactivo/home")
 @token_required
+@etag_catalogo
+@cache_respuesta
 def json_bod_home_reactivo(usuario_actual):
     json_bod(usuario_actual)
     # reactivos = Reactivo.query.filter_by(area=Area.bod).all() # Esta forma no tiene order_by
-    reactivos = db.session.query(Reactivo).filter(Reactivo.area == Area.Bod.value).all()
-    output = reactivos_schema.dump(reactivos)
+    proyeccion = campos_parametro(reactivos_proyeccion)
+    reactivos = proyeccion.query().filter(Reactivo.area == Area.Bod.value).all()
+    output = proyeccion.dump(reactivos)
     return jsonify({"reactivos" : output})
 
 @reactivos.route("/json/bod/reactivo/<int:reactivo_id>/add", methods=['POST'])
@@ -1235,12 +1054,12 @@ def json_bod_add_reactivo(usuario_actual, reactivo_id):
         observacion = ""
 
     reactivo.cantidad += cantidad
-    historial = HistorialReactivos(observacion=observacion, cantidad=cantidad, reactivo=reactivo, user=usuario_actual, tipo='Entrada', area=Area.Bod.value)
+    historial = HistorialReactivos(observacion=observacion, cantidad=cantidad, reactivo=reactivo, user_id=usuario_actual.id, tipo='Entrada', area=Area.Bod.value)
     db.session.add(historial)
-    db.session.commit()
+    db.session.flush()
     historial_quimico = HistorialQuimicos(tipo='Reactivo', historial_reactivo=historial, fecha_registro=historial.fecha_registro, area=Area.Bod.value)
     db.session.add(historial_quimico)
-    db.session.commit()
+    db.session.flush()
     return reactivo_schema.jsonify(reactivo)
 
 @reactivos.route("/json/bod/reactivo/<int:reactivo_id>/historial")
@@ -1255,19 +1074,23 @@ def json_bod_historial_reactivo_especifico(usuario_actual, reactivo_id):
     if reactivo.area != Area.Bod.value:
         return abort(403)
 
-    historiales = HistorialReactivos.query.filter_by(reactivo=reactivo).all()
-    if not historiales:
+    proyeccion = campos_parametro(historiales_reactivo_proyeccion)
+    query = filtrar_historial(proyeccion.query().filter_by(reactivo_id=reactivo.id), HistorialReactivos)
+    historiales, cursor = paginar(query, HistorialReactivos)
+    if not historiales and not request.args.get('after'):
         return jsonify({'mensaje': 'Esta materia no tiene historiales'})
-    output = historiales_reactivo_schema.dump(historiales)
-    return jsonify({'historiales': output})
+    output = proyeccion.dump(historiales)
+    return pagina_json('historiales', output, cursor)
 
 @reactivos.route("/json/bod/reactivo/historial")
 @token_required
 def json_bod_historial_reactivos(usuario_actual):
     json_bod(usuario_actual)
-    historiales = HistorialReactivos.query.filter_by(area=Area.Bod.value).all()
-    output = historiales_reactivo_schema.dump(historiales)
-    return jsonify({"historiales": output})
+    proyeccion = campos_parametro(historiales_reactivo_proyeccion)
+    query = filtrar_historial(proyeccion.query().filter_by(area=Area.Bod.value), HistorialReactivos)
+    historiales, cursor = paginar(query, HistorialReactivos)
+    output = proyeccion.dump(historiales)
+    return pagina_json('historiales', output, cursor)
 
 @reactivos.route("/json/bod/reactivo/<int:reactivo_id>/reduce", methods=['PUT'])
 @token_required
@@ -1309,12 +1132,12 @@ def json_bod_reduce_reactivo(usuario_actual, reactivo_id):
 
     reactivo.cantidad -= cantidad
     historial = HistorialReactivos(observacion=observacion, cantidad=cantidad, lote=lote, 
-                                    reactivo=reactivo, user=usuario_actual, tipo='Salida', area=Area.Bod.value)
+                                    reactivo=reactivo, user_id=usuario_actual.id, tipo='Salida', area=Area.Bod.value)
     db.session.add(historial)
-    db.session.commit()
+    db.session.flush()
     historial_quimico = HistorialQuimicos(tipo='Reactivo', historial_reactivo=historial, fecha_registro=historial.fecha_registro, area=Area.Bod.value)
     db.session.add(historial_quimico)
-    db.session.commit()
+    db.session.flush()
     return reactivo_schema.jsonify(reactivo)
 
 @reactivos.route("/json/bod/reactivo/<int:reactivo_id>/delete", methods=['DELETE'])
@@ -1330,22 +1153,7 @@ def json_bod_delete_reactivo(usuario_actual, reactivo_id):
     if reactivo.area != Area.Bod.value:
         return abort(403)
 
-    historiales = HistorialReactivos.query.filter_by(reactivo_id=reactivo_id).all()
-    quimicos = Quimico.query.filter_by(reactivo_id=reactivo_id).all()
-    formulas = Formula.query.filter_by(reactivo_id=reactivo_id).all()
-    # Eliminar Tablas dependientes de reactivo
-    for historial in historiales:
-        q_historiales = HistorialQuimicos.query.filter_by(reactivo_id=historial.id).all()
-        for q_historial in q_historiales:
-            db.session.delete(q_historial)
-        db.session.delete(historial)
-    for quimico in quimicos:
-        db.session.delete(quimico)
-    for formula in formulas:
-        Ingrediente.query.filter_by(formula_id = formula.id).delete()
-        db.session.delete(formula)
-    db.session.delete(reactivo)
-    db.session.commit()
+    eliminar_reactivo(reactivo, chunk=chunk_parametro())
     return jsonify({"success": "se ha eliminado correctamente el reactivo"})
 
 @reactivos.route("/json/bod/reactivo/<int:reactivo_id>/producir", methods=['POST'])
@@ -1395,73 +1203,14 @@ def json_bod_entrada_reactivo(usuario_actual, reactivo_id):
         if ingrediente.ratio == 0:
             Ingrediente.query.filter_by(formula_id=formula.id).delete()
             db.session.delete(formula)
+            # La limpieza de la formula incompleta se confirma aunque la respuesta sea un error
             db.session.commit()
             return jsonify({"error": "Este reactivo no tiene una formula asociada"}), 422
 
-    ingredientes = Ingrediente.query.filter_by(formula_id=formula.id)
-    flag = True
-    for assoc in ingredientes:
-        if (assoc.materia.cantidad - cantidad * assoc.ratio) < 0:
-            flag = False
-            break
-    if flag:
-        
-        correlativo = BodCorr.query.first()
-        if correlativo:
-            correlativo.nro += 1 
-            db.session.commit()
-        else:
-            new_correlativo = BodCorr()
-            db.session.add(new_correlativo)
-            db.session.commit()
-
-        last = db.session.query(HistorialReactivos).filter(HistorialReactivos.area == Area.Bod.value).order_by(HistorialReactivos.id.desc()).first()
-        año_actual = datetime.utcnow().strftime("%y")
-        if last:
-            # print("EXISTE LAST")
-            año_anterior = last.fecha_registro.strftime("%y")
-            if año_anterior != año_actual:
-                correlativo = BodCorr.query.first()
-                # print("LOS AÑOS SON DIFERENTES")
-                if correlativo:
-                    correlativo.nro = 1
-                    db.session.commit()
-                else:
-                    new_correlativo = BodCorr()
-                    db.session.add(new_correlativo)
-                    db.session.commit()
-
-        correlativo = BodCorr.query.first()
-        nro_correlativo = f'{correlativo.nro:04}'
-        nro_analisis = f'{nro_analisis:04}'
-        lote = 'Q'+año_actual+nro_correlativo+nro_analisis
-                    
-        for assoc in ingredientes:
-            # print(assoc.materia.cantidad)
-            # print("-")
-            # print(assoc.ratio)
-            # print(assoc.materia.cantidad - assoc.ratio)
-            assoc.materia.cantidad -= (cantidad * assoc.ratio)
-            historial = HistorialMaterias(observacion=f"Produccion de reactivo [{reactivo.id}, {reactivo.nombre}]", 
-                                            cantidad=cantidad*assoc.ratio, materia=assoc.materia, 
-                                            user=usuario_actual, tipo='Producción', area='bod') # Quizas cambiar el tipo
-            db.session.add(historial)
-            db.session.commit()
-            historial_quimico = HistorialQuimicos(tipo='Materia', historial_materia = historial, 
-                                                    fecha_registro = historial.fecha_registro, area='bod')
-            db.session.add(historial_quimico)
-            db.session.commit()
-        reactivo.cantidad += cantidad
-        historial = HistorialReactivos(observacion=observacion, cantidad=cantidad, 
-                                        reactivo=reactivo, user=current_user, tipo='Produccion', area='bod', lote=lote) # Quizas cambiar el tipo
-        db.session.add(historial)
-        db.session.commit() 
-        historial_quimico = HistorialQuimicos(tipo='Reactivo', historial_reactivo = historial, 
-                                                fecha_registro = historial.fecha_registro, area='bod')
-        db.session.add(historial_quimico)
-        db.session.commit()
+    lote = producir_reactivo(reactivo, cantidad, nro_analisis, observacion, usuario_actual, Area.Bod.value)
+    if lote:
         descripcion = f"Se ha producido con exito {cantidad} {reactivo.medida} de {reactivo.nombre}"
-        return jsonify({"success": descripcion})
+        return jsonify({"success": descripcion, "lote": lote})
     else:
         return jsonify({"error": "No es posible producir esta cantidad de reactivo debido a que la cantidad ingresada supera al stock de las materias"})
 
@@ -1503,19 +1252,22 @@ def json_bod_consulta(usuario_actual, reactivo_id):
         if ingrediente.ratio == 0:
             Ingrediente.query.filter_by(formula_id = formula.id).delete()
             db.session.delete(formula)
+            # La limpieza de la formula incompleta se confirma aunque la respuesta sea un error
             db.session.commit()
             return jsonify({"error": "Este reactivo no tiene una formula asociada"}), 422
 
-    flag = True
-    for assoc in ingredientes:
-        if (assoc.materia.cantidad - cantidad * assoc.ratio) < 0:
-            flag = False
-            break
-    if flag:
-        descripcion = f"Es posible crear {cantidad} {reactivo.medida} de reactivo"
-        return jsonify({"mensaje": descripcion})
+    consulta = consultar_produccion(reactivo, cantidad)
+    if consulta['posible']:
+        consulta['mensaje'] = f"Es posible crear {cantidad} {reactivo.medida} de reactivo"
     else:
-        descripcion = f'No es posible crear {cantidad} {reactivo.medida} de reactivo'
-        return jsonify({"mensaje": descripcion})
+        consulta['mensaje'] = f'No es posible crear {cantidad} {reactivo.medida} de reactivo'
+    return jsonify(consulta)
+
+# ----------------------------------------------------------------------------------------------------------
 
-# ----------------------------------------------------------------------------------------------------------
\ No newline at end of file
+@reactivos.route("/json/<area>/produccion/capacidad")
+@token_required
+@etag_catalogo
+def json_capacidad_produccion(usuario_actual, area):
+    area = json_check_area(usuario_actual, area)
+    return jsonify({'capacidad': capacidad_produccion(area)})
@@ -1,6 +1,220 @@
+import sqlite3
+import threading
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP, ROUND_FLOOR
+import numpy as np
+from sqlalchemy import text
+from flasksystem import db
+from flasksystem.models import (Reactivo, Materia, Ingrediente, Formula, HistorialMaterias, HistorialReactivos,
+                                HistorialQuimicos, Quimico)
+from flasksystem.main.utils import eliminar_historiales, importar_catalogo
+from flasksystem.schema import importar_reactivos_schema
+from flasksystem.cache import version_catalogo, catalogo_modificado
+from flasksystem.busqueda import busqueda_modificada
+
+# Fila de correlativo usada por los lotes de ambas areas
+CORRELATIVO_LOTES = 'Lotes'
+
+# (version del catalogo, resultado) de capacidad_produccion por area
+_capacidad_cache = {}
+_capacidad_lock = threading.Lock()
+
 def is_number(s):
     try:
         float(s)
         return True
     except ValueError:
-        return False
\ No newline at end of file
+        return False
+
+def siguiente_correlativo(area, anio):
+    """Reserva el siguiente correlativo de (area, anio) con una sola sentencia atomica.
+
+    `area` es la clave del contador, los lotes usan CORRELATIVO_LOTES para ambas areas.
+
+    El contador de cada año parte en 1, por lo que no es necesario revisar el
+    historial para detectar el cambio de año.
+    """
+    if db.session.get_bind().dialect.name == 'sqlite' and sqlite3.sqlite_version_info < (3, 35):
+        # SQLite antiguo no soporta RETURNING, el UPDATE toma el lock de escritura antes del SELECT
+        actualizados = db.session.execute(text("UPDATE correlativo SET nro = nro + 1 WHERE area = :area AND anio = :anio"),
+                                          {'area': area, 'anio': anio}).rowcount
+        if not actualizados:
+            db.session.execute(text("INSERT INTO correlativo (area, anio, nro) VALUES (:area, :anio, 1)"),
+                               {'area': area, 'anio': anio})
+        return db.session.execute(text("SELECT nro FROM correlativo WHERE area = :area AND anio = :anio"),
+                                  {'area': area, 'anio': anio}).scalar()
+    return db.session.execute(text("INSERT INTO correlativo (area, anio, nro) VALUES (:area, :anio, 1) "
+                                   "ON CONFLICT (area, anio) DO UPDATE SET nro = correlativo.nro + 1 "
+                                   "RETURNING nro"), {'area': area, 'anio': anio}).scalar()
+
+def siguiente_lote(nro_analisis, ahora):
+    # Lab y Bod comparten el correlativo (como antes BodCorr) para que un lote no se repita entre areas
+    nro_correlativo = siguiente_correlativo(CORRELATIVO_LOTES, ahora.year)
+    return f'Q{ahora.strftime("%y")}{nro_correlativo:04}{nro_analisis:04}'
+
+def producir_reactivo(reactivo, cantidad, nro_analisis, observacion, user, area):
+    """Produce `cantidad` de reactivo descontando las materias de su formula.
+
+    Bloquea el reactivo y sus materias, valida el stock, descuenta cada Materia y
+    escribe todos los historiales en una sola transaccion con un unico flush. Retorna el lote asignado o None si alguna
+    materia no tiene stock suficiente (en ese caso no se modifica nada).
+    """
+    # Se bloquea el reactivo y luego sus materias en orden de id, igual que registrar_movimientos, para
+    # evitar deadlocks. populate_existing recarga el stock de los objetos que ya estaban en la sesion
+    reactivo = Reactivo.query.filter_by(id=reactivo.id).with_for_update().populate_existing().one()
+    ingredientes = (db.session.query(Ingrediente.ratio, Materia)
+                    .join(Materia, Ingrediente.materia_id == Materia.id)
+                    .join(Formula, Ingrediente.formula_id == Formula.id)
+                    .filter(Formula.reactivo_id == reactivo.id)
+                    .order_by(Materia.id)
+                    .with_for_update(of=Materia)
+                    .populate_existing()
+                    .all())
+    # Las columnas son enteras, se redondea igual que lo haria Postgres al guardar el numeric. Se valida
+    # el mismo consumo que se descuenta y queda en el historial
+    consumos = [(materia, int((cantidad * ratio).to_integral_value(rounding=ROUND_HALF_UP)))
+                for ratio, materia in ingredientes]
+    for materia, consumo in consumos:
+        if materia.cantidad - consumo < 0:
+            return None
+
+    # La fecha se asigna aqui para no depender del default de la base y poder copiarla a HistorialQuimicos
+    ahora = datetime.utcnow()
+    lote = siguiente_lote(nro_analisis, ahora)
+
+    reactivo.cantidad += cantidad
+    produccion = HistorialReactivos(observacion=observacion, cantidad=cantidad, reactivo_id=reactivo.id, user_id=user.id,
+                                    tipo='Produccion', area=area, lote=lote, fecha_registro=ahora)
+    registros = [produccion,
+                 HistorialQuimicos(tipo='Reactivo', historial_reactivo=produccion, fecha_registro=ahora, area=area)]
+    for materia, consumo in consumos:
+        materia.cantidad -= consumo
+        historial = HistorialMaterias(observacion=f"Produccion de reactivo [{reactivo.id}, {reactivo.nombre}]",
+                                        cantidad=consumo, materia_id=materia.id, user_id=user.id,
+                                        tipo='Producción', area=area, fecha_registro=ahora, produccion=produccion)
+        registros.append(historial)
+        registros.append(HistorialQuimicos(tipo='Materia', historial_materia=historial, fecha_registro=ahora, area=area))
+
+    # Un solo flush: los HistorialQuimicos se insertan en lote (executemany) una vez conocidos los ids
+    db.session.add_all(registros)
+    db.session.flush()
+    return lote
+
+def eliminar_reactivo(reactivo, chunk=None):
+    """Elimina un reactivo junto a sus historiales, Quimico y formula con un numero fijo de sentencias."""
+    # Los consumos de materias se conservan, solo pierden el enlace a la produccion (SQLite no aplica SET NULL)
+    producciones = db.session.query(HistorialReactivos.id).filter(HistorialReactivos.reactivo_id == reactivo.id)
+    (HistorialMaterias.query.filter(HistorialMaterias.produccion_id.in_(producciones))
+     .update({HistorialMaterias.produccion_id: None}, synchronize_session=False))
+    eliminar_historiales(HistorialReactivos, HistorialReactivos.reactivo_id, reactivo.id,
+                         HistorialQuimicos.reactivo_id, chunk)
+    Quimico.query.filter_by(reactivo_id=reactivo.id).delete(synchronize_session=False)
+    formulas = db.session.query(Formula.id).filter(Formula.reactivo_id == reactivo.id)
+    Ingrediente.query.filter(Ingrediente.formula_id.in_(formulas)).delete(synchronize_session=False)
+    Formula.query.filter_by(reactivo_id=reactivo.id).delete(synchronize_session=False)
+    Reactivo.query.filter_by(id=reactivo.id).delete(synchronize_session='evaluate')
+
+def importar_reactivos(area, filas):
+    cantidad, errores = importar_catalogo(Reactivo, importar_reactivos_schema, 'Reactivo', area, filas)
+    if cantidad:
+        # Solo se agregan items nuevos, las respuestas de los existentes siguen vigentes
+        catalogo_modificado(area, items=())
+        busqueda_modificada(area)
+    return cantidad, errores
+
+def ingredientes_formula(reactivo):
+    """Materias y ratios de la formula del reactivo, en una sola consulta."""
+    filas = (db.session.query(Materia.id, Materia.nombre, Materia.medida, Ingrediente.ratio)
+             .join(Ingrediente, Ingrediente.materia_id == Materia.id)
+             .join(Formula, Ingrediente.formula_id == Formula.id)
+             .filter(Formula.reactivo_id == reactivo.id)
+             .order_by(Materia.id)
+             .all())
+    return [{'materia_id': fila.id, 'nombre': fila.nombre, 'medida': fila.medida, 'ratio': float(fila.ratio)}
+            for fila in filas]
+
+def consultar_produccion(reactivo, cantidad):
+    """Calcula cuanto reactivo se puede producir con el stock actual de sus materias.
+
+    Retorna la cantidad maxima producible (min de materia.cantidad / ratio), las
+    materias que la limitan y, para la cantidad solicitada, cuanto falta de cada una.
+    Las materias con ratio 0 (formula sin terminar) no limitan la produccion y quedan
+    con `maximo` None, igual que en capacidad_produccion. Retorna None si ninguna
+    materia de la formula tiene ratio mayor a 0.
+    """
+    filas = (db.session.query(Materia.id, Materia.nombre, Materia.cantidad, Materia.medida, Ingrediente.ratio)
+             .join(Ingrediente, Ingrediente.materia_id == Materia.id)
+             .join(Formula, Ingrediente.formula_id == Formula.id)
+             .filter(Formula.reactivo_id == reactivo.id)
+             .all())
+    ingredientes = []
+    for fila in filas:
+        ratio = Decimal(fila.ratio)
+        requerido = cantidad * ratio
+        maximo = int((fila.cantidad / ratio).to_integral_value(rounding=ROUND_FLOOR)) if ratio > 0 else None
+        ingredientes.append({'materia_id': fila.id, 'nombre': fila.nombre, 'medida': fila.medida,
+                             'stock': fila.cantidad, 'ratio': float(ratio), 'requerido': float(requerido),
+                             'faltante': float(max(requerido - fila.cantidad, 0)), 'maximo': maximo})
+    maximos = [ingrediente['maximo'] for ingrediente in ingredientes if ingrediente['maximo'] is not None]
+    if not maximos:
+        return None
+    maximo = min(maximos)
+    limitantes = [{'materia_id': i['materia_id'], 'nombre': i['nombre']} for i in ingredientes if i['maximo'] == maximo]
+    return {'cantidad': cantidad, 'posible': maximo >= cantidad, 'cantidad_maxima': maximo,
+            'limitantes': limitantes, 'ingredientes': ingredientes}
+
+def capacidad_produccion(area):
+    """Cantidad maxima producible de cada reactivo con formula del area.
+
+    Carga formulas, ratios y stock en una sola consulta y calcula la matriz
+    reactivos x materias con NumPy. El resultado queda en cache mientras no
+    cambie la version del catalogo del area.
+    """
+    version = version_catalogo(area)
+    with _capacidad_lock:
+        cacheado = _capacidad_cache.get(area)
+        if cacheado is not None and cacheado[0] == version:
+            return cacheado[1]
+
+    filas = (db.session.query(Reactivo.id, Reactivo.nombre, Reactivo.medida, Materia.id, Materia.nombre,
+                              Materia.cantidad, Ingrediente.ratio)
+             .join(Formula, Formula.reactivo_id == Reactivo.id)
+             .join(Ingrediente, Ingrediente.formula_id == Formula.id)
+             .join(Materia, Ingrediente.materia_id == Materia.id)
+             .filter(Reactivo.area == area, Reactivo.tiene_formula == True)
+             .order_by(Reactivo.id)
+             .all())
+
+    reactivos, materias = {}, {}
+    for reactivo_id, nombre, medida, materia_id, materia_nombre, _, _ in filas:
+        reactivos.setdefault(reactivo_id, (nombre, medida))
+        materias.setdefault(materia_id, materia_nombre)
+    indice_reactivo = {reactivo_id: i for i, reactivo_id in enumerate(reactivos)}
+    indice_materia = {materia_id: j for j, materia_id in enumerate(materias)}
+
+    ratios = np.zeros((len(reactivos), len(materias)))
+    stock = np.zeros(len(materias))
+    for reactivo_id, _, _, materia_id, _, cantidad, ratio in filas:
+        ratios[indice_reactivo[reactivo_id], indice_materia[materia_id]] = float(ratio)
+        stock[indice_materia[materia_id]] = cantidad
+
+    # Las materias que no forman parte de la formula (ratio 0) no limitan la produccion
+    posibles = np.divide(stock, ratios, out=np.full(ratios.shape, np.inf), where=ratios > 0)
+    # El epsilon evita que errores de redondeo (7 / 0.7 = 9.999...) resten una unidad
+    maximos = np.floor(posibles.min(axis=1, initial=np.inf) + 1e-9)
+
+    materia_ids = list(materias)
+    output = []
+    for reactivo_id, i in indice_reactivo.items():
+        nombre, medida = reactivos[reactivo_id]
+        if np.isinf(maximos[i]):
+            continue
+        limitantes = np.flatnonzero(np.floor(posibles[i] + 1e-9) == maximos[i])
+        output.append({'reactivo_id': reactivo_id, 'nombre': nombre, 'medida': medida,
+                       'cantidad_maxima': int(maximos[i]),
+                       'limitantes': [{'materia_id': materia_ids[j], 'nombre': materias[materia_ids[j]]}
+                                      for j in limitantes]})
+
+    with _capacidad_lock:
+        _capacidad_cache[area] = (version, output)
+    return output
@@ -1,4 +1,5 @@
-from flasksystem import ma
+from operator import itemgetter
+from flasksystem import ma, db
 from flasksystem.models import Reactivo, Materia, User, Quimico, HistorialReactivos, HistorialMaterias, HistorialQuimicos
 from marshmallow import ValidationError, validates_schema
 
@@ -52,6 +53,8 @@ class HistorialReactivosSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = HistorialReactivos
         include_relationships = True
+        # Las materias consumidas por una produccion se consultan en /json/lote/<lote>
+        exclude = ('consumos',)
 
 class HistorialMateriasSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
@@ -80,15 +83,92 @@ class ReactivoBajoStockSchema(ma.SQLAlchemySchema):
     bajo_stock = ma.auto_field(validate=validate_positive)
 
 
+def valores_fila(indices):
+    # Tupla con los valores de la fila en `indices`, itemgetter retorna un escalar con un solo indice
+    if len(indices) == 1:
+        i, = indices
+        return lambda fila: (fila[i],)
+    return itemgetter(*indices) if indices else lambda fila: ()
+
+
+class Proyeccion:
+    """Columnas de un listado y su serializador.
+
+    Los listados consultan solo estas columnas (filas de SQLAlchemy, tuplas con
+    __slots__, en vez de instancias del ORM) y las serializan armando cada dict
+    con itemgetter, con la misma salida que el schema equivalente. Las claves se
+    toman del nombre (o label) de cada columna.
+    """
+
+    def __init__(self, *columnas, quimicos=None, requeridas=(), salida=None):
+        self.columnas = columnas
+        # FK de HistorialQuimicos para armar la lista `historial_quimico` de cada historial
+        self.quimicos = quimicos
+        # Columnas que se consultan aunque no se pidan (las usa paginar para el cursor)
+        self.requeridas = requeridas
+        self.claves = tuple(columna.key for columna in columnas) + (('historial_quimico',) if quimicos is not None else ())
+        self.salida = frozenset(salida if salida is not None else self.claves)
+        self._reducidas = {}
+        # Posicion en la fila de cada clave de salida y claves de fecha a serializar en ISO
+        campos = [(columna.key, i) for i, columna in enumerate(columnas) if columna.key in self.salida]
+        self._claves = tuple(clave for clave, _ in campos)
+        self._valores = valores_fila([i for _, i in campos])
+        self._fechas = tuple(columna.key for columna in columnas
+                             if columna.key in self.salida and isinstance(columna.type, db.DateTime))
+
+    def campos(self, nombres):
+        """Proyeccion reducida a `nombres` (?fields=), consulta y serializa solo esas columnas.
+
+        Lanza ValueError si algun campo no existe en el listado.
+        """
+        salida = frozenset(nombres)
+        desconocidos = salida - set(self.claves)
+        if desconocidos:
+            raise ValueError(', '.join(sorted(desconocidos)))
+        if salida not in self._reducidas:
+            necesarias = set(salida) | {columna.key for columna in self.requeridas}
+            if 'historial_quimico' in salida:
+                necesarias.add('id')
+            columnas = [columna for columna in self.columnas if columna.key in necesarias]
+            quimicos = self.quimicos if 'historial_quimico' in salida else None
+            self._reducidas[salida] = Proyeccion(*columnas, quimicos=quimicos, requeridas=self.requeridas,
+                                                 salida=salida)
+        return self._reducidas[salida]
+
+    def query(self):
+        return db.session.query(*self.columnas)
+
+    def dump(self, filas):
+        claves, valores = self._claves, self._valores
+        output = [dict(zip(claves, valores(fila))) for fila in filas]
+        for clave in self._fechas:
+            for item in output:
+                if item[clave] is not None:
+                    item[clave] = item[clave].isoformat()
+        if self.quimicos is not None:
+            relacionados = {}
+            if filas:
+                for historial_id, id in (db.session.query(self.quimicos, HistorialQuimicos.id)
+                                         .filter(self.quimicos.in_([fila.id for fila in filas]))
+                                         .order_by(HistorialQuimicos.id)):
+                    relacionados.setdefault(historial_id, []).append(id)
+            for fila, item in zip(filas, output):
+                item['historial_quimico'] = relacionados.get(fila.id, [])
+        return output
+
+
 # Init Schema
 
 reactivo_schema = ReactivoSchema()
 reactivo_bajo_stock_schema = ReactivoBajoStockSchema()
 reactivos_schema = ReactivoSchema(many=True)
+# Importacion en lote: crea instancias nuevas sin buscar cada fila en la base
+importar_reactivos_schema = ReactivoSchema(many=True, transient=True)
 
 materia_schema = MateriaSchema()
 materia_bajo_stock_schema = MateriaBajoStockSchema()
 materias_schema = MateriaSchema(many=True)
+importar_materias_schema = MateriaSchema(many=True, transient=True)
 
 user_schema = UserSchema()
 users_schema = UserSchema(many=True)
@@ -104,3 +184,21 @@ historiales_materia_schema = HistorialMateriasSchema(many=True)
 
 historial_quimico_schema = HistorialQuimicosSchema()
 historiales_quimico_schema = HistorialQuimicosSchema(many=True)
+
+# Proyecciones de los listados, equivalentes a reactivos_schema, materias_schema y los schemas de historiales
+
+reactivos_proyeccion = Proyeccion(Reactivo.id, Reactivo.nombre, Reactivo.codigo, Reactivo.bajo_stock, Reactivo.area,
+                                  Reactivo.cantidad, Reactivo.medida)
+materias_proyeccion = Proyeccion(Materia.id, Materia.nombre, Materia.codigo, Materia.bajo_stock, Materia.area,
+                                 Materia.cantidad, Materia.medida)
+historiales_reactivo_proyeccion = Proyeccion(
+    HistorialReactivos.id, HistorialReactivos.observacion, HistorialReactivos.cantidad,
+    HistorialReactivos.fecha_registro, HistorialReactivos.reactivo_id.label('reactivo'),
+    HistorialReactivos.user_id.label('user'), HistorialReactivos.tipo, HistorialReactivos.lote,
+    HistorialReactivos.area, quimicos=HistorialQuimicos.reactivo_id,
+    requeridas=(HistorialReactivos.id, HistorialReactivos.fecha_registro))
+historiales_materia_proyeccion = Proyeccion(
+    HistorialMaterias.id, HistorialMaterias.observacion, HistorialMaterias.cantidad,
+    HistorialMaterias.fecha_registro, HistorialMaterias.materia_id.label('materia'),
+    HistorialMaterias.user_id.label('user'), HistorialMaterias.tipo, HistorialMaterias.area,
+    HistorialMaterias.produccion_id.label('produccion'), quimicos=HistorialQuimicos.materia_id, requeridas=(HistorialMaterias.id, HistorialMaterias.fecha_registro))
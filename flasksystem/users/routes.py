@@ -4,14 +4,18 @@ import datetime
 import os
 from flask import render_template, url_for, flash, redirect, request, Blueprint, jsonify, make_response
 from flask_login import login_user, current_user, logout_user, login_required
-from flasksystem import db, bcrypt
+from flasksystem import db
 from flasksystem.users.forms import RegistrationForm, LoginForm, UpdateAccountForm, UpdatePasswordForm
 from flasksystem.models import User
 from flasksystem.schema import user_schema
+from flasksystem.main.utils import confirmar_sesion
+from flasksystem.users.utils import (principales, principal_usuario, Claims, UsuarioToken, generar_hash,
+                                     verificar_password)
 from functools import wraps
 from sqlalchemy import or_
 
 users = Blueprint('users', __name__)
+users.after_request(confirmar_sesion)
 
 def token_required(f):
     @wraps(f)
@@ -24,13 +28,22 @@ def token_required(f):
         if not token:
             return jsonify({'mensaje': 'No se encuentra el token!'}), 401
         
-        try:
-            data = jwt.decode(token, os.environ.get('SECRET_KEY'))
-            usuario_actual = User.query.filter_by(id=data['id']).first()
-        except:
+        # Un token ya verificado se resuelve desde la cache sin volver a decodificarlo
+        claims = principales.get(('token', token))
+        if claims is None:
+            try:
+                data = jwt.decode(token, os.environ.get('SECRET_KEY'))
+                claims = Claims(data['id'], data['area'], data['ver'])
+            except:
+                return jsonify({'mensaje': 'El token es invalido!'}), 401
+            principales.set(('token', token), claims, expira=data['exp'])
+
+        # La version vigente tambien viene de la cache, asi los tokens revocados se rechazan sin consultar la base
+        principal = principal_usuario(claims.id)
+        if not principal or principal.token_version != claims.version:
             return jsonify({'mensaje': 'El token es invalido!'}), 401
 
-        return f(usuario_actual, *args, **kwargs)
+        return f(UsuarioToken(claims.id, claims.area), *args, **kwargs)
         
     return decorated
 
@@ -40,10 +53,9 @@ def register():
         return redirect(url_for('users.login'))
     form = RegistrationForm()
     if form.validate_on_submit():
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        hashed_password = generar_hash(form.password.data)
         user = User(username=form.username.data, email=form.email.data.lower(), password=hashed_password, area=form.area.data)
         db.session.add(user)
-        db.session.commit()
         flash('Your account has been created! you are now able to log in', 'success')
         return redirect(url_for('users.login'))
     return render_template('register.html', title='Register', form=form)
@@ -57,7 +69,7 @@ def login():
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
         print(form.password.data)
-        if user and bcrypt.check_password_hash(user.password, form.password.data):
+        if user and verificar_password(user, form.password.data):
             login_user(user, remember=form.remember.data)
             next_page = request.args.get('next')
             return redirect(next_page) if next_page else redirect(url_for('main.home'))
@@ -78,7 +90,6 @@ def account():
     if form.validate_on_submit():
         current_user.username = form.username.data
         current_user.email = form.email.data
-        db.session.commit()
         flash('Your account has been updated', 'success')
         return redirect(url_for('users.account'))
     elif request.method == 'GET':
@@ -91,9 +102,10 @@ def account():
 def password():
     form = UpdatePasswordForm()
     if form.validate_on_submit():
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        hashed_password = generar_hash(form.password.data)
         current_user.password = hashed_password
-        db.session.commit()
+        # Cambiar la contraseña revoca los tokens emitidos hasta ahora
+        current_user.token_version += 1
         flash('Contraseña actualizada con exito', 'success')
         return redirect(url_for('users.account'))
     return render_template('password.html', form=form, legend='Cambiar contraseña')
@@ -113,8 +125,9 @@ def json_login():
     if not user:
         return make_response('No se pudo verificar', 401, {'WWW-Authenticate': 'Basic realm="Login Required!"'})
     
-    if bcrypt.check_password_hash(user.password, auth.password):
-        token = jwt.encode({'id' : user.id, 'exp' : datetime.datetime.utcnow() + datetime.timedelta(minutes=30)}, os.environ.get('SECRET_KEY'))
+    if verificar_password(user, auth.password):
+        token = jwt.encode({'id' : user.id, 'area' : user.area, 'ver' : user.token_version,
+                            'exp' : datetime.datetime.utcnow() + datetime.timedelta(minutes=30)}, os.environ.get('SECRET_KEY'))
         return jsonify({"token" : token.decode("UTF-8")})
     
     return make_response('No se pudo verificar', 401, {'WWW-Authenticate': 'Basic realm="Login Required!"'})
@@ -131,9 +144,9 @@ def json_register():
     exist = db.session.query(User).filter(or_(User.username==username, User.email==email)).first()
     if exist:
         return jsonify({"mensaje": "Un usuario con el username o email ingresado ya esta registrado"})
-    hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+    hashed_password = generar_hash(password)
     user = User(username=username, email=email.lower(), password=hashed_password, area=area)
     db.session.add(user)
-    db.session.commit()
+    db.session.flush()
     return user_schema.jsonify(user)
 
@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as EsperaAgotada
+from flask import current_app, abort
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+from flasksystem import db, login_manager, bcrypt
+from flasksystem.models import User
+
+PRINCIPAL_TTL = 300
+# Los datos del usuario (token_version, area) solo se invalidan en el proceso que los cambia,
+# este TTL acota cuanto tarda otro worker en rechazar un token revocado
+PRINCIPAL_USUARIO_TTL = 5
+PRINCIPAL_MAXIMO = 1024
+
+# Datos del usuario autenticado que se guardan en cache, la contraseña se carga solo si se usa
+Principal = namedtuple('Principal', ['id', 'username', 'email', 'area', 'token_version'])
+
+# Claims firmados de un token ya verificado
+Claims = namedtuple('Claims', ['id', 'area', 'version'])
+
+# Usuario de las rutas json: id y area salen de los claims, sin cargar el User
+UsuarioToken = namedtuple('UsuarioToken', ['id', 'area'])
+
+class PrincipalCache:
+    """Cache LRU con TTL de principales, por token verificado o por id de usuario (Flask-Login)."""
+
+    def __init__(self, maximo=PRINCIPAL_MAXIMO, ttl=PRINCIPAL_TTL):
+        self.maximo = maximo
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entradas = OrderedDict()
+        self._por_usuario = {}
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[1] <= time.time():
+                if entrada is not None:
+                    self._quitar(clave)
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.hits += 1
+            return entrada[0]
+
+    def set(self, clave, principal, expira=None, ttl=None):
+        # Una entrada nunca vive mas alla del exp del token
+        vence = time.time() + (ttl if ttl is not None else self.ttl)
+        if expira is not None:
+            vence = min(vence, expira)
+        with self._lock:
+            if clave in self._entradas:
+                self._quitar(clave)
+            self._entradas[clave] = (principal, vence)
+            self._por_usuario.setdefault(principal.id, set()).add(clave)
+            while len(self._entradas) > self.maximo:
+                self._quitar(next(iter(self._entradas)))
+
+    def invalidar(self, user_id):
+        with self._lock:
+            for clave in self._por_usuario.pop(user_id, ()):
+                self._entradas.pop(clave, None)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'tamano': len(self._entradas)}
+
+    def _quitar(self, clave):
+        principal, _ = self._entradas.pop(clave)
+        claves = self._por_usuario.get(principal.id)
+        if claves is not None:
+            claves.discard(clave)
+            if not claves:
+                del self._por_usuario[principal.id]
+
+principales = PrincipalCache()
+
+def principal_de(usuario):
+    return Principal(usuario.id, usuario.username, usuario.email, usuario.area, usuario.token_version)
+
+def principal_usuario(user_id):
+    principal = principales.get(('user', user_id))
+    if principal is None:
+        usuario = User.query.get(user_id)
+        if usuario is None:
+            return None
+        principal = principal_de(usuario)
+        principales.set(('user', user_id), principal, ttl=PRINCIPAL_USUARIO_TTL)
+    return principal
+
+def usuario_de(principal):
+    """Reconstruye el User del principal y lo asocia a la sesion sin consultar la base."""
+    usuario = User(id=principal.id, username=principal.username, email=principal.email, area=principal.area,
+                   token_version=principal.token_version)
+    make_transient_to_detached(usuario)
+    return db.session.merge(usuario, load=False)
+
+@login_manager.user_loader
+def load_user(user_id):
+    principal = principal_usuario(int(user_id))
+    return usuario_de(principal) if principal else None
+
+@event.listens_for(db.session, 'after_flush')
+def _usuarios_modificados(session, flush_context):
+    # Agregar historiales al usuario modifica sus colecciones, solo importan las columnas
+    ids = {obj.id for obj in session.dirty if isinstance(obj, User) and session.is_modified(obj, include_collections=False)}
+    ids.update(obj.id for obj in session.deleted if isinstance(obj, User))
+    if ids:
+        session.info.setdefault('usuarios_modificados', set()).update(ids)
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidar_principales(session):
+    # Se invalida al confirmar para que un request concurrente no vuelva a cachear los datos antiguos
+    for user_id in session.info.pop('usuarios_modificados', ()):
+        principales.invalidar(user_id)
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_usuarios_modificados(session):
+    session.info.pop('usuarios_modificados', None)
+
+# Pool acotado para bcrypt, se crea con la configuracion de la primera app que lo usa
+_bcrypt_pool = None
+_bcrypt_cupos = None
+_bcrypt_lock = threading.Lock()
+
+def _bcrypt(funcion, *args):
+    """Ejecuta `funcion` en el pool acotado de bcrypt y espera su resultado.
+
+    El worker del request sigue ocupado mientras espera el hash: el pool solo acota
+    cuantos hashes se calculan a la vez (BCRYPT_HILOS) y cuantos esperan (BCRYPT_COLA).
+    Sobre ese limite se responde 503 sin esperar, y tambien si el hash no termina en
+    BCRYPT_ESPERA segundos, para que un hash trabado no retenga el request.
+    """
+    global _bcrypt_pool, _bcrypt_cupos
+    with _bcrypt_lock:
+        if _bcrypt_pool is None:
+            hilos = current_app.config['BCRYPT_HILOS']
+            _bcrypt_pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='bcrypt')
+            _bcrypt_cupos = threading.BoundedSemaphore(hilos + current_app.config['BCRYPT_COLA'])
+    if not _bcrypt_cupos.acquire(blocking=False):
+        return abort(503)
+    try:
+        futuro = _bcrypt_pool.submit(funcion, *args)
+    except:
+        _bcrypt_cupos.release()
+        raise
+    futuro.add_done_callback(lambda f: _bcrypt_cupos.release())
+    try:
+        return futuro.result(timeout=current_app.config['BCRYPT_ESPERA'])
+    except EsperaAgotada:
+        # El cupo se libera cuando el hash termine, no antes
+        return abort(503)
+
+def generar_hash(password):
+    return _bcrypt(bcrypt.generate_password_hash, password).decode('utf-8')
+
+def verificar_password(usuario, password):
+    """Verifica la contraseña del usuario y, si su hash usa otro costo que el configurado, lo recalcula."""
+    if not _bcrypt(bcrypt.check_password_hash, usuario.password, password):
+        return False
+    # Formato del hash: $2b$<costo>$<salt y hash>
+    if int(usuario.password.split('$')[2]) != current_app.config['BCRYPT_LOG_ROUNDS']:
+        usuario.password = generar_hash(password)
+    return True
@@ -1,9 +1,31 @@
-from flasksystem import create_app
+from datetime import date, datetime, timedelta
+from flasksystem import create_app, db
+from flasksystem.models import Area
+from flasksystem.main.utils import escribir_snapshot, fecha_snapshot_inicial
 from flask_migrate import MigrateCommand, Manager
 
 manager = Manager(create_app)
 manager.add_command('db', MigrateCommand)
 
+@manager.option('-f', '--fecha', dest='fecha', default=None, help='Dia del snapshot (YYYY-MM-DD), por defecto ayer')
+def snapshot(fecha=None):
+    """Guarda el stock de cada area al terminar el dia, para consultar el stock historico.
+
+    La primera vez tambien guarda un snapshot inicial, del dia anterior al primer movimiento
+    del area, para que las consultas de cualquier fecha partan de un snapshot.
+    """
+    fecha = date.fromisoformat(fecha) if fecha else datetime.utcnow().date() - timedelta(days=1)
+    try:
+        for area in (Area.Lab.value, Area.Bod.value):
+            inicial = fecha_snapshot_inicial(area)
+            if inicial and inicial < fecha:
+                print(f'{area} {inicial}: {escribir_snapshot(area, inicial)} items (snapshot inicial)')
+            print(f'{area} {fecha}: {escribir_snapshot(area, fecha)} items')
+    except ValueError as err:
+        print(err)
+        return
+    db.session.commit()
+
 if __name__ == "__main__":
     manager.run()
 
@@ -0,0 +1,29 @@
+"""correlativo de lotes compartido
+
+Revision ID: 2b9f6ac15079
+Revises: cf2f86db61a2
+Create Date: 2026-10-18 09:14:05.046311
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '2b9f6ac15079'
+down_revision = 'cf2f86db61a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Los contadores por area pasan a uno solo por año, parte desde el mayor para no repetir lotes ya emitidos
+    op.execute("INSERT INTO correlativo (area, anio, nro) SELECT 'Lotes', anio, MAX(nro) FROM correlativo "
+               "WHERE area IN ('Lab', 'Bod') GROUP BY anio")
+    op.execute("DELETE FROM correlativo WHERE area IN ('Lab', 'Bod')")
+
+
+def downgrade():
+    for area in ('Lab', 'Bod'):
+        op.execute(f"INSERT INTO correlativo (area, anio, nro) SELECT '{area}', anio, nro FROM correlativo "
+                   "WHERE area = 'Lotes'")
+    op.execute("DELETE FROM correlativo WHERE area = 'Lotes'")
@@ -0,0 +1,48 @@
+"""borrado en cascada
+
+Revision ID: 36244c7813fe
+Revises: 7f8b1c940226
+Create Date: 2026-10-18 08:37:54.865646
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '36244c7813fe'
+down_revision = '7f8b1c940226'
+branch_labels = None
+depends_on = None
+
+
+# (tabla, columna, tabla referenciada) de las llaves foraneas que pasan a ON DELETE CASCADE
+LLAVES = [
+    ('formula', 'reactivo_id', 'reactivo'),
+    ('historial_materias', 'materia_id', 'materia'),
+    ('historial_quimicos', 'reactivo_id', 'historial_reactivos'),
+    ('historial_quimicos', 'materia_id', 'historial_materias'),
+    ('historial_reactivos', 'reactivo_id', 'reactivo'),
+    ('ingrediente', 'formula_id', 'formula'),
+    ('quimico', 'materia_id', 'materia'),
+    ('quimico', 'reactivo_id', 'reactivo'),
+]
+
+
+def cambiar_ondelete(ondelete):
+    # SQLite no permite modificar llaves foraneas y no las aplica sin PRAGMA foreign_keys,
+    # la aplicacion elimina las filas dependientes explicitamente
+    if op.get_bind().dialect.name == 'sqlite':
+        return
+    for tabla, columna, referencia in LLAVES:
+        # Las llaves se crearon sin nombre, se usa el nombre que les asigna Postgres
+        nombre = f'{tabla}_{columna}_fkey'
+        op.drop_constraint(nombre, tabla, type_='foreignkey')
+        op.create_foreign_key(nombre, tabla, referencia, [columna], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    cambiar_ondelete('CASCADE')
+
+
+def downgrade():
+    cambiar_ondelete(None)
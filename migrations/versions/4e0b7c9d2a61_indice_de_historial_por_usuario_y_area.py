@@ -0,0 +1,31 @@
+"""indice de historial por usuario y area
+
+Revision ID: 4e0b7c9d2a61
+Revises: d053ad00b452
+Create Date: 2026-10-18 09:52:10.412387
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e0b7c9d2a61'
+down_revision = 'd053ad00b452'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Los listados filtran por usuario dentro de un area, (user_id, fecha_registro, id) no servia el filtro por area
+    op.create_index('ix_historial_materias_user_area_fecha', 'historial_materias', ['user_id', 'area', sa.text('fecha_registro DESC'), sa.text('id DESC')], unique=False)
+    op.drop_index('ix_historial_materias_user_fecha', table_name='historial_materias')
+    op.create_index('ix_historial_reactivos_user_area_fecha', 'historial_reactivos', ['user_id', 'area', sa.text('fecha_registro DESC'), sa.text('id DESC')], unique=False)
+    op.drop_index('ix_historial_reactivos_user_fecha', table_name='historial_reactivos')
+
+
+def downgrade():
+    op.create_index('ix_historial_reactivos_user_fecha', 'historial_reactivos', ['user_id', sa.text('fecha_registro DESC'), sa.text('id DESC')], unique=False)
+    op.drop_index('ix_historial_reactivos_user_area_fecha', table_name='historial_reactivos')
+    op.create_index('ix_historial_materias_user_fecha', 'historial_materias', ['user_id', sa.text('fecha_registro DESC'), sa.text('id DESC')], unique=False)
+    op.drop_index('ix_historial_materias_user_area_fecha', table_name='historial_materias')
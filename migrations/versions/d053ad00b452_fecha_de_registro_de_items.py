@@ -0,0 +1,27 @@
+"""fecha de registro de items
+
+Revision ID: d053ad00b452
+Revises: 2b9f6ac15079
+Create Date: 2026-10-18 09:33:20.921759
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd053ad00b452'
+down_revision = '2b9f6ac15079'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Los items existentes quedan con fecha nula: el stock historico los considera desde siempre
+    op.add_column('materia', sa.Column('fecha_registro', sa.DateTime(), nullable=True))
+    op.add_column('reactivo', sa.Column('fecha_registro', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('reactivo', 'fecha_registro')
+    op.drop_column('materia', 'fecha_registro')
@@ -0,0 +1,62 @@
+"""produccion de historial materias
+
+Revision ID: eae602fd112f
+Revises: c8cacde447d2
+Create Date: 2026-10-18 09:05:10.269303
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'eae602fd112f'
+down_revision = 'c8cacde447d2'
+branch_labels = None
+depends_on = None
+
+
+# Nombre que Postgres le asigna a la llave, se usa para poder eliminarla en el downgrade
+LLAVE = 'historial_materias_produccion_id_fkey'
+
+# Segundos que pueden separar un consumo de su produccion en los datos antiguos
+VENTANA = 60
+
+# Enlaza los consumos existentes con su produccion. La observacion del consumo incluye el id del
+# reactivo, y la produccion es del mismo usuario y area. Antes cada consumo se guardaba con su propio
+# commit y la fecha por defecto, antes que la fila del reactivo, por lo que se toma la primera
+# produccion registrada hasta VENTANA segundos despues. Los consumos sin produccion en esa ventana
+# quedan sin enlace y su lote no tendra genealogia.
+ENLAZAR_PRODUCCIONES = """
+UPDATE historial_materias SET produccion_id = (
+    SELECT historial_reactivos.id FROM historial_reactivos
+    WHERE historial_reactivos.tipo = 'Produccion'
+      AND historial_reactivos.area = historial_materias.area
+      AND historial_reactivos.user_id = historial_materias.user_id
+      AND historial_reactivos.fecha_registro >= historial_materias.fecha_registro
+      AND historial_reactivos.fecha_registro <= {limite}
+      AND historial_materias.observacion LIKE 'Produccion de reactivo [' || historial_reactivos.reactivo_id || ',%'
+    ORDER BY historial_reactivos.fecha_registro, historial_reactivos.id LIMIT 1)
+WHERE tipo = 'Producción'
+"""
+
+# Fecha del consumo mas VENTANA segundos en cada dialecto
+LIMITES = {'sqlite': f"strftime('%Y-%m-%d %H:%M:%f', historial_materias.fecha_registro, '+{VENTANA} seconds')",
+           'postgresql': f"historial_materias.fecha_registro + interval '{VENTANA} seconds'"}
+
+
+def upgrade():
+    op.add_column('historial_materias', sa.Column('produccion_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_historial_materias_produccion_id'), 'historial_materias', ['produccion_id'], unique=False)
+    # SQLite no permite agregar llaves foraneas a una tabla existente, la aplicacion limpia el enlace al borrar
+    if op.get_bind().dialect.name != 'sqlite':
+        op.create_foreign_key(LLAVE, 'historial_materias', 'historial_reactivos', ['produccion_id'], ['id'],
+                              ondelete='SET NULL')
+    op.execute(ENLAZAR_PRODUCCIONES.format(limite=LIMITES[op.get_bind().dialect.name]))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_constraint(LLAVE, 'historial_materias', type_='foreignkey')
+    op.drop_index(op.f('ix_historial_materias_produccion_id'), table_name='historial_materias')
+    op.drop_column('historial_materias', 'produccion_id')